@@ -0,0 +1,250 @@
+import hashlib
+import io
+import logging
+import zipfile, rarfile
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from backend.cache import hash_arquivo
+
+logger = logging.getLogger(__name__)
+
+EXTENSOES_ARQUIVO = {".zip", ".rar"}
+# Relatório de membros ignorados/duplicados incluído nos ZIPs de saída
+ARQUIVO_RELATORIO = "_ignorados.json"
+
+
+class ArquivoInvalido(ValueError):
+    """Arquivo compactado inválido, corrompido ou de tipo não suportado."""
+
+
+# Formatos que converter_arquivo aceita
+EXTENSOES_SUPORTADAS = {
+    ".pdf", ".docx", ".xlsx", ".pptx", ".html", ".htm", ".xhtml", ".md", ".csv",
+    ".adoc", ".asciidoc", ".xml", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp",
+}
+# Lixo comum em arquivos gerados por macOS/Windows
+_IGNORAR_NOMES = {".ds_store", "thumbs.db", "desktop.ini"}
+_OOXML = (b"PK\x03\x04",)
+_ASSINATURAS = {
+    ".pdf": (b"%PDF",),
+    ".docx": _OOXML, ".xlsx": _OOXML, ".pptx": _OOXML,
+    ".png": (b"\x89PNG\r\n\x1a\n",),
+    ".jpg": (b"\xff\xd8\xff",), ".jpeg": (b"\xff\xd8\xff",),
+    ".tif": (b"II*\x00", b"MM\x00*"), ".tiff": (b"II*\x00", b"MM\x00*"),
+    ".bmp": (b"BM",),
+    ".webp": (b"RIFF",),
+}
+_TAMANHO_CABECALHO = 8192
+_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class PlanoArquivo:
+    """
+    Membros de um arquivo compactado (ou pasta) prontos para conversão:
+    um arquivo por conteúdo distinto, os nomes que compartilham cada
+    conteúdo e os membros ignorados com o motivo.
+    """
+    caminhos: Dict[str, str] = field(default_factory=dict)       # sha256 -> arquivo a converter
+    nomes: Dict[str, List[str]] = field(default_factory=dict)    # sha256 -> membros com esse conteúdo
+    ignorados: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return sum(len(nomes) for nomes in self.nomes.values())
+
+    def adicionar(self, nome: str, sha256: str, caminho: str) -> bool:
+        """Registra um membro; False se o conteúdo já estava no plano (duplicado)."""
+        if sha256 in self.nomes:
+            self.nomes[sha256].append(nome)
+            return False
+        self.caminhos[sha256] = caminho
+        self.nomes[sha256] = [nome]
+        return True
+
+    def expandir(self, resultados: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+        """Converte (sha256, resultado) em (nome, resultado) para cada membro com esse conteúdo."""
+        for sha256, resultado in resultados:
+            for nome in self.nomes[sha256]:
+                yield nome, resultado
+
+    def relatorio(self) -> Dict[str, Any]:
+        """Conteúdo de _ignorados.json: membros ignorados e duplicados."""
+        return {
+            "ignorados": self.ignorados,
+            "duplicados": {
+                nome: nomes[0] for nomes in self.nomes.values() if len(nomes) > 1 for nome in nomes[1:]
+            },
+        }
+
+
+def nome_saida(rel: str) -> str:
+    """sub/pasta/nota.pdf -> sub/pasta/nota.pdf.json: nomes únicos, mesmo com stems repetidos."""
+    return Path(rel).as_posix() + ".json"
+
+
+def motivo_para_ignorar(nome: str, extensoes: Set[str] = EXTENSOES_SUPORTADAS) -> Optional[str]:
+    """Motivo para pular um membro só pelo nome, ou None se ele deve ser lido."""
+    partes = PurePosixPath(nome.replace("\\", "/")).parts
+    base = partes[-1] if partes else ""
+    if "__MACOSX" in partes or base.startswith("._"):
+        return "metadados do macOS"
+    if base.lower() in _IGNORAR_NOMES:
+        return "arquivo de sistema"
+    if PurePosixPath(base).suffix.lower() not in extensoes:
+        return "extensão não suportada"
+    return None
+
+
+def assinatura_valida(suffix: str, cabecalho: bytes) -> bool:
+    """Confere os magic bytes do formato; formatos de texto não podem ter bytes nulos."""
+    assinaturas = _ASSINATURAS.get(suffix)
+    if assinaturas is None:
+        return b"\x00" not in cabecalho
+    if suffix == ".pdf":
+        return b"%PDF" in cabecalho[:1024]  # alguns geradores escrevem lixo antes do cabeçalho
+    if suffix == ".webp":
+        return cabecalho.startswith(b"RIFF") and cabecalho[8:12] == b"WEBP"
+    return cabecalho.startswith(assinaturas)
+
+
+def _abrir(origem: Union[str, BinaryIO], suffix: str):
+    if suffix == ".zip":
+        return zipfile.ZipFile(origem)
+    return rarfile.RarFile(origem)
+
+
+def planejar_arquivo(origem: Union[str, BinaryIO], suffix: str, destino: str,
+                     extensoes: Set[str] = EXTENSOES_SUPORTADAS) -> PlanoArquivo:
+    """
+    Lista os membros de um .zip ou .rar sem extrair a árvore: ignora lixo de
+    sistema, extensões não suportadas e conteúdos que não batem com a
+    extensão; lê cada membro aceito direto do arquivo compactado para
+    `destino` (nomes gerados, sem os caminhos originais), calculando o SHA-256
+    na mesma passada, e descarta cópias de conteúdos repetidos.
+    Levanta ArquivoInvalido com mensagem pronta para o cliente em caso de falha.
+    """
+    suffix = suffix.lower()
+    if suffix not in EXTENSOES_ARQUIVO:
+        raise ArquivoInvalido("Arquivo deve ser .zip ou .rar")
+
+    plano = PlanoArquivo()
+    Path(destino).mkdir(parents=True, exist_ok=True)
+    try:
+        with _abrir(origem, suffix) as arquivo:
+            for indice, info in enumerate(arquivo.infolist()):
+                if info.is_dir():
+                    continue
+                nome = info.filename
+                motivo = motivo_para_ignorar(nome, extensoes)
+                if motivo is None:
+                    motivo = _copiar_membro(arquivo, info, indice, destino, plano)
+                if motivo is not None:
+                    plano.ignorados.append({"arquivo": nome, "motivo": motivo})
+    except zipfile.BadZipFile:
+        raise ArquivoInvalido("ZIP inválido ou corrompido")
+    except rarfile.BadRarFile:
+        raise ArquivoInvalido("RAR inválido ou corrompido")
+    except ArquivoInvalido:
+        raise
+    except Exception as e:
+        raise ArquivoInvalido(f"Falha ao ler arquivo: {e}")
+    return plano
+
+
+def _copiar_membro(arquivo, info, indice: int, destino: str, plano: PlanoArquivo) -> Optional[str]:
+    """Copia um membro para `destino` se o conteúdo for válido; devolve o motivo se não for."""
+    nome = info.filename
+    suffix = PurePosixPath(nome).suffix.lower()
+    caminho = Path(destino) / f"membro_{indice}{suffix}"
+    try:
+        with arquivo.open(info) as fonte:
+            cabecalho = fonte.read(_TAMANHO_CABECALHO)
+            if not cabecalho:
+                return "arquivo vazio"
+            if not assinatura_valida(suffix, cabecalho):
+                return "conteúdo não corresponde à extensão"
+            digest = hashlib.sha256(cabecalho)
+            with open(caminho, "wb") as saida:
+                saida.write(cabecalho)
+                while True:
+                    bloco = fonte.read(_CHUNK_SIZE)
+                    if not bloco:
+                        break
+                    digest.update(bloco)
+                    saida.write(bloco)
+    except (RuntimeError, zipfile.BadZipFile, rarfile.Error) as e:
+        # membro protegido por senha ou corrompido: os demais seguem
+        caminho.unlink(missing_ok=True)
+        return f"falha ao ler: {e}"
+
+    if not plano.adicionar(nome, digest.hexdigest(), str(caminho)):
+        caminho.unlink()
+    return None
+
+
+def planejar_pasta(pasta: str, extensoes: Set[str] = EXTENSOES_SUPORTADAS) -> PlanoArquivo:
+    """Mesmo plano de planejar_arquivo() para uma pasta já existente (arquivos ficam no lugar)."""
+    plano = PlanoArquivo()
+    base = Path(pasta)
+    for arquivo in sorted(p for p in base.rglob("*") if p.is_file()):
+        nome = arquivo.relative_to(base).as_posix()
+        motivo = motivo_para_ignorar(nome, extensoes)
+        if motivo is None:
+            with open(arquivo, "rb") as f:
+                cabecalho = f.read(_TAMANHO_CABECALHO)
+            if not cabecalho:
+                motivo = "arquivo vazio"
+            elif not assinatura_valida(arquivo.suffix.lower(), cabecalho):
+                motivo = "conteúdo não corresponde à extensão"
+        if motivo is not None:
+            plano.ignorados.append({"arquivo": nome, "motivo": motivo})
+            continue
+        plano.adicionar(nome, hash_arquivo(str(arquivo)), str(arquivo))
+    return plano
+
+
+class _BufferFluxo(io.RawIOBase):
+    """
+    Destino de escrita não pesquisável para o ZipFile: acumula apenas os
+    bytes produzidos desde a última drenagem.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def zip_em_fluxo(entradas: Iterable[Tuple[str, Union[str, bytes]]]) -> Iterator[bytes]:
+    """
+    Gera um ZIP (deflate) incrementalmente: cada (arcname, conteúdo) recebido
+    é comprimido e seus bytes são rendidos logo em seguida. A memória usada
+    fica limitada a uma entrada por vez mais o diretório central.
+    """
+    buffer = _BufferFluxo()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for arcname, conteudo in entradas:
+            zf.writestr(arcname, conteudo)
+            dados = buffer.drenar()
+            if dados:
+                yield dados
+    # Diretório central, escrito ao fechar o ZipFile
+    yield buffer.drenar()
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
+
+from backend.metrics import etapa, registrar_etapa
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem coalescência entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+CACHE_ENABLED = os.getenv("DOCLING_CACHE_ENABLED", "1") != "0"
+CACHE_DIR = Path(os.getenv("DOCLING_CACHE_DIR", Path(tempfile.gettempdir()) / "docling_cache"))
+CACHE_MEMORY_ITEMS = int(os.getenv("DOCLING_CACHE_MEMORY_ITEMS", "256"))
+CACHE_DISK_MAX_BYTES = int(os.getenv("DOCLING_CACHE_DISK_MAX_BYTES", str(2 * 1024 ** 3)))
+CACHE_MAX_AGE_SECONDS = int(os.getenv("DOCLING_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+# Espera máxima por uma conversão idêntica em andamento (outra thread ou worker)
+COALESCE_TIMEOUT_SECONDS = float(os.getenv("DOCLING_COALESCE_TIMEOUT_SECONDS", "600"))
+
+# Incrementar quando o formato dos resultados mudar, invalidando entradas antigas
+CACHE_SCHEMA_VERSION = 2
+_CHUNK_SIZE = 1024 * 1024
+_NOMES_CONTADORES = ("hits_memoria", "hits_disco", "misses", "gravacoes", "remocoes", "coalescidas")
+
+
+def hash_arquivo(path: str) -> str:
+    """Calcula o SHA-256 de um arquivo lendo-o em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def chave_cache(content_hash: str, tipo: str, opcoes: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Monta a chave do cache a partir do hash do conteúdo, do tipo de
+    conversor ("arquivo", "danfe", ...) e das opções que alteram o resultado.
+    """
+    opcoes_json = json.dumps(opcoes or {}, sort_keys=True, default=str)
+    bruto = f"{CACHE_SCHEMA_VERSION}\x00{tipo}\x00{content_hash}\x00{opcoes_json}"
+    return hashlib.sha256(bruto.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache de resultados de conversão em dois níveis:
+      - memória: LRU limitado por número de itens
+      - disco: um JSON por chave, com remoção por idade e por tamanho total
+    Apenas resultados sem "error" devem ser gravados.
+    """
+
+    def __init__(self, diretorio: Path, max_itens_memoria: int,
+                 max_bytes_disco: int, max_idade: int):
+        self.diretorio = Path(diretorio)
+        self.max_itens_memoria = max_itens_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self.max_idade = max_idade
+        self._memoria: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Lock próprio dos contadores: _incrementar é chamado com self._lock tomado
+        self._lock_contadores = threading.Lock()
+        self._contadores = [0] * len(_NOMES_CONTADORES)
+        self._ultima_limpeza = 0.0
+
+    def _caminho(self, chave: str) -> Path:
+        return self.diretorio / chave[:2] / f"{chave}.json"
+
+    def _caminho_lock(self, chave: str) -> Path:
+        return self.diretorio / "locks" / f"{chave}.lock"
+
+    def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Retorna o resultado em cache ou None."""
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                self._incrementar("hits_memoria")
+                return self._memoria[chave]
+
+        caminho = self._caminho(chave)
+        try:
+            idade = time.time() - caminho.stat().st_mtime
+            if idade > self.max_idade:
+                caminho.unlink(missing_ok=True)
+                raise FileNotFoundError(caminho)
+            with open(caminho, encoding="utf-8") as f:
+                resultado = json.load(f)
+            os.utime(caminho)  # mantém a ordem de uso para a remoção por tamanho
+        except (OSError, ValueError):
+            self._incrementar("misses")
+            return None
+
+        self._incrementar("hits_disco")
+        with self._lock:
+            self._guardar_memoria(chave, resultado)
+        return resultado
+
+    def gravar(self, chave: str, resultado: Dict[str, Any]) -> None:
+        """Grava o resultado nos dois níveis do cache."""
+        with self._lock:
+            self._guardar_memoria(chave, resultado)
+        self._incrementar("gravacoes")
+
+        caminho = self._caminho(chave)
+        try:
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            # Escrita atômica: outro processo nunca lê um JSON pela metade
+            fd, tmp = tempfile.mkstemp(dir=caminho.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False)
+            os.replace(tmp, caminho)
+        except Exception as e:
+            logger.warning("Erro ao gravar cache %s: %s", caminho, e)
+            return
+
+        # Varredura do disco no máximo uma vez por minuto
+        if time.time() - self._ultima_limpeza > 60:
+            self.limpar_disco()
+
+    def _guardar_memoria(self, chave: str, resultado: Dict[str, Any]) -> None:
+        self._memoria[chave] = resultado
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    def limpar_disco(self) -> None:
+        """Remove entradas expiradas e, se preciso, as menos usadas até caber no limite."""
+        agora = time.time()
+        self._ultima_limpeza = agora
+        entradas = []
+        total = 0
+        for caminho in self.diretorio.glob("*/*.json"):
+            try:
+                st = caminho.stat()
+            except OSError:
+                continue
+            if agora - st.st_mtime > self.max_idade:
+                caminho.unlink(missing_ok=True)
+                self._incrementar("remocoes")
+                continue
+            entradas.append((st.st_mtime, st.st_size, caminho))
+            total += st.st_size
+
+        # Arquivos de lock de conversões antigas (ver _conversao_exclusiva)
+        for caminho in self.diretorio.glob("locks/*.lock"):
+            try:
+                if agora - caminho.stat().st_mtime > self.max_idade:
+                    _remover_lock_livre(caminho)
+            except OSError:
+                continue
+
+        entradas.sort()  # mais antigas primeiro
+        for _, tamanho, caminho in entradas:
+            if total <= self.max_bytes_disco:
+                break
+            caminho.unlink(missing_ok=True)
+            total -= tamanho
+            self._incrementar("remocoes")
+
+    def _incrementar(self, nome: str) -> None:
+        contadores = self._contadores
+        lock = contadores.get_lock() if hasattr(contadores, "get_lock") else self._lock_contadores
+        with lock:
+            contadores[_NOMES_CONTADORES.index(nome)] += 1
+
+    def compartilhar_contadores(self, contadores) -> None:
+        """
+        Passa a usar um multiprocessing.Array como contadores, para que os
+        processos do pool de conversão somem nos mesmos números.
+        """
+        if contadores is self._contadores:
+            return
+        for i, valor in enumerate(list(self._contadores)):
+            contadores[i] += valor
+        self._contadores = contadores
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de hits/misses e ocupação atual."""
+        stats = dict(zip(_NOMES_CONTADORES, list(self._contadores)))
+        with self._lock:
+            stats["itens_memoria"] = len(self._memoria)
+        stats["hits"] = stats["hits_memoria"] + stats["hits_disco"]
+        return stats
+
+
+def _remover_lock_livre(caminho: Path) -> None:
+    """
+    Remove um arquivo de lock só se nenhuma conversão o segura: apagar o de
+    uma conversão longa faria a próxima requisição travar outro inode e
+    converter de novo, sem coalescer.
+    """
+    if fcntl is None:
+        caminho.unlink(missing_ok=True)
+        return
+    fd = os.open(caminho, os.O_RDWR)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # conversão em andamento
+        caminho.unlink(missing_ok=True)
+    finally:
+        os.close(fd)
+
+
+_CACHE = ResultCache(CACHE_DIR, CACHE_MEMORY_ITEMS, CACHE_DISK_MAX_BYTES, CACHE_MAX_AGE_SECONDS)
+
+
+def obter_cache() -> ResultCache:
+    return _CACHE
+
+
+def criar_contadores_compartilhados(ctx):
+    """Cria o array de contadores compartilhável com processos do contexto `ctx`."""
+    return ctx.Array("q", len(_NOMES_CONTADORES))
+
+
+def _mesmo_arquivo(fd: int, caminho: Path) -> bool:
+    try:
+        return os.fstat(fd).st_ino == os.stat(caminho).st_ino
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def _conversao_exclusiva(chave: str) -> Iterator[bool]:
+    """
+    Single-flight por chave entre threads e processos do mesmo nó (workers do
+    uvicorn e do pool): flock exclusivo em <CACHE_DIR>/locks/<chave>.lock
+    durante a conversão. Rende True se outra conversão da mesma chave estava
+    em andamento e terminou (o resultado, se houve sucesso, já está no cache).
+    """
+    if fcntl is None:
+        yield False
+        return
+    caminho = _CACHE._caminho_lock(chave)
+    try:
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError as e:
+        logger.warning("Erro ao abrir lock %s: %s", caminho, e)
+        yield False
+        return
+
+    try:
+        esperou = False
+        inicio = time.monotonic()
+        intervalo = 0.05
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if _mesmo_arquivo(fd, caminho):
+                    os.utime(caminho)  # em uso: a limpeza por idade não o considera antigo
+                    break
+                # A limpeza removeu o lock enquanto esperávamos: trava o arquivo atual
+                novo = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+                os.close(fd)
+                fd = novo
+                continue
+            except BlockingIOError:
+                esperou = True
+                if time.monotonic() - inicio > COALESCE_TIMEOUT_SECONDS:
+                    logger.warning("Tempo esgotado aguardando a conversão de %s; convertendo em paralelo", chave)
+                    break
+                time.sleep(intervalo)
+                intervalo = min(intervalo * 2, 0.5)
+        if esperou:
+            registrar_etapa("coalescencia", time.monotonic() - inicio)
+        yield esperou
+    finally:
+        os.close(fd)  # fechar o descritor libera o flock
+
+
+def converter_com_cache(source: str, tipo: str, opcoes: Dict[str, Any], converter,
+                        content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Executa `converter()` consultando antes o cache. Só arquivos locais entram
+    no cache (URLs podem mudar de conteúdo); resultados com erro não são gravados.
+    Conversões idênticas simultâneas (mesmo conteúdo e opções), em qualquer
+    worker do nó, rodam uma vez só: as demais esperam e reaproveitam o resultado.
+    """
+    if not CACHE_ENABLED or not Path(source).is_file():
+        return converter()
+
+    if content_hash is None:
+        with etapa("hash"):
+            content_hash = hash_arquivo(source)
+    chave = chave_cache(content_hash, tipo, opcoes)
+
+    with etapa("cache"):
+        resultado = _CACHE.obter(chave)
+    if resultado is not None:
+        return resultado
+
+    with _conversao_exclusiva(chave) as esperou:
+        if esperou:
+            resultado = _CACHE.obter(chave)
+            if resultado is not None:
+                _CACHE._incrementar("coalescidas")
+                return resultado
+        resultado = converter()
+        if "error" not in resultado:
+            _CACHE.gravar(chave, resultado)
+    return resultado
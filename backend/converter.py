@@ -1,68 +1,177 @@
 import logging
 import json
 from pathlib import Path
-from docling.document_converter import DocumentConverter
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional, Sequence, Tuple
 import xmltodict
 
+from backend.archive import PlanoArquivo
+from backend.cache import converter_com_cache
+from backend.fields import CAMPOS_ARQUIVO, metadados, resolver_campos, textos_limpos
+from backend.metrics import etapa, registrar_entrada, tipo_documento
+from backend.pipelines import obter_conversor, resolver_perfil, validar_perfil
+from backend.sharding import converter_fragmentado, deve_fragmentar
+from backend.tables import exportar_tabela
+from backend.workers import mapear_em_pool, resolver_workers
+
 logger = logging.getLogger(__name__)
-_CONVERTER = DocumentConverter()  # Reuso da instância para leve ganho de performance
 
-def converter_arquivo(source: str) -> Dict[str, Any]:
+def converter_arquivo(source: str, content_hash: Optional[str] = None,
+                      perfil: Optional[str] = None,
+                      table_format: str = "records",
+                      fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
     """
     Converte qualquer documento ou URL suportado pelo Docling para um dict JSON:
       - texts: blocos de texto extraídos
-      - tables: cada tabela (sheet) como lista de registros
+      - tables: cada tabela (sheet) como lista de registros ou, com
+        table_format="columnar", como {"columns": [...], "rows": [[...]]}
       - metadata: metadados extraídos (se houver)
       - xml: dicionário completo caso seja um arquivo .xml
+    `fields` restringe o resultado a algumas dessas partes (ex.: ["texts"]);
+    só elas são calculadas. Não se aplica a XML.
+    `perfil` escolhe o pipeline de PDF (fast, standard, full ou auto; ver
+    backend.pipelines). Arquivos locais passam pelo cache de resultados;
+    `content_hash` evita recalcular o SHA-256 quando quem chama já o conhece.
     """
+    registrar_entrada(doc_type=tipo_documento(source))
+    try:
+        perfil = validar_perfil(perfil)
+        campos = resolver_campos(fields, CAMPOS_ARQUIVO)
+    except ValueError as e:
+        return {"error": str(e)}
+    return converter_com_cache(
+        source, "arquivo",
+        # A extensão decide o ramo .xml e a detecção de formato do Docling
+        {"suffix": Path(source).suffix.lower(), "perfil": perfil, "table_format": table_format, "fields": campos},
+        # "auto" só inspeciona o PDF se não houver resultado em cache
+        lambda: _converter_arquivo(source, resolver_perfil(perfil, source), table_format, campos), content_hash
+    )
+
+
+def _converter_arquivo(source: str, perfil: str, table_format: str,
+                       campos: Tuple[str, ...] = CAMPOS_ARQUIVO) -> Dict[str, Any]:
+    """Conversão propriamente dita, sem cache."""
     try:
         # 1) Tratamento específico para XML
         if source.lower().endswith(".xml"):
-            with open(source, encoding="utf-8") as f:
+            with etapa("xml"), open(source, encoding="utf-8") as f:
                 xml_dict = xmltodict.parse(f.read(), process_namespaces=True)
             return {"xml": xml_dict}
 
-        # 2) Para os demais formatos suportados pelo Docling
-        doc = _CONVERTER.convert(source).document
-        doc_dict = doc.export_to_dict()
+        # 2) PDFs grandes: fragmentos de páginas convertidos em paralelo
+        if deve_fragmentar(source):
+            with etapa("convert"):
+                return converter_fragmentado(source, _converter_docling, perfil, table_format, campos)
 
-        # 2.1) Extrai textos limpos
-        texts = [
-            itm["text"].strip()
-            for itm in doc_dict.get("texts", [])
-            if itm.get("text", "").strip()
-        ]
+        return _converter_docling(source, perfil, table_format, campos)
 
-        # 2.2) Extrai tabelas do documento
-        tables = []
-        for table in doc.tables:  # TableItem
-            df = table.export_to_dataframe()            # → pandas.DataFrame
-            records = df.to_dict(orient="records")      # → lista de dicionários
-            tables.append({
-                "sheet_name": getattr(table, "name", None),
-                "data": records
-            })
+    except Exception as e:
+        logger.error("Falha ao processar %s: %s", source, e)
+        return {"error": f"Não foi possível processar '{source}': {e}"}
 
-        # 2.3) Metadados (opcional)
-        metadata = doc_dict.get("metadata", {})
 
-        return {"texts": texts, "tables": tables, "metadata": metadata}
+def _converter_docling(source: str, perfil: str, table_format: str = "records",
+                       campos: Tuple[str, ...] = CAMPOS_ARQUIVO) -> Dict[str, Any]:
+    """
+    Conversão de um documento pelo Docling. Também é a tarefa executada
+    no pool para cada fragmento de um PDF grande. Só as partes em `campos`
+    são extraídas, direto dos itens do documento (sem export_to_dict()).
+    """
+    try:
+        # 3) Para os demais formatos suportados pelo Docling
+        with etapa("convert"):
+            doc = obter_conversor(perfil).convert(source).document
+        if doc.pages:
+            registrar_entrada(paginas=len(doc.pages))
+        resultado: Dict[str, Any] = {}
+
+        # 3.1) Extrai textos limpos
+        if "texts" in campos:
+            with etapa("textos"):
+                resultado["texts"] = textos_limpos(doc)
+
+        # 3.2) Extrai tabelas do documento
+        if "tables" in campos:
+            with etapa("tabelas"):
+                resultado["tables"] = [
+                    {
+                        "sheet_name": getattr(table, "name", None),
+                        "data": exportar_tabela(table, table_format)  # direto da grade de células
+                    }
+                    for table in doc.tables  # TableItem
+                ]
+
+        # 3.3) Metadados (opcional)
+        if "metadata" in campos:
+            resultado["metadata"] = metadados(doc)
+
+        return resultado
 
     except Exception as e:
         logger.error("Falha ao processar %s: %s", source, e)
         return {"error": f"Não foi possível processar '{source}': {e}"}
 
 
-def processar_pasta(pasta_path: str) -> Dict[str, Dict]:
+def iterar_arquivos(arquivos: Dict[str, Tuple[str, Optional[str]]], workers: Optional[int] = None,
+                    perfil: Optional[str] = None,
+                    table_format: str = "records",
+                    fields: Optional[Sequence[str]] = None,
+                    em_voo: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    Aplica converter_arquivo() a um lote {chave: (caminho, content_hash)},
+    rendendo (chave, resultado_dict) à medida que cada arquivo termina.
+    Com mais de um worker a conversão roda no pool de processos (backend.workers),
+    com no máximo `em_voo` arquivos por vez (padrão: sem limite).
+    """
+    if resolver_workers(workers) == 1 or len(arquivos) <= 1:
+        for chave, (path, content_hash) in arquivos.items():
+            yield chave, converter_arquivo(path, content_hash, perfil, table_format, fields)
+        return
+
+    tarefas = {
+        chave: (path, content_hash, perfil, table_format, fields)
+        for chave, (path, content_hash) in arquivos.items()
+    }
+    yield from mapear_em_pool(converter_arquivo, tarefas, workers, em_voo)
+
+
+def iterar_plano(plano: PlanoArquivo, workers: Optional[int] = None,
+                 perfil: Optional[str] = None,
+                 table_format: str = "records",
+                 fields: Optional[Sequence[str]] = None,
+                 em_voo: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    Converte os membros de um PlanoArquivo (backend.archive): cada conteúdo
+    distinto uma única vez, rendendo (nome_do_membro, resultado_dict) para
+    todos os membros com aquele conteúdo.
+    """
+    arquivos = {sha256: (path, sha256) for sha256, path in plano.caminhos.items()}
+    yield from plano.expandir(iterar_arquivos(arquivos, workers, perfil, table_format, fields, em_voo))
+
+
+def iterar_pasta(pasta_path: str, workers: Optional[int] = None,
+                 perfil: Optional[str] = None,
+                 table_format: str = "records",
+                 fields: Optional[Sequence[str]] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    Aplica converter_arquivo() a todos os arquivos dentro de uma pasta (recursivamente),
+    rendendo (caminho_relativo, resultado_dict) à medida que cada arquivo termina.
+    """
+    base = Path(pasta_path)
+    arquivos = {
+        str(arquivo.relative_to(base)): (str(arquivo), None)
+        for arquivo in base.rglob("*")
+        if arquivo.is_file()
+    }
+    yield from iterar_arquivos(arquivos, workers, perfil, table_format, fields)
+
+
+def processar_pasta(pasta_path: str, workers: Optional[int] = None,
+                    perfil: Optional[str] = None,
+                    table_format: str = "records",
+                    fields: Optional[Sequence[str]] = None) -> Dict[str, Dict]:
     """
     Aplica converter_arquivo() a todos os arquivos dentro de uma pasta (recursivamente).
     Retorna dict: { "subdir/arquivo.ext": resultado_dict, ... }.
+    `workers` define o número de processos (padrão: DOCLING_WORKERS ou nº de CPUs).
     """
-    resultados = {}
-    base = Path(pasta_path)
-    for arquivo in base.rglob("*"):
-        if arquivo.is_file():
-            rel = str(arquivo.relative_to(base))
-            resultados[rel] = converter_arquivo(str(arquivo))
-    return resultados
+    return dict(iterar_pasta(pasta_path, workers, perfil, table_format, fields))
@@ -2,93 +2,227 @@ import logging
 import json
 import re
 from pathlib import Path
-from docling.document_converter import DocumentConverter
-from typing import Dict, Any, List
+from collections import defaultdict
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+from backend.cache import converter_com_cache
+from backend.fields import CAMPOS_DANFE, CAMPOS_PADRAO_DANFE, metadados, resolver_campos, textos_limpos
+from backend.metrics import etapa, registrar_entrada
+from backend.pipelines import obter_conversor, resolver_perfil, validar_perfil
+from backend.tables import exportar_tabela
+from backend.workers import mapear_em_pool, resolver_workers
 
 logger = logging.getLogger(__name__)
-_CONVERTER = DocumentConverter()  # Reuso da instância
 
 
-def converter_danfe(source: str) -> Dict[str, Any]:
+def converter_danfe(source: str, content_hash: Optional[str] = None,
+                    perfil: Optional[str] = None,
+                    table_format: str = "records",
+                    fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
     """
     Converte DANFE extraindo key-value pairs estruturados.
-    Retorna apenas: texts, tables, metadata e key_value_pairs.
+    Retorna apenas: texts (os key-value pairs), tables e metadata.
+    `fields` escolhe as partes calculadas, entre elas "plain_texts" (os
+    textos limpos, fora do padrão); ex.: ["texts"] devolve só os pares.
+    `perfil` escolhe o pipeline de PDF e `table_format` o formato das tabelas
+    ("records" ou "columnar"); arquivos locais passam pelo cache.
     """
+    registrar_entrada(doc_type="danfe")
+    try:
+        perfil = validar_perfil(perfil)
+        campos = resolver_campos(fields, CAMPOS_DANFE, CAMPOS_PADRAO_DANFE)
+    except ValueError as e:
+        return {"error": str(e)}
+    return converter_com_cache(
+        source, "danfe",
+        # A extensão decide a detecção de formato do Docling
+        {"suffix": Path(source).suffix.lower(), "perfil": perfil, "table_format": table_format, "fields": campos},
+        # "auto" só inspeciona o PDF se não houver resultado em cache
+        lambda: _converter_danfe(source, resolver_perfil(perfil, source), table_format, campos), content_hash
+    )
+
+
+def _converter_danfe(source: str, perfil: str, table_format: str,
+                     campos: Tuple[str, ...] = CAMPOS_PADRAO_DANFE) -> Dict[str, Any]:
+    """Conversão propriamente dita, sem cache."""
     try:
         # Converter documento
-        doc = _CONVERTER.convert(source).document
-        doc_dict = doc.export_to_dict()
+        with etapa("convert"):
+            doc = obter_conversor(perfil).convert(source).document
+        if doc.pages:
+            registrar_entrada(paginas=len(doc.pages))
+        resultado: Dict[str, Any] = {}
 
-        # 1) Textos limpos
-        texts = [
-            itm["text"].strip()
-            for itm in doc_dict.get("texts", [])
-            if itm.get("text", "").strip()
-        ]
+        # 1) Textos estruturados como key-value pairs para DANFE
+        if "texts" in campos:
+            with etapa("kv"):
+                resultado["texts"] = extract_danfe_key_values(_textos_posicionados(doc))
 
         # 2) Tabelas
-        tables = []
-        for table in doc.tables:
-            df = table.export_to_dataframe()
-            records = df.to_dict(orient="records")
-            tables.append({
-                "sheet_name": getattr(table, "name", None),
-                "data": records
-            })
+        if "tables" in campos:
+            with etapa("tabelas"):
+                resultado["tables"] = [
+                    {
+                        "sheet_name": getattr(table, "name", None),
+                        "data": exportar_tabela(table, table_format)
+                    }
+                    for table in doc.tables
+                ]
 
         # 3) Metadados
-        metadata = doc_dict.get("metadata", {})
+        if "metadata" in campos:
+            resultado["metadata"] = metadados(doc)
 
-        # 4) Textos estruturados como key-value pairs para DANFE
-        structured_texts = extract_danfe_key_values(doc_dict.get("texts", []))
+        # 4) Textos limpos (só sob pedido)
+        if "plain_texts" in campos:
+            with etapa("textos"):
+                resultado["plain_texts"] = textos_limpos(doc)
 
-        return {
-            "texts": structured_texts,  # Agora são os pares chave-valor estruturados
-            "tables": tables, 
-            "metadata": metadata
-        }
+        return resultado
 
     except Exception as e:
         logger.error("Falha ao processar DANFE %s: %s", source, e)
         return {"error": f"Não foi possível processar '{source}': {e}"}
 
 
+def iterar_danfes(arquivos: Dict[str, Tuple[str, Optional[str]]], workers: Optional[int] = None,
+                  perfil: Optional[str] = None,
+                  table_format: str = "records",
+                  fields: Optional[Sequence[str]] = None,
+                  em_voo: Optional[int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Aplica converter_danfe() a um lote {nome: (caminho, content_hash)},
+    rendendo (nome, resultado) à medida que cada DANFE termina. Com mais de
+    um worker a conversão roda no pool de processos (backend.workers), com
+    no máximo `em_voo` DANFEs por vez (padrão: sem limite).
+    """
+    if resolver_workers(workers) == 1 or len(arquivos) <= 1:
+        for nome, (path, content_hash) in arquivos.items():
+            yield nome, converter_danfe(path, content_hash, perfil, table_format, fields)
+        return
+
+    tarefas = {
+        nome: (path, content_hash, perfil, table_format, fields)
+        for nome, (path, content_hash) in arquivos.items()
+    }
+    yield from mapear_em_pool(converter_danfe, tarefas, workers, em_voo)
+
+
+def _textos_posicionados(doc) -> List[Dict]:
+    """
+    Só o texto e a posição (página e bbox) de cada item, no formato de
+    export_to_dict(), que é o que extract_danfe_key_values usa.
+    """
+    itens = []
+    for item in doc.texts:
+        itens.append({
+            "text": item.text,
+            "prov": [
+                {
+                    "page_no": prov.page_no,
+                    "bbox": {"l": prov.bbox.l, "t": prov.bbox.t, "r": prov.bbox.r, "b": prov.bbox.b,
+                             "coord_origin": prov.bbox.coord_origin.value},
+                }
+                for prov in item.prov
+            ],
+        })
+    return itens
+
+
+# Labels conhecidos em DANFE
+LABEL_PATTERNS = [
+    r'INSCRI[ÇC][ÃA]O ESTADUAL',
+    r'C\.?N\.?P\.?J\.?',
+    r'C\.?P\.?F\.?',
+    r'CEP',
+    r'UF',
+    r'NOME.*RAZ[ÃA]O SOCIAL',
+    r'ENDERE[ÇC]O',
+    r'MUNIC[ÍI]PIO',
+    r'FONE.*FAX',
+    r'DATA.*EMISS[ÃA]O',
+    r'DATA.*SA[ÍI]DA',
+    r'HORA.*SA[ÍI]DA',
+    r'VALOR.*TOTAL',
+    r'BASE.*C[ÁA]LCULO',
+    r'CHAVE.*ACESSO',
+    r'PROTOCOLO.*AUTORIZA[ÇC][ÃA]O',
+    r'S[ÉE]RIE',
+    r'N[ÚU]MERO.*NF',
+    r'NATUREZA.*OPERA[ÇC][ÃA]O',
+    r'PLACA.*VE[ÍI]CULO',
+    r'C[ÓO]DIGO ANTT'
+]
+# Todos os padrões numa única expressão: um re.search por texto em vez de 21
+_LABEL_REGEX = re.compile("|".join(f"(?:{p})" for p in LABEL_PATTERNS))
+
+# Palavras que indicam que um texto é label, não valor (ver _looks_like_label)
+_LABEL_KEYWORDS_REGEX = re.compile(
+    "CNPJ|CPF|INSCRICAO|CEP|UF|ENDERECO|MUNICIPIO|FONE|DATA|HORA|VALOR|SERIE"
+    "|NUMERO|CHAVE|PROTOCOLO|NATUREZA|CODIGO"
+)
+
+# Busca espacial do valor (unidades do PDF): até _DIST_MAX_ABAIXO abaixo do
+# label ou _DIST_MAX_DIREITA à sua direita; valores à direita são penalizados
+# porque no DANFE o valor normalmente fica logo abaixo do label, na mesma célula
+_DIST_MAX_ABAIXO = 30.0
+_DIST_MAX_DIREITA = 200.0
+_PENALIDADE_DIREITA = 10.0
+_TAMANHO_CELULA = 100.0
+# Labels com bbox sem valor na busca espacial caem na ordem de leitura,
+# com a confiança multiplicada por este fator
+_FATOR_CONFIANCA_SEQUENCIAL = 0.8
+
+
 def extract_danfe_key_values(texts_raw: List[Dict]) -> List[Dict]:
     """
     Extrai pares chave-valor específicos de DANFE dos textos brutos.
+    Usa a posição (prov/bbox) de cada texto: o valor é o texto mais próximo
+    logo abaixo ou à direita do label, na mesma página. Textos sem bbox, ou
+    cujo valor a busca espacial não encontra, caem na busca por ordem de
+    leitura (com confiança menor no segundo caso).
+    """
+    caixas = [_caixa(item) for item in texts_raw]
+    grades = _montar_grades(caixas)
+    validos: Dict[int, bool] = {}
+
+    kv_pairs = []
+    for i, text_item in enumerate(texts_raw):
+        text_content = text_item.get("text", "").strip()
+        if not _is_danfe_label(text_content):
+            continue
+
+        fator = 1.0
+        value = ""
+        if caixas[i] is not None:
+            value = _find_value_spatial(texts_raw, caixas, grades[caixas[i][0]], i, validos)
+            if not value:
+                fator = _FATOR_CONFIANCA_SEQUENCIAL
+        if not value:
+            value = _find_value_nearby(texts_raw, i)
+
+        if value:
+            kv_pairs.append({
+                "label": text_content,
+                "value": value,
+                "category": _categorize_danfe_field(text_content),
+                "confidence": round(_calculate_confidence(text_content, value) * fator, 3)
+            })
+
+    return kv_pairs
+
+
+def extract_danfe_key_values_sequencial(texts_raw: List[Dict]) -> List[Dict]:
+    """
+    Matcher anterior, só por ordem de leitura (mantido para comparação nos benchmarks).
     """
-    # Labels conhecidos em DANFE
-    label_patterns = [
-        r'INSCRI[ÇC][ÃA]O ESTADUAL',
-        r'C\.?N\.?P\.?J\.?',
-        r'C\.?P\.?F\.?',
-        r'CEP',
-        r'UF',
-        r'NOME.*RAZ[ÃA]O SOCIAL',
-        r'ENDERE[ÇC]O',
-        r'MUNIC[ÍI]PIO',
-        r'FONE.*FAX',
-        r'DATA.*EMISS[ÃA]O',
-        r'DATA.*SA[ÍI]DA',
-        r'HORA.*SA[ÍI]DA',
-        r'VALOR.*TOTAL',
-        r'BASE.*C[ÁA]LCULO',
-        r'CHAVE.*ACESSO',
-        r'PROTOCOLO.*AUTORIZA[ÇC][ÃA]O',
-        r'S[ÉE]RIE',
-        r'N[ÚU]MERO.*NF',
-        r'NATUREZA.*OPERA[ÇC][ÃA]O',
-        r'PLACA.*VE[ÍI]CULO',
-        r'C[ÓO]DIGO ANTT'
-    ]
-    
     kv_pairs = []
     
     for i, text_item in enumerate(texts_raw):
         text_content = text_item.get("text", "").strip()
         
         # Verificar se é um label conhecido
-        if _is_danfe_label(text_content, label_patterns):
+        if _is_danfe_label(text_content, LABEL_PATTERNS):
             # Procurar valor próximo
             value = _find_value_nearby(texts_raw, i)
             
@@ -102,7 +236,7 @@ def extract_danfe_key_values(texts_raw: List[Dict]) -> List[Dict]:
     return kv_pairs
 
 
-def _is_danfe_label(text: str, patterns: List[str]) -> bool:
+def _is_danfe_label(text: str, patterns: Optional[List[str]] = None) -> bool:
     """Verifica se texto é um label conhecido de DANFE."""
     if not text or len(text) < 3 or len(text) > 60:
         return False
@@ -110,9 +244,11 @@ def _is_danfe_label(text: str, patterns: List[str]) -> bool:
     text_clean = text.upper().replace(".", "").replace(":", "").replace("/", "")
     
     # Verificar padrões específicos
-    for pattern in patterns:
-        if re.search(pattern, text_clean):
+    if patterns is None:
+        if _LABEL_REGEX.search(text_clean):
             return True
+    elif any(re.search(pattern, text_clean) for pattern in patterns):
+        return True
     
     # Padrões gerais de labels
     if (text.endswith(":") or 
@@ -124,6 +260,97 @@ def _is_danfe_label(text: str, patterns: List[str]) -> bool:
     return False
 
 
+def _caixa(item: Dict) -> Optional[Tuple[int, float, float, float, float]]:
+    """
+    (página, l, topo, r, base) do primeiro prov do texto, com o eixo y
+    crescendo para baixo independente da origem; None se não houver bbox.
+    """
+    prov = item.get("prov") or []
+    if not prov:
+        return None
+    bbox = prov[0].get("bbox") or {}
+    try:
+        l, t, r, b = (float(bbox[k]) for k in ("l", "t", "r", "b"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if str(bbox.get("coord_origin", "BOTTOMLEFT")).upper().endswith("BOTTOMLEFT"):
+        t, b = -t, -b
+    return prov[0].get("page_no", 1), l, min(t, b), r, max(t, b)
+
+
+class _GradeEspacial:
+    """Índice em grade uniforme das caixas de texto de uma página."""
+
+    def __init__(self, tamanho_celula: float = _TAMANHO_CELULA):
+        self.tamanho = tamanho_celula
+        self.celulas: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    def _faixa(self, inicio: float, fim: float) -> range:
+        return range(int(inicio // self.tamanho), int(fim // self.tamanho) + 1)
+
+    def inserir(self, indice: int, l: float, t: float, r: float, b: float) -> None:
+        for cx in self._faixa(l, r):
+            for cy in self._faixa(t, b):
+                self.celulas[(cx, cy)].append(indice)
+
+    def consultar(self, l: float, t: float, r: float, b: float) -> set:
+        """Índices das caixas que tocam as células cobertas pelo retângulo."""
+        achados = set()
+        for cx in self._faixa(l, r):
+            for cy in self._faixa(t, b):
+                achados.update(self.celulas.get((cx, cy), ()))
+        return achados
+
+
+def _montar_grades(caixas: List[Optional[Tuple]]) -> Dict[int, _GradeEspacial]:
+    grades: Dict[int, _GradeEspacial] = defaultdict(_GradeEspacial)
+    for i, caixa in enumerate(caixas):
+        if caixa is not None:
+            pagina, l, t, r, b = caixa
+            grades[pagina].inserir(i, l, t, r, b)
+    return grades
+
+
+def _find_value_spatial(texts: List[Dict], caixas: List[Optional[Tuple]],
+                        grade: _GradeEspacial, label_index: int,
+                        validos: Dict[int, bool]) -> str:
+    """
+    Encontra o valor mais próximo abaixo ou à direita do label, pela geometria.
+    `validos` memoriza, entre labels, quais textos podem ser valor.
+    """
+    _, l, t, r, b = caixas[label_index]
+    tolerancia = max(2.0, (b - t) * 0.5)
+
+    def _eh_valor(j: int) -> bool:
+        if j not in validos:
+            candidate_text = texts[j].get("text", "").strip()
+            validos[j] = bool(candidate_text) and len(candidate_text) <= 100 \
+                and not _looks_like_label(candidate_text)
+        return validos[j]
+
+    # 1) Abaixo, com sobreposição horizontal
+    melhor = None
+    for j in grade.consultar(l, b - tolerancia, r, b + _DIST_MAX_ABAIXO):
+        _, cl, ct, cr, _ = caixas[j]
+        if j == label_index or cr <= l or cl >= r or not (b - tolerancia <= ct <= b + _DIST_MAX_ABAIXO):
+            continue
+        score = (max(0.0, ct - b) + 0.1 * abs(cl - l), j)
+        if (melhor is None or score < melhor) and _eh_valor(j):
+            melhor = score
+
+    # 2) À direita, com sobreposição vertical; só pode vencer um valor abaixo distante
+    if melhor is None or melhor[0] > _PENALIDADE_DIREITA:
+        for j in grade.consultar(r - tolerancia, t, r + _DIST_MAX_DIREITA, b):
+            _, cl, ct, _, cb = caixas[j]
+            if j == label_index or cb <= t or ct >= b or not (r - tolerancia <= cl <= r + _DIST_MAX_DIREITA):
+                continue
+            score = (max(0.0, cl - r) + _PENALIDADE_DIREITA, j)
+            if (melhor is None or score < melhor) and _eh_valor(j):
+                melhor = score
+
+    return texts[melhor[1]].get("text", "").strip() if melhor else ""
+
+
 def _find_value_nearby(texts: List[Dict], label_index: int) -> str:
     """Encontra valor próximo ao label."""
     # Procurar nos próximos 5 textos
@@ -145,14 +372,7 @@ def _find_value_nearby(texts: List[Dict], label_index: int) -> str:
 
 def _looks_like_label(text: str) -> bool:
     """Verifica se texto parece ser outro label."""
-    text_upper = text.upper()
-    label_keywords = [
-        "CNPJ", "CPF", "INSCRICAO", "CEP", "UF", "ENDERECO", 
-        "MUNICIPIO", "FONE", "DATA", "HORA", "VALOR", "SERIE", 
-        "NUMERO", "CHAVE", "PROTOCOLO", "NATUREZA", "CODIGO"
-    ]
-    
-    return any(keyword in text_upper for keyword in label_keywords)
+    return _LABEL_KEYWORDS_REGEX.search(text.upper()) is not None
 
 
 def _categorize_danfe_field(label: str) -> str:
@@ -202,9 +422,8 @@ def _calculate_confidence(label: str, value: str) -> float:
         return 0.7
 
 
-def test_danfe():
-    """Função de teste rápido."""
-    pdf_file = "DANFE_312057.PDF"
+def test_danfe(pdf_file: str):
+    """Teste rápido: python -m backend.danfe_converter caminho/do/danfe.pdf"""
     
     print("🚀 Testando extração de DANFE...")
     result = converter_danfe(pdf_file)
@@ -242,4 +461,8 @@ def test_danfe():
 
 
 if __name__ == "__main__":
-    test_danfe()
\ No newline at end of file
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.exit("uso: python -m backend.danfe_converter caminho/do/danfe.pdf")
+    test_danfe(sys.argv[1])
\ No newline at end of file
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Partes do resultado que podem ser pedidas com fields= (ex.: "texts,tables")
+CAMPOS_ARQUIVO = ("texts", "tables", "metadata")
+# DANFE: "texts" são os pares chave-valor; "plain_texts" (os textos limpos)
+# só entra quando pedido explicitamente
+CAMPOS_DANFE = ("texts", "tables", "metadata", "plain_texts")
+CAMPOS_PADRAO_DANFE = ("texts", "tables", "metadata")
+
+
+def resolver_campos(fields: Optional[Union[str, Iterable[str]]], validos: Tuple[str, ...],
+                    padrao: Optional[Tuple[str, ...]] = None) -> Tuple[str, ...]:
+    """
+    Normaliza `fields` ("texts,tables" ou lista de nomes) para uma tupla na
+    ordem de `validos`, estável para a chave do cache. None ou vazio devolve
+    `padrao` (todos os válidos, se omitido). ValueError para nomes desconhecidos.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    pedidos = {campo.strip() for campo in fields or () if campo.strip()}
+    if not pedidos:
+        return padrao or validos
+    desconhecidos = pedidos.difference(validos)
+    if desconhecidos:
+        raise ValueError(
+            f"fields desconhecidos: {', '.join(sorted(desconhecidos))} "
+            f"(válidos: {', '.join(validos)})"
+        )
+    return tuple(campo for campo in validos if campo in pedidos)
+
+
+def textos_limpos(doc) -> List[str]:
+    """Textos não vazios dos itens do documento, sem passar por export_to_dict()."""
+    return [texto for texto in (item.text.strip() for item in doc.texts) if texto]
+
+
+def metadados(doc) -> Dict[str, Any]:
+    """O campo metadata do documento, serializado como em export_to_dict()."""
+    return doc.model_dump(mode="json", by_alias=True, exclude_none=True,
+                          include={"metadata"}).get("metadata", {})
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from backend.metrics import etapa, registrar_entrada
+
+logger = logging.getLogger(__name__)
+
+# Limites de tamanho (bytes) via variáveis de ambiente
+MAX_UPLOAD_BYTES = int(os.getenv("DOCLING_MAX_UPLOAD_BYTES", str(200 * 1024 ** 2)))
+MAX_ARCHIVE_BYTES = int(os.getenv("DOCLING_MAX_ARCHIVE_BYTES", str(4 * 1024 ** 3)))
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ArquivoRecebido:
+    """Upload gravado em disco, com hash SHA-256 e tamanho calculados na cópia."""
+    path: str
+    filename: str
+    sha256: str
+    tamanho: int
+
+    @property
+    def suffix(self) -> str:
+        return Path(self.filename).suffix.lower()
+
+    def remover(self) -> None:
+        try:
+            Path(self.path).unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Erro ao remover %s: %s", self.path, e)
+
+
+def _erro_tamanho(limite: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo excede o limite de {limite // (1024 ** 2)} MB",
+    )
+
+
+def _verificar_tamanho_declarado(file: UploadFile, limite: int) -> None:
+    # Recusa cedo quando o tamanho já é conhecido (Starlette >= 0.24 preenche .size)
+    tamanho = getattr(file, "size", None)
+    if tamanho is not None and tamanho > limite:
+        raise _erro_tamanho(limite)
+
+
+def _novo_temporario(filename: str, diretorio: Optional[str]):
+    suffix = Path(filename or "").suffix or ""
+    return tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=diretorio)
+
+
+def copiar_em_blocos(origem: BinaryIO, destino: BinaryIO, limite: int) -> tuple:
+    """
+    Copia `origem` para `destino` em blocos de CHUNK_SIZE, calculando o
+    SHA-256 e o total de bytes na mesma passada. Levanta 413 ao passar do limite.
+    Retorna (sha256_hex, tamanho).
+    """
+    digest = hashlib.sha256()
+    tamanho = 0
+    while True:
+        bloco = origem.read(CHUNK_SIZE)
+        if not bloco:
+            break
+        tamanho += len(bloco)
+        if tamanho > limite:
+            raise _erro_tamanho(limite)
+        digest.update(bloco)
+        destino.write(bloco)
+    return digest.hexdigest(), tamanho
+
+
+def salvar_upload(file: UploadFile, limite: int = MAX_UPLOAD_BYTES,
+                  diretorio: Optional[str] = None) -> ArquivoRecebido:
+    """
+    Grava o UploadFile em um arquivo temporário sem carregá-lo inteiro em
+    memória. Para endpoints síncronos (def).
+    """
+    _verificar_tamanho_declarado(file, limite)
+    tmp = _novo_temporario(file.filename, diretorio)
+    try:
+        with etapa("upload"), tmp:
+            sha256, tamanho = copiar_em_blocos(file.file, tmp, limite)
+    except BaseException:
+        Path(tmp.name).unlink(missing_ok=True)
+        raise
+    registrar_entrada(tamanho=tamanho)
+    return ArquivoRecebido(tmp.name, file.filename or "", sha256, tamanho)
+
+
+async def salvar_upload_async(file: UploadFile, limite: int = MAX_UPLOAD_BYTES,
+                              diretorio: Optional[str] = None) -> ArquivoRecebido:
+    """Versão para endpoints async: lê o upload em blocos com `await file.read()`."""
+    _verificar_tamanho_declarado(file, limite)
+    tmp = _novo_temporario(file.filename, diretorio)
+    digest = hashlib.sha256()
+    tamanho = 0
+    try:
+        with etapa("upload"), tmp:
+            while True:
+                bloco = await file.read(CHUNK_SIZE)
+                if not bloco:
+                    break
+                tamanho += len(bloco)
+                if tamanho > limite:
+                    raise _erro_tamanho(limite)
+                digest.update(bloco)
+                await run_in_threadpool(tmp.write, bloco)
+    except BaseException:
+        Path(tmp.name).unlink(missing_ok=True)
+        raise
+    registrar_entrada(tamanho=tamanho)
+    return ArquivoRecebido(tmp.name, file.filename or "", digest.hexdigest(), tamanho)
@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from backend.archive import ARQUIVO_RELATORIO, nome_saida, planejar_arquivo
+from backend.converter import converter_arquivo, iterar_plano
+from backend.danfe_converter import converter_danfe
+from backend.scheduler import FilaCheia, Vaga, obter_agendador, peso_lote
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+JOBS_DIR = Path(os.getenv("DOCLING_JOBS_DIR", Path(tempfile.gettempdir()) / "docling_jobs"))
+JOBS_WORKERS = int(os.getenv("DOCLING_JOBS_WORKERS", "2"))
+JOBS_TTL_SECONDS = int(os.getenv("DOCLING_JOBS_TTL_SECONDS", str(24 * 3600)))
+_INTERVALO_LIMPEZA = 600
+
+TIPOS_JOB = {"file", "danfe", "archive"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    feitos INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    erro TEXT,
+    opcoes TEXT NOT NULL DEFAULT '{}',
+    pid INTEGER,
+    criado_em REAL NOT NULL,
+    concluido_em REAL,
+    expira_em REAL NOT NULL
+)
+"""
+
+
+class JobStore:
+    """
+    Estado dos jobs em SQLite (modo WAL), compartilhável entre os workers
+    do uvicorn na mesma máquina.
+    """
+
+    def __init__(self, caminho: Path):
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(caminho), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+            self._migrar()
+
+    def _migrar(self) -> None:
+        # Bancos criados por versões anteriores não têm as colunas mais novas
+        colunas = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "opcoes" not in colunas:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN opcoes TEXT NOT NULL DEFAULT '{}'")
+
+    def criar(self, job_id: str, tipo: str, filename: str, opcoes: Dict[str, Any], ttl: int) -> None:
+        """Insere o job como 'receiving': fora de pendentes() até a entrada estar gravada."""
+        agora = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, tipo, filename, status, opcoes, criado_em, expira_em) "
+                "VALUES (?, ?, ?, 'receiving', ?, ?, ?)",
+                (job_id, tipo, filename, json.dumps(opcoes), agora, agora + ttl),
+            )
+
+    def reivindicar(self, job_id: str) -> bool:
+        """Marca o job como 'running' se ainda estiver na fila; False se outro processo já o pegou."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'running', pid = ? WHERE id = ? AND status = 'queued'",
+                (os.getpid(), job_id),
+            )
+            return cur.rowcount == 1
+
+    def atualizar(self, job_id: str, **campos) -> None:
+        colunas = ", ".join(f"{nome} = ?" for nome in campos)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {colunas} WHERE id = ?", (*campos.values(), job_id))
+
+    def obter(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def pendentes(self) -> list:
+        """Jobs na fila ou em execução (possivelmente órfãos de um processo encerrado)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY criado_em"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def remover_expirados(self, agora: float) -> list:
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE expira_em < ? AND status NOT IN ('queued', 'running')",
+                (agora,),
+            ).fetchall()
+            ids = [r["id"] for r in rows]
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+        return ids
+
+
+def _processo_vivo(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class JobManager:
+    """
+    Fila local de jobs de conversão. Cada job guarda a entrada e o resultado em
+    JOBS_DIR/<id>/ e é executado por um pool de threads que chama as mesmas
+    funções dos endpoints síncronos (converter_arquivo, converter_danfe,
+    iterar_plano), com vagas do mesmo agendador (DOCLING_MAX_CONCURRENT).
+    """
+
+    def __init__(self, diretorio: Path = JOBS_DIR, workers: int = JOBS_WORKERS,
+                 ttl: int = JOBS_TTL_SECONDS):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.store = JobStore(diretorio / "jobs.sqlite3")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._parar = threading.Event()
+
+    def pasta(self, job_id: str) -> Path:
+        return self.diretorio / job_id
+
+    def caminho_entrada(self, job_id: str, filename: str) -> Path:
+        return self.pasta(job_id) / f"entrada{Path(filename).suffix.lower()}"
+
+    def caminho_resultado(self, job: Dict[str, Any]) -> Path:
+        extensao = ".zip" if job["tipo"] == "archive" else ".json"
+        return self.pasta(job["id"]) / f"resultado{extensao}"
+
+    def iniciar(self) -> None:
+        """Retoma jobs pendentes (inclusive de processos encerrados) e inicia a limpeza periódica."""
+        for job in self.store.pendentes():
+            if job["status"] == "running":
+                if _processo_vivo(job["pid"]):
+                    continue
+                self.store.atualizar(job["id"], status="queued", feitos=0)
+            self._executor.submit(self._executar, job["id"])
+        threading.Thread(target=self._loop_limpeza, daemon=True, name="jobs-limpeza").start()
+
+    def encerrar(self) -> None:
+        self._parar.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def novo_job(self, tipo: str, filename: str, opcoes: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Cria o registro e a pasta do job; a entrada deve ser gravada em
+        caminho_entrada() antes de enfileirar(). `opcoes` são repassadas ao
+        conversor (ex.: perfil).
+        """
+        job_id = uuid.uuid4().hex
+        self.pasta(job_id).mkdir(parents=True, exist_ok=True)
+        self.store.criar(job_id, tipo, filename, opcoes or {}, self.ttl)
+        return job_id
+
+    def descartar(self, job_id: str) -> None:
+        """Remove um job que não chegou a ser enfileirado (ex.: upload recusado)."""
+        self.store.atualizar(job_id, status="failed", erro="upload recusado", expira_em=0)
+        shutil.rmtree(self.pasta(job_id), ignore_errors=True)
+
+    def enfileirar(self, job_id: str) -> None:
+        """Chamado com a entrada já gravada: só então o job fica visível como 'queued'."""
+        self.store.atualizar(job_id, status="queued")
+        self._executor.submit(self._executar, job_id)
+
+    def _vaga(self, peso: int = 1) -> Vaga:
+        """Vaga no agendador dos endpoints; com a fila cheia, espera o Retry-After e tenta de novo."""
+        while True:
+            try:
+                return obter_agendador().admitir(peso=peso)
+            except FilaCheia as e:
+                if self._parar.wait(e.retry_after):
+                    raise RuntimeError("Servidor encerrando")
+
+    def _executar(self, job_id: str) -> None:
+        if not self.store.reivindicar(job_id):
+            return
+        job = self.store.obter(job_id)
+        entrada = self.caminho_entrada(job_id, job["filename"])
+        resultado_path = self.caminho_resultado(job)
+        opcoes = json.loads(job["opcoes"])
+        try:
+            if job["tipo"] == "archive":
+                self._executar_archive(job, entrada, resultado_path, opcoes)
+            else:
+                converter = converter_danfe if job["tipo"] == "danfe" else converter_arquivo
+                with self._vaga():
+                    resultado = converter(str(entrada), **opcoes)
+                if "error" in resultado:
+                    raise RuntimeError(resultado["error"])
+                with open(resultado_path, "w", encoding="utf-8") as f:
+                    json.dump(resultado, f, ensure_ascii=False)
+                self.store.atualizar(job_id, feitos=1, total=1)
+        except Exception as e:
+            logger.error("Job %s falhou: %s", job_id, e)
+            self.store.atualizar(
+                job_id, status="failed", erro=str(e),
+                concluido_em=time.time(), expira_em=time.time() + self.ttl,
+            )
+            return
+        finally:
+            entrada.unlink(missing_ok=True)
+
+        self.store.atualizar(
+            job_id, status="done", concluido_em=time.time(), expira_em=time.time() + self.ttl
+        )
+
+    def _executar_archive(self, job: Dict[str, Any], entrada: Path, resultado_path: Path,
+                          opcoes: Dict[str, Any]) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            plano = planejar_arquivo(str(entrada), entrada.suffix, temp_dir)
+            self.store.atualizar(job["id"], total=plano.total)
+
+            feitos = 0
+            with zipfile.ZipFile(resultado_path, "w", zipfile.ZIP_DEFLATED) as zf_out:
+                zf_out.writestr(ARQUIVO_RELATORIO, json.dumps(plano.relatorio(), ensure_ascii=False))
+                with self._vaga(peso_lote(len(plano.caminhos))) as vaga:
+                    for rel, conteudo in iterar_plano(plano, em_voo=vaga.peso, **opcoes):
+                        arcname = nome_saida(rel)
+                        zf_out.writestr(arcname, json.dumps(conteudo, ensure_ascii=False))
+                        feitos += 1
+                        self.store.atualizar(job["id"], feitos=feitos)
+
+    def _loop_limpeza(self) -> None:
+        while not self._parar.wait(_INTERVALO_LIMPEZA):
+            self.limpar_expirados()
+
+    def limpar_expirados(self) -> None:
+        """Remove registros e arquivos de jobs cujo resultado passou do TTL."""
+        for job_id in self.store.remover_expirados(time.time()):
+            shutil.rmtree(self.pasta(job_id), ignore_errors=True)
+
+
+_MANAGER: Optional[JobManager] = None
+
+
+def obter_manager() -> JobManager:
+    """Instância única do gerenciador de jobs, criada na primeira chamada."""
+    global _MANAGER
+    if _MANAGER is None:
+        _MANAGER = JobManager()
+    return _MANAGER
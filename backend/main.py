@@ -1,116 +1,162 @@
-import io
-import json
+import itertools
 import logging
+import os
+import shutil
 import tempfile
-import zipfile, rarfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import List, Optional, Tuple
 
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi import FastAPI, UploadFile, File, BackgroundTasks, Body, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
-from backend.converter import converter_arquivo, processar_pasta
-from backend.danfe_converter import converter_danfe
+from backend.archive import (
+    ARQUIVO_RELATORIO, EXTENSOES_ARQUIVO, ArquivoInvalido, PlanoArquivo, nome_saida, planejar_arquivo,
+    zip_em_fluxo,
+)
+from backend.cache import obter_cache
+from backend.converter import converter_arquivo, iterar_plano
+from backend.danfe_converter import converter_danfe, iterar_danfes
+from backend.fields import CAMPOS_ARQUIVO, CAMPOS_DANFE, CAMPOS_PADRAO_DANFE, resolver_campos
+from backend.ingest import MAX_ARCHIVE_BYTES, MAX_UPLOAD_BYTES, ArquivoRecebido, salvar_upload, salvar_upload_async
+from backend.jobs import TIPOS_JOB, obter_manager
+from backend.metrics import etapa, medir_requisicao, registrar_entrada, registrar_etapa, renderizar_metricas
+from backend.nfe_xml import converter_nfe_xml
+from backend.pipelines import PERFIL_PADRAO, PERFIS_VALIDOS, estado_aquecimento, iniciar_aquecimento
+from backend.responses import resposta_json, serializar_json
+from backend.scheduler import FilaCheia, Vaga, obter_agendador, peso_lote
+from backend.tables import FORMATOS_TABELA
+from backend.uploads import obter_uploads
+from backend.url_fetch import URL_MAX_CONCORRENTES, ErroDownload, baixar_url
+from backend.workers import encerrar_pool, resolver_workers, submeter_em_pool
+from backend.xml_stream import XML_RECORD_DEPTH, gerar_array_json, gerar_ndjson
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
+app.middleware("http")(medir_requisicao)  # tempos por etapa e Server-Timing
 
-def _remove_file(path: str):
+
+@app.on_event("startup")
+def _iniciar_jobs():
+    obter_manager().iniciar()
+
+
+@app.on_event("startup")
+def _aquecer_conversores():
+    iniciar_aquecimento()
+
+
+@app.on_event("shutdown")
+def _encerrar_workers():
+    obter_manager().encerrar()
+    encerrar_pool()
+
+
+def _validar_opcoes(perfil: str, table_format: str):
+    if perfil not in PERFIS_VALIDOS:
+        raise HTTPException(400, detail=f"perfil deve ser um de: {', '.join(PERFIS_VALIDOS)}")
+    if table_format not in FORMATOS_TABELA:
+        raise HTTPException(400, detail=f"table_format deve ser um de: {', '.join(FORMATOS_TABELA)}")
+
+
+def _validar_campos(fields: Optional[str], danfe: bool = False) -> Tuple[str, ...]:
+    """fields=texts,tables -> ("texts", "tables"); 400 para nomes desconhecidos."""
     try:
-        Path(path).unlink()
-    except Exception as e:
-        logger.warning("Erro ao remover %s: %s", path, e)
-        
+        if danfe:
+            return resolver_campos(fields, CAMPOS_DANFE, CAMPOS_PADRAO_DANFE)
+        return resolver_campos(fields, CAMPOS_ARQUIVO)
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+
+
+def _admitir(tamanho: Optional[int] = None, peso: int = 1) -> Vaga:
+    """Reserva uma vaga de conversão ou responde 429 com Retry-After."""
+    try:
+        vaga = obter_agendador().admitir(tamanho, peso)
+        registrar_etapa("fila", vaga.espera)
+        return vaga
+    except FilaCheia as e:
+        raise HTTPException(429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 
 @app.post("/upload-file/")
 def upload_file(
+    request: Request,
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
-    
+    file: UploadFile = File(...),
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
 ):
     """
     Recebe um UploadFile, salva temporariamente, converte e devolve
-    o JSON resultante como arquivo, limpando temporários após a resposta.
+    o JSON resultante como anexo, limpando o temporário após a resposta.
+    perfil: pipeline de PDF (fast, standard, full ou auto).
+    table_format: "records" (lista de dicts) ou "columnar" (columns + rows).
+    fields: partes do resultado, separadas por vírgula (texts, tables,
+    metadata; padrão: todas). Só as pedidas são calculadas.
     """
+    _validar_opcoes(perfil, table_format)
+    campos = _validar_campos(fields)
     try:
-        # 1) Salvar arquivo recebido em temp file
-        suffix = Path(file.filename).suffix or ""
-        tmp_input = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-        tmp_input.write(file.file.read())                              # I/O em disco controlado
-        tmp_input.flush()
-        tmp_input.close()
-
-        # 2) Converter documento
-        resultado = converter_arquivo(tmp_input.name)
-
-        # 3) Gravar JSON em arquivo temporário
-        tmp_json = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-        tmp_json.write(json.dumps(resultado, ensure_ascii=False).encode())
-        tmp_json.flush()
-        tmp_json.close()
-
-        # 4) Agendar limpeza dos temporários
-        background_tasks.add_task(_remove_file, tmp_input.name)         # Limpeza em background
-        background_tasks.add_task(_remove_file, tmp_json.name)
-
-        # 5) Retornar JSON como FileResponse
-        return FileResponse(
-            path=tmp_json.name,
-            media_type="application/json",
-            filename=f"{Path(file.filename).stem}.json"
-        )
+        # 1) Salvar arquivo recebido em disco, em blocos (hash calculado na cópia)
+        recebido = salvar_upload(file)
+        background_tasks.add_task(recebido.remover)                     # Limpeza em background
+        return _responder_arquivo(request, recebido, perfil, table_format, campos)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Erro em /upload-file/: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _responder_arquivo(request: Request, recebido: ArquivoRecebido, perfil: str,
+                       table_format: str, campos: Tuple[str, ...]):
+    """Passos 2 e 3 de /upload-file/, com o arquivo já em disco."""
+    # 2) Converter documento (aguardando vaga no agendador)
+    with _admitir(recebido.tamanho):
+        resultado = converter_arquivo(
+            recebido.path, content_hash=recebido.sha256, perfil=perfil, table_format=table_format,
+            fields=campos,
+        )
+
+    # 3) Retornar o JSON direto da memória (comprimido se o cliente aceitar)
+    return resposta_json(resultado, request, filename=f"{Path(recebido.filename).stem}.json")
+
+
 @app.post("/upload-danfe/")
 def upload_danfe(
+    request: Request,
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
 ):
     """
     Recebe um arquivo DANFE (PDF), processa com extração de key-value pairs
     e retorna JSON estruturado com texts, tables e metadata.
+    perfil: pipeline de PDF (fast, standard, full ou auto).
+    table_format: "records" (lista de dicts) ou "columnar" (columns + rows).
+    fields: partes do resultado, separadas por vírgula (texts, tables,
+    metadata e plain_texts; padrão: as três primeiras). fields=texts devolve
+    só os key-value pairs.
     """
+    _validar_opcoes(perfil, table_format)
+    campos = _validar_campos(fields, danfe=True)
     try:
         # Validar se é PDF
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Arquivo deve ser um PDF")
         
-        # 1) Salvar arquivo recebido em temp file
-        suffix = Path(file.filename).suffix or ""
-        tmp_input = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-        tmp_input.write(file.file.read())
-        tmp_input.flush()
-        tmp_input.close()
-
-        # 2) Converter DANFE com extração específica
-        resultado = converter_danfe(tmp_input.name)
-
-        # 3) Verificar se houve erro no processamento
-        if "error" in resultado:
-            background_tasks.add_task(_remove_file, tmp_input.name)
-            raise HTTPException(status_code=400, detail=resultado["error"])
-
-        # 4) Gravar JSON em arquivo temporário
-        tmp_json = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-        tmp_json.write(json.dumps(resultado, ensure_ascii=False).encode())
-        tmp_json.flush()
-        tmp_json.close()
-
-        # 5) Agendar limpeza dos temporários
-        background_tasks.add_task(_remove_file, tmp_input.name)
-        background_tasks.add_task(_remove_file, tmp_json.name)
-
-        # 6) Retornar JSON como FileResponse
-        return FileResponse(
-            path=tmp_json.name,
-            media_type="application/json",
-            filename=f"{Path(file.filename).stem}_danfe.json"
-        )
+        # 1) Salvar arquivo recebido em disco, em blocos (hash calculado na cópia)
+        recebido = salvar_upload(file)
+        background_tasks.add_task(recebido.remover)
+        return _responder_danfe(request, recebido, perfil, table_format, campos)
 
     except HTTPException:
         # Re-raise HTTPException para manter status code
@@ -119,70 +165,618 @@ def upload_danfe(
         logger.error("Erro em /upload-danfe/: %s", e)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-   
+
+def _responder_danfe(request: Request, recebido: ArquivoRecebido, perfil: str,
+                     table_format: str, campos: Tuple[str, ...]):
+    """Passos 2 a 4 de /upload-danfe/, com o PDF já em disco."""
+    # 2) Converter DANFE com extração específica (aguardando vaga no agendador)
+    with _admitir(recebido.tamanho):
+        resultado = converter_danfe(
+            recebido.path, content_hash=recebido.sha256, perfil=perfil, table_format=table_format,
+            fields=campos,
+        )
+
+    # 3) Verificar se houve erro no processamento
+    if "error" in resultado:
+        recebido.remover()
+        raise HTTPException(status_code=400, detail=resultado["error"])
+
+    # 4) Retornar o JSON direto da memória (comprimido se o cliente aceitar)
+    return resposta_json(resultado, request, filename=f"{Path(recebido.filename).stem}_danfe.json")
+
+
+def _nome_unico(nome: str, usados: set) -> str:
+    unico, n = nome, 1
+    while unico in usados:
+        n += 1
+        unico = f"{nome}#{n}"
+    usados.add(unico)
+    return unico
+
+
+@app.post("/upload-danfe-batch/")
+async def upload_danfe_batch(
+    files: List[UploadFile] = File(...),
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
+):
+    """
+    Recebe vários DANFEs (PDFs e/ou .zip/.rar com PDFs) numa única requisição,
+    converte em paralelo no pool de processos e devolve NDJSON em streaming:
+    uma linha {"arquivo": ..., texts, tables, metadata} por nota, na ordem em
+    que terminam. Erros de um arquivo vêm na própria linha ({"arquivo", "error"}).
+    fields: como em /upload-danfe/.
+    """
+    _validar_opcoes(perfil, table_format)
+    campos = _validar_campos(fields, danfe=True)
+    registrar_entrada(doc_type="danfe")
+    temp_dir = tempfile.TemporaryDirectory()
+    plano = PlanoArquivo()   # PDFs distintos do lote; repetidos são convertidos uma vez
+    erros = []               # linhas de erro enviadas antes das conversões
+    usados = set()
+    tamanho_total = 0
+
+    try:
+        for indice, file in enumerate(files):
+            nome = _nome_unico(file.filename or f"arquivo_{indice}", usados)
+            suffix = Path(file.filename or "").suffix.lower()
+            if suffix != ".pdf" and suffix not in EXTENSOES_ARQUIVO:
+                erros.append({"arquivo": nome, "error": "Arquivo deve ser PDF, .zip ou .rar"})
+                continue
+
+            limite = MAX_ARCHIVE_BYTES if suffix in EXTENSOES_ARQUIVO else MAX_UPLOAD_BYTES
+            try:
+                recebido = await salvar_upload_async(file, limite=limite, diretorio=temp_dir.name)
+            except HTTPException as e:
+                erros.append({"arquivo": nome, "error": e.detail})
+                continue
+            tamanho_total += recebido.tamanho
+
+            if suffix == ".pdf":
+                plano.adicionar(nome, recebido.sha256, recebido.path)
+                continue
+
+            # Arquivo compactado: cada PDF dentro dele entra no lote
+            try:
+                with etapa("extracao"):
+                    membros = await run_in_threadpool(
+                        planejar_arquivo, recebido.path, suffix,
+                        str(Path(temp_dir.name) / f"extraido_{indice}"), {".pdf"},
+                    )
+            except ArquivoInvalido as e:
+                erros.append({"arquivo": nome, "error": str(e)})
+                continue
+            finally:
+                recebido.remover()
+            for ignorado in membros.ignorados:
+                erros.append({"arquivo": f"{nome}/{ignorado['arquivo']}", "error": ignorado["motivo"]})
+            for sha256, nomes_membro in membros.nomes.items():
+                for membro in nomes_membro:
+                    plano.adicionar(_nome_unico(f"{nome}/{membro}", usados), sha256, membros.caminhos[sha256])
+
+        vaga = await run_in_threadpool(_admitir, tamanho_total, peso_lote(len(plano.caminhos)))
+    except BaseException:
+        temp_dir.cleanup()
+        raise
+
+    def _gerar_ndjson():
+        try:
+            for linha in erros:
+                yield serializar_json(linha) + b"\n"
+            lote = {sha256: (path, sha256) for sha256, path in plano.caminhos.items()}
+            resultados = iterar_danfes(lote, perfil=perfil, table_format=table_format, fields=campos,
+                                       em_voo=vaga.peso)
+            for nome, resultado in plano.expandir(resultados):
+                yield serializar_json({"arquivo": nome, **resultado}) + b"\n"
+        finally:
+            vaga.liberar()
+            temp_dir.cleanup()
+
+    return StreamingResponse(_gerar_ndjson(), media_type="application/x-ndjson")
+
+
 @app.post("/upload-archive/")
-async def upload_archive(file: UploadFile = File(...)):
+async def upload_archive(
+    file: UploadFile = File(...),
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
+):
     """
-    Recebe um arquivo .zip ou .rar, extrai,
-    processa com processar_pasta() e retorna um ZIP de JSONs.
+    Recebe um arquivo .zip ou .rar, seleciona os membros suportados (lidos
+    direto do arquivo, sem extrair a árvore; conteúdos repetidos convertidos
+    uma vez só), processa com iterar_plano() e retorna um ZIP de JSONs gerado
+    em streaming, com o relatório _ignorados.json.
+    perfil: pipeline de PDF (fast, standard, full ou auto).
+    table_format: "records" (lista de dicts) ou "columnar" (columns + rows).
+    fields: como em /upload-file/.
     """
+    _validar_opcoes(perfil, table_format)
+    campos = _validar_campos(fields)
     filename = Path(file.filename)
     suffix = filename.suffix.lower()
 
     # 1) Validar extensão
-    if suffix not in {".zip", ".rar"}:
+    if suffix not in EXTENSOES_ARQUIVO:
         raise HTTPException(400, detail="Arquivo deve ser .zip ou .rar")
 
-    # 2) Ler conteúdo em memória
-    content = await file.read()
-    buffer_in = io.BytesIO(content)
+    # 2) Gravar o arquivo em disco, em blocos, respeitando o limite de tamanho
+    registrar_entrada(doc_type="archive")
+    recebido = await salvar_upload_async(file, limite=MAX_ARCHIVE_BYTES)
+    return await run_in_threadpool(_responder_archive, recebido, perfil, table_format, campos)
+
 
-    # 3) Extrair segundo o tipo de arquivo
+def _responder_archive(recebido: ArquivoRecebido, perfil: str, table_format: str,
+                       campos: Tuple[str, ...]) -> StreamingResponse:
+    """Passos 3 a 6 de /upload-archive/; consome (remove) o arquivo recebido."""
+    # 3) Listar, filtrar e copiar os membros suportados
     temp_dir = tempfile.TemporaryDirectory()
     try:
-        if suffix == ".zip":
-            with zipfile.ZipFile(buffer_in) as zf:
-                zf.extractall(temp_dir.name)
-        else:  # .rar
-            with rarfile.RarFile(buffer_in) as rf:
-                rf.extractall(path=temp_dir.name)
-    except zipfile.BadZipFile:
-        raise HTTPException(400, detail="ZIP inválido ou corrompido")
-    except rarfile.BadRarFile:
-        raise HTTPException(400, detail="RAR inválido ou corrompido")
-    except Exception as e:
-        raise HTTPException(400, detail=f"Falha ao extrair arquivo: {e}")
-
-    # 4) Processar todos os arquivos da pasta extraída
-    resultados = processar_pasta(temp_dir.name)
+        with etapa("extracao"):
+            plano = planejar_arquivo(recebido.path, recebido.suffix, temp_dir.name)
+    except ArquivoInvalido as e:
+        temp_dir.cleanup()
+        raise HTTPException(400, detail=str(e))
+    finally:
+        recebido.remover()
 
-    # 5) Empacotar resultados em um ZIP em memória
-    buffer_out = io.BytesIO()
-    with zipfile.ZipFile(buffer_out, "w", zipfile.ZIP_DEFLATED) as zf_out:
-        for rel, conteudo in resultados.items():
-            arcname = f"{Path(rel).stem}.json"
-            zf_out.writestr(arcname, json.dumps(conteudo, ensure_ascii=False))
+    # 4) Reservar vaga no agendador antes de começar a responder
+    try:
+        vaga = _admitir(recebido.tamanho, peso_lote(len(plano.caminhos)))
+    except HTTPException:
+        temp_dir.cleanup()
+        raise
 
-    buffer_out.seek(0)
-    temp_dir.cleanup()  # limpa a pasta temporária
+    # 5) Converter os membros (pool de processos) e enviar cada JSON
+    #    comprimido assim que sua conversão termina
+    def _gerar_zip():
+        try:
+            convertidos = (
+                (nome_saida(rel), serializar_json(conteudo))
+                for rel, conteudo in iterar_plano(plano, perfil=perfil, table_format=table_format, fields=campos,
+                                                  em_voo=vaga.peso)
+            )
+            relatorio = [(ARQUIVO_RELATORIO, serializar_json(plano.relatorio()))]
+            yield from zip_em_fluxo(itertools.chain(relatorio, convertidos))
+        finally:
+            vaga.liberar()
+            temp_dir.cleanup()  # limpa a pasta temporária
 
-    # 6) Retornar o ZIP final
+    # 6) Retornar o ZIP em streaming
     return StreamingResponse(
-        buffer_out,
+        _gerar_zip(),
         media_type="application/zip",
         headers={"Content-Disposition": 'attachment; filename="resultados.zip"'}
     )
 
 
+@app.post("/upload-nfe-xml/")
+def upload_nfe_xml(request: Request, files: List[UploadFile] = File(...)):
+    """
+    Recebe um ou mais XMLs de NF-e (NFe ou nfeProc) e extrai chave de acesso,
+    emitente, destinatário, totais, itens e protocolo direto do XML, sem Docling.
+    Cada resultado segue a estrutura de /upload-danfe/ (texts com label/value/category).
+    """
+    registrar_entrada(doc_type="nfe_xml")
+    resultados = []
+    for file in files:
+        if not (file.filename or "").lower().endswith(".xml"):
+            resultados.append({"arquivo": file.filename, "error": "Arquivo deve ser um XML"})
+            continue
+        try:
+            recebido = salvar_upload(file)
+        except HTTPException as e:
+            # Um arquivo grande demais não derruba os demais do lote
+            resultados.append({"arquivo": file.filename, "error": e.detail})
+            continue
+        try:
+            with etapa("xml"):
+                resultado = converter_nfe_xml(recebido.path)
+        finally:
+            recebido.remover()
+        resultados.append({"arquivo": file.filename, **resultado})
+    return resposta_json(resultados, request)
+
+
+@app.post("/upload-xml-stream/")
+def upload_xml_stream(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    profundidade: int = XML_RECORD_DEPTH,
+    formato: str = "ndjson",
+):
+    """
+    Converte XMLs grandes em streaming: cada elemento na `profundidade` pedida
+    (1 = raiz, 2 = filhos da raiz) vira um registro no formato do xmltodict.
+    formato: "ndjson" (um registro por linha) ou "json" (array JSON em streaming).
+    """
+    if not file.filename.lower().endswith(".xml"):
+        raise HTTPException(400, detail="Arquivo deve ser um XML")
+    if formato not in ("ndjson", "json"):
+        raise HTTPException(400, detail="formato deve ser ndjson ou json")
+    if profundidade < 1:
+        raise HTTPException(400, detail="profundidade deve ser >= 1")
+
+    registrar_entrada(doc_type="xml")
+    # Exportações XML de centenas de MB são o caso de uso: limite de compactados
+    recebido = salvar_upload(file, limite=MAX_ARCHIVE_BYTES)
+    background_tasks.add_task(recebido.remover)
+    if formato == "ndjson":
+        return StreamingResponse(
+            gerar_ndjson(recebido.path, profundidade), media_type="application/x-ndjson"
+        )
+    return StreamingResponse(
+        gerar_array_json(recebido.path, profundidade), media_type="application/json"
+    )
+
+
 @app.post("/process-url/")
-def process_url(url: str):
+def process_url(
+    request: Request,
+    url: str,
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
+):
     """
-    Converte diretamente uma URL e devolve o JSON como resposta.
+    Baixa a URL (sessão HTTP compartilhada, com revalidação por
+    ETag/Last-Modified no cache local), converte e devolve o JSON como resposta.
+    fields: como em /upload-file/.
     """
+    _validar_opcoes(perfil, table_format)
+    campos = _validar_campos(fields)
     try:
-        resultado = converter_arquivo(url)
-        return JSONResponse(content=resultado)
+        with etapa("download"):
+            baixada = baixar_url(url)
+        with _admitir(baixada.tamanho):
+            resultado = converter_arquivo(
+                baixada.path, content_hash=baixada.sha256, perfil=perfil, table_format=table_format,
+                fields=campos,
+            )
+        return resposta_json(resultado, request)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Erro em /process-url/: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@app.post("/process-urls/")
+def process_urls(
+    urls: List[str] = Body(..., embed=True),
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
+):
+    """
+    Converte uma lista de URLs ({"urls": [...]}) e devolve NDJSON em streaming:
+    uma linha {"url": ..., texts, tables, metadata} por URL, na ordem em que
+    terminam. Downloads em paralelo (até DOCLING_URL_MAX_CONCURRENT); cada
+    URL vai para o pool de processos assim que termina de baixar, com no
+    máximo uma conversão por vaga reservada no agendador. Erros de uma URL
+    vêm na própria linha.
+    fields: como em /upload-file/.
+    """
+    _validar_opcoes(perfil, table_format)
+    campos = _validar_campos(fields)
+    if not urls:
+        raise HTTPException(400, detail="Informe ao menos uma URL")
+    vaga = _admitir(peso=peso_lote(len(urls)))
+
+    def _gerar_ndjson():
+        pendentes = {}  # futuro -> (índice da URL, baixada ou None durante o download)
+        baixadas = []   # downloads concluídos aguardando uma das `vaga.peso` conversões
+        try:
+            with ThreadPoolExecutor(min(len(urls), URL_MAX_CONCORRENTES)) as executor:
+                for i, url in enumerate(urls):
+                    pendentes[executor.submit(baixar_url, url)] = (i, None)
+                while pendentes:
+                    prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                    for fut in prontos:
+                        indice, baixada = pendentes.pop(fut)
+                        url = urls[indice]
+                        try:
+                            if baixada is None:
+                                # Download concluído: converte assim que houver vaga, sem esperar as demais URLs
+                                baixadas.append((indice, fut.result()))
+                                continue
+                            resultado = fut.result()
+                        except ErroDownload as e:
+                            resultado = {"error": str(e)}
+                        except Exception as e:
+                            logger.error("Falha ao processar %s: %s", url, e)
+                            resultado = {"error": f"Não foi possível processar '{url}': {e}"}
+                        yield serializar_json({"url": url, **resultado}) + b"\n"
+
+                    em_conversao = sum(1 for _, b in pendentes.values() if b is not None)
+                    while baixadas and em_conversao < vaga.peso:
+                        indice, baixada = baixadas.pop(0)
+                        args = (baixada.path, baixada.sha256, perfil, table_format, campos)
+                        try:
+                            if resolver_workers() == 1:
+                                conversao = executor.submit(converter_arquivo, *args)
+                            else:
+                                conversao = submeter_em_pool(converter_arquivo, *args)
+                        except Exception as e:
+                            logger.error("Falha ao processar %s: %s", baixada.url, e)
+                            erro = f"Não foi possível processar '{baixada.url}': {e}"
+                            yield serializar_json({"url": baixada.url, "error": erro}) + b"\n"
+                            continue
+                        pendentes[conversao] = (indice, baixada)
+                        em_conversao += 1
+        finally:
+            for fut in pendentes:
+                fut.cancel()
+            vaga.liberar()
+
+    return StreamingResponse(_gerar_ndjson(), media_type="application/x-ndjson")
+
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness: 200 depois que os conversores foram criados e aquecidos com um
+    PDF mínimo, 503 enquanto isso. Informa o cold start e o tempo por perfil.
+    """
+    estado = estado_aquecimento()
+    return JSONResponse(estado, status_code=200 if estado["pronto"] else 503)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Contadores do cache de resultados (hits em memória/disco, misses, gravações).
+    """
+    return obter_cache().estatisticas()
+
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    """
+    Ocupação do agendador de conversões: em execução, profundidade da fila,
+    rejeições (429) e tempos de espera.
+    """
+    return obter_agendador().estatisticas()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Métricas no formato de texto do Prometheus: histogramas de duração por
+    endpoint, tipo de documento e etapa, tamanhos e páginas de entrada, mais
+    os contadores do cache e do agendador.
+    """
+    return PlainTextResponse(
+        renderizar_metricas(obter_cache().estatisticas(), obter_agendador().estatisticas()),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.post("/jobs", status_code=202)
+def criar_job(
+    tipo: str = "file",
+    file: UploadFile = File(...),
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
+):
+    """
+    Recebe o arquivo, grava no armazenamento de jobs e devolve o id
+    imediatamente. tipo: "file" (/upload-file/), "danfe" (/upload-danfe/)
+    ou "archive" (/upload-archive/). fields: como no endpoint correspondente.
+    """
+    _validar_opcoes(perfil, table_format)
+    campos = _validar_campos(fields, danfe=tipo == "danfe")
+    _validar_job(tipo, file.filename)
+
+    manager = obter_manager()
+    job_id = manager.novo_job(
+        tipo, file.filename, {"perfil": perfil, "table_format": table_format, "fields": list(campos)}
+    )
+    limite = MAX_ARCHIVE_BYTES if tipo == "archive" else MAX_UPLOAD_BYTES
+    try:
+        recebido = salvar_upload(file, limite=limite, diretorio=str(manager.pasta(job_id)))
+    except HTTPException:
+        manager.descartar(job_id)
+        raise
+    os.replace(recebido.path, manager.caminho_entrada(job_id, file.filename))
+    manager.enfileirar(job_id)
+    return {"id": job_id, "status": "queued"}
+
+
+def _validar_job(tipo: str, filename: str) -> None:
+    if tipo not in TIPOS_JOB:
+        raise HTTPException(400, detail=f"tipo deve ser um de: {', '.join(sorted(TIPOS_JOB))}")
+    suffix = Path(filename).suffix.lower()
+    if tipo == "danfe" and suffix != ".pdf":
+        raise HTTPException(400, detail="Arquivo deve ser um PDF")
+    if tipo == "archive" and suffix not in EXTENSOES_ARQUIVO:
+        raise HTTPException(400, detail="Arquivo deve ser .zip ou .rar")
+
+
+def _obter_job(job_id: str) -> dict:
+    job = obter_manager().store.obter(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Job não encontrado ou expirado")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def status_job(job_id: str):
+    """
+    Status do job (receiving, queued, running, done, failed) e progresso em arquivos.
+    """
+    job = _obter_job(job_id)
+    return {
+        "id": job["id"],
+        "tipo": job["tipo"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "progresso": {"feitos": job["feitos"], "total": job["total"]},
+        "erro": job["erro"],
+        "criado_em": job["criado_em"],
+        "concluido_em": job["concluido_em"],
+        "expira_em": job["expira_em"],
+    }
+
+
+@app.get("/jobs/{job_id}/result")
+def resultado_job(job_id: str):
+    """
+    Devolve o JSON (file/danfe) ou o ZIP de JSONs (archive) de um job concluído.
+    """
+    job = _obter_job(job_id)
+    if job["status"] == "failed":
+        raise HTTPException(400, detail=job["erro"])
+    if job["status"] != "done":
+        raise HTTPException(409, detail=f"Job ainda não concluído ({job['status']})")
+
+    stem = Path(job["filename"]).stem
+    if job["tipo"] == "archive":
+        media_type, filename = "application/zip", "resultados.zip"
+    elif job["tipo"] == "danfe":
+        media_type, filename = "application/json", f"{stem}_danfe.json"
+    else:
+        media_type, filename = "application/json", f"{stem}.json"
+    return FileResponse(
+        path=obter_manager().caminho_resultado(job),
+        media_type=media_type,
+        filename=filename,
+    )
+
+
+# Destinos de /uploads/{id}/finalizar: endpoints que podem processar o arquivo montado
+DESTINOS_UPLOAD = ("upload-file", "upload-danfe", "upload-archive", "jobs")
+
+
+@app.post("/uploads", status_code=201)
+def criar_upload(
+    filename: str,
+    upload_length: int = Header(...),
+):
+    """
+    Abre um upload retomável para um arquivo de Upload-Length bytes (até
+    DOCLING_MAX_ARCHIVE_BYTES). Depois: PATCH /uploads/{id} com os blocos,
+    HEAD ou GET /uploads/{id} para saber o offset confirmado e POST
+    /uploads/{id}/finalizar para processar o arquivo.
+    """
+    sessao = obter_uploads().criar(filename, upload_length)
+    return JSONResponse(
+        {"id": sessao["id"], "offset": 0, "tamanho": sessao["tamanho"]},
+        status_code=201,
+        headers={"Location": f"/uploads/{sessao['id']}", "Upload-Offset": "0"},
+    )
+
+
+@app.patch("/uploads/{upload_id}", status_code=204)
+async def enviar_bloco(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    upload_checksum: Optional[str] = Header(None),
+):
+    """
+    Grava o corpo (bytes crus) a partir de Upload-Offset, que deve ser o
+    offset confirmado (409 com o offset certo, senão). Upload-Checksum:
+    "sha256 <digest em base64>" do bloco; se não conferir, responde 460 e o
+    bloco é descartado. Responde 204 com o novo Upload-Offset.
+    """
+    offset = await obter_uploads().gravar_bloco(upload_id, upload_offset, upload_checksum, request.stream())
+    return Response(status_code=204, headers={"Upload-Offset": str(offset)})
+
+
+@app.head("/uploads/{upload_id}")
+def offset_upload(upload_id: str):
+    """Offset confirmado e tamanho total nos cabeçalhos Upload-Offset e Upload-Length."""
+    sessao = obter_uploads().obter(upload_id)
+    return Response(headers={
+        "Upload-Offset": str(sessao["offset"]),
+        "Upload-Length": str(sessao["tamanho"]),
+        "Cache-Control": "no-store",
+    })
+
+
+@app.get("/uploads/{upload_id}")
+def status_upload(upload_id: str):
+    """Situação do upload: offset confirmado, tamanho e se já está completo."""
+    sessao = obter_uploads().obter(upload_id)
+    return {
+        "id": sessao["id"],
+        "filename": sessao["filename"],
+        "offset": sessao["offset"],
+        "tamanho": sessao["tamanho"],
+        "completo": sessao["offset"] == sessao["tamanho"],
+    }
+
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+def cancelar_upload(upload_id: str):
+    """Descarta o upload e os blocos já recebidos."""
+    obter_uploads().cancelar(upload_id)
+    return Response(status_code=204)
+
+
+@app.post("/uploads/{upload_id}/finalizar")
+def finalizar_upload(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    upload_id: str,
+    destino: str = "upload-file",
+    tipo: str = "file",
+    perfil: str = PERFIL_PADRAO,
+    table_format: str = "records",
+    fields: Optional[str] = None,
+    sha256: Optional[str] = None,
+):
+    """
+    Processa um upload completo como se o arquivo tivesse sido enviado ao
+    `destino` (upload-file, upload-danfe, upload-archive ou jobs, este com
+    `tipo`), com as mesmas opções e a mesma resposta. `sha256` (hex) confere
+    o arquivo inteiro. O upload só é descartado quando o destino aceita o
+    arquivo: depois de um 429, basta finalizar de novo.
+    """
+    _validar_opcoes(perfil, table_format)
+    if destino not in DESTINOS_UPLOAD:
+        raise HTTPException(400, detail=f"destino deve ser um de: {', '.join(DESTINOS_UPLOAD)}")
+    campos = _validar_campos(fields, danfe=destino == "upload-danfe" or (destino == "jobs" and tipo == "danfe"))
+
+    # Mesmas validações do endpoint de destino, antes de tocar no arquivo
+    uploads = obter_uploads()
+    sessao = uploads.obter(upload_id)
+    filename = sessao["filename"]
+    suffix = Path(filename).suffix.lower()
+    if destino == "upload-danfe" and suffix != ".pdf":
+        raise HTTPException(400, detail="Arquivo deve ser um PDF")
+    if destino == "upload-archive" and suffix not in EXTENSOES_ARQUIVO:
+        raise HTTPException(400, detail="Arquivo deve ser .zip ou .rar")
+    if destino == "jobs":
+        _validar_job(tipo, filename)
+    compactado = destino == "upload-archive" or (destino == "jobs" and tipo == "archive")
+    limite = MAX_ARCHIVE_BYTES if compactado else MAX_UPLOAD_BYTES
+    if sessao["tamanho"] > limite:
+        raise HTTPException(413, detail=f"Arquivo excede o limite de {limite // (1024 ** 2)} MB")
+
+    recebido = uploads.finalizar(upload_id, sha256)
+    try:
+        if destino == "upload-archive":
+            registrar_entrada(doc_type="archive")
+            resposta = _responder_archive(recebido, perfil, table_format, campos)
+        elif destino == "jobs":
+            manager = obter_manager()
+            job_id = manager.novo_job(
+                tipo, filename, {"perfil": perfil, "table_format": table_format, "fields": list(campos)}
+            )
+            shutil.move(recebido.path, manager.caminho_entrada(job_id, filename))
+            manager.enfileirar(job_id)
+            resposta = JSONResponse({"id": job_id, "status": "queued"}, status_code=202)
+        elif destino == "upload-danfe":
+            resposta = _responder_danfe(request, recebido, perfil, table_format, campos)
+        else:
+            resposta = _responder_arquivo(request, recebido, perfil, table_format, campos)
+    except BaseException:
+        recebido.remover()
+        raise
+    background_tasks.add_task(recebido.remover)
+    uploads.encerrar(upload_id)
+    return resposta
@@ -0,0 +1,202 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Buckets dos histogramas (segundos, bytes e páginas)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BUCKETS_BYTES = tuple(1024 * 4 ** i for i in range(11))  # 1 KiB .. 1 GiB
+BUCKETS_PAGINAS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histograma:
+    """Histograma no formato de texto do Prometheus, com rótulos fixos."""
+
+    def __init__(self, nome: str, descricao: str, rotulos: Sequence[str], buckets: Sequence[float]):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos: str) -> None:
+        chave = tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                # contagens por bucket (+Inf no fim), soma, total
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def renderizar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = [(chave, list(s[0]), s[1], s[2]) for chave, s in sorted(self._series.items())]
+        for chave, contagens, soma, total in series:
+            base = ",".join(f'{r}="{_escapar(v)}"' for r, v in zip(self.rotulos, chave))
+            sep = "," if base else ""
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + ("+Inf",), contagens):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{{{base}{sep}le="{limite}"}} {acumulado}')
+            linhas.append(f"{self.nome}_sum{{{base}}} {soma}")
+            linhas.append(f"{self.nome}_count{{{base}}} {total}")
+        return linhas
+
+
+DURACAO_REQUISICAO = Histograma(
+    "docling_request_duration_seconds", "Duração total da requisição, incluindo o streaming.",
+    ("endpoint", "doc_type", "status"), BUCKETS_SEGUNDOS,
+)
+DURACAO_ETAPA = Histograma(
+    "docling_stage_duration_seconds", "Duração de cada etapa do processamento.",
+    ("endpoint", "doc_type", "stage"), BUCKETS_SEGUNDOS,
+)
+TAMANHO_ENTRADA = Histograma(
+    "docling_input_bytes", "Tamanho do arquivo recebido.",
+    ("endpoint", "doc_type"), BUCKETS_BYTES,
+)
+PAGINAS_ENTRADA = Histograma(
+    "docling_input_pages", "Páginas por documento convertido.",
+    ("endpoint", "doc_type"), BUCKETS_PAGINAS,
+)
+HISTOGRAMAS = (DURACAO_REQUISICAO, DURACAO_ETAPA, TAMANHO_ENTRADA, PAGINAS_ENTRADA)
+
+
+class RegistroRequisicao:
+    """Tempos por etapa, tipo de documento, tamanhos e páginas de uma requisição."""
+
+    def __init__(self):
+        self.doc_type: Optional[str] = None
+        self.etapas: Dict[str, float] = {}
+        self.tamanhos: List[int] = []
+        self.paginas: List[int] = []
+
+
+_REGISTRO: contextvars.ContextVar[Optional[RegistroRequisicao]] = contextvars.ContextVar(
+    "docling_registro_requisicao", default=None
+)
+
+
+@contextmanager
+def etapa(nome: str) -> Iterator[None]:
+    """
+    Mede o bloco como a etapa `nome` da requisição corrente. Fora de uma
+    requisição (CLI, jobs, workers do pool) não faz nada.
+    """
+    registro = _REGISTRO.get()
+    if registro is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro.etapas[nome] = registro.etapas.get(nome, 0.0) + time.perf_counter() - inicio
+
+
+def registrar_etapa(nome: str, duracao: float) -> None:
+    """Soma uma duração já medida (ex.: espera na fila) à etapa `nome`."""
+    registro = _REGISTRO.get()
+    if registro is not None:
+        registro.etapas[nome] = registro.etapas.get(nome, 0.0) + duracao
+
+
+def registrar_entrada(doc_type: Optional[str] = None, tamanho: Optional[int] = None,
+                      paginas: Optional[int] = None) -> None:
+    """Anota tipo de documento, tamanho (bytes) e páginas na requisição corrente."""
+    registro = _REGISTRO.get()
+    if registro is None:
+        return
+    if doc_type and registro.doc_type is None:
+        registro.doc_type = doc_type
+    if tamanho is not None:
+        registro.tamanhos.append(tamanho)
+    if paginas is not None:
+        registro.paginas.append(paginas)
+
+
+def tipo_documento(source: str) -> str:
+    """Tipo de documento para os rótulos: extensão do arquivo ou "url"."""
+    if source.startswith(("http://", "https://")):
+        return "url"
+    sufixo = source.rsplit(".", 1)[-1].lower() if "." in source.rsplit("/", 1)[-1] else ""
+    return sufixo or "desconhecido"
+
+
+def server_timing(registro: RegistroRequisicao) -> str:
+    return ", ".join(f"{nome};dur={duracao * 1000:.1f}" for nome, duracao in registro.etapas.items())
+
+
+def _finalizar(registro: RegistroRequisicao, endpoint: str, status: int, duracao: float) -> None:
+    doc_type = registro.doc_type or "-"
+    DURACAO_REQUISICAO.observar(duracao, endpoint=endpoint, doc_type=doc_type, status=status)
+    for nome, valor in registro.etapas.items():
+        DURACAO_ETAPA.observar(valor, endpoint=endpoint, doc_type=doc_type, stage=nome)
+    for tamanho in registro.tamanhos:
+        TAMANHO_ENTRADA.observar(tamanho, endpoint=endpoint, doc_type=doc_type)
+    for paginas in registro.paginas:
+        PAGINAS_ENTRADA.observar(paginas, endpoint=endpoint, doc_type=doc_type)
+
+
+async def medir_requisicao(request, call_next):
+    """
+    Middleware HTTP: abre o registro da requisição, devolve as etapas medidas
+    até o envio dos cabeçalhos em Server-Timing e alimenta os histogramas
+    quando o corpo termina (inclusive respostas em streaming).
+    """
+    registro = RegistroRequisicao()
+    token = _REGISTRO.set(registro)
+    inicio = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _REGISTRO.reset(token)
+
+    # APIRoute deixa a rota no scope; o template evita um rótulo por id de job
+    rota = request.scope.get("route")
+    endpoint = getattr(rota, "path", None) or "desconhecido"
+    if registro.etapas:
+        response.headers["Server-Timing"] = server_timing(registro)
+
+    corpo = response.body_iterator
+
+    async def _corpo_medido():
+        try:
+            async for parte in corpo:
+                yield parte
+        finally:
+            _finalizar(registro, endpoint, response.status_code, time.perf_counter() - inicio)
+
+    response.body_iterator = _corpo_medido()
+    return response
+
+
+def _gauges(prefixo: str, descricao: str, valores: Dict[str, Any]) -> List[str]:
+    linhas = []
+    for nome, valor in valores.items():
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            continue
+        metrica = f"{prefixo}_{nome}"
+        linhas += [f"# HELP {metrica} {descricao} ({nome}).", f"# TYPE {metrica} gauge", f"{metrica} {valor}"]
+    return linhas
+
+
+def renderizar_metricas(cache: Dict[str, Any], agendador: Dict[str, Any]) -> str:
+    """Texto completo de /metrics: histogramas mais as estatísticas de cache e agendador."""
+    linhas: List[str] = []
+    for histograma in HISTOGRAMAS:
+        linhas += histograma.renderizar()
+    linhas += _gauges("docling_cache", "Cache de resultados", cache)
+    linhas += _gauges("docling_scheduler", "Agendador de conversões", agendador)
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,147 @@
+import logging
+import xml.etree.ElementTree as ET
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# (label, caminho relativo a infNFe, categoria) — labels iguais aos do DANFE
+_CAMPOS_IDE = [
+    ("NÚMERO NF-e", "ide/nNF", "fiscal"),
+    ("SÉRIE", "ide/serie", "fiscal"),
+    ("MODELO", "ide/mod", "fiscal"),
+    ("NATUREZA DA OPERAÇÃO", "ide/natOp", "operacional"),
+    ("DATA DA EMISSÃO", "ide/dhEmi", "temporal"),
+    ("DATA DA EMISSÃO", "ide/dEmi", "temporal"),          # layout 2.00/3.10
+    ("DATA DA SAÍDA/ENTRADA", "ide/dhSaiEnt", "temporal"),
+]
+
+_CAMPOS_PARTE = [
+    ("CNPJ", "CNPJ", "identificacao"),
+    ("CPF", "CPF", "identificacao"),
+    ("INSCRIÇÃO ESTADUAL", "IE", "identificacao"),
+    ("NOME/RAZÃO SOCIAL", "xNome", "entidade"),
+    ("ENDEREÇO", "{end}/xLgr", "endereco"),
+    ("NÚMERO", "{end}/nro", "endereco"),
+    ("BAIRRO/DISTRITO", "{end}/xBairro", "endereco"),
+    ("MUNICÍPIO", "{end}/xMun", "endereco"),
+    ("UF", "{end}/UF", "endereco"),
+    ("CEP", "{end}/CEP", "endereco"),
+    ("FONE/FAX", "{end}/fone", "endereco"),
+]
+
+_CAMPOS_TOTAIS = [
+    ("BASE DE CÁLCULO DO ICMS", "vBC"),
+    ("VALOR DO ICMS", "vICMS"),
+    ("BASE DE CÁLCULO ICMS ST", "vBCST"),
+    ("VALOR DO ICMS ST", "vST"),
+    ("VALOR TOTAL DOS PRODUTOS", "vProd"),
+    ("VALOR DO FRETE", "vFrete"),
+    ("VALOR DO SEGURO", "vSeg"),
+    ("DESCONTO", "vDesc"),
+    ("OUTRAS DESPESAS ACESSÓRIAS", "vOutro"),
+    ("VALOR DO IPI", "vIPI"),
+    ("VALOR DO PIS", "vPIS"),
+    ("VALOR DA COFINS", "vCOFINS"),
+    ("VALOR TOTAL DA NOTA", "vNF"),
+]
+
+_CAMPOS_ITEM = ["cProd", "xProd", "NCM", "CFOP", "uCom", "qCom", "vUnCom", "vProd", "vDesc"]
+
+
+def _sem_namespace(raiz: ET.Element) -> ET.Element:
+    # NF-e usa um único namespace; removê-lo simplifica os caminhos e aceita XMLs sem ele
+    for elem in raiz.iter():
+        if isinstance(elem.tag, str) and elem.tag.startswith("{"):
+            elem.tag = elem.tag.split("}", 1)[1]
+    return raiz
+
+
+def _texto(elem: Optional[ET.Element], caminho: str) -> str:
+    if elem is None:
+        return ""
+    achado = elem.find(caminho)
+    return (achado.text or "").strip() if achado is not None else ""
+
+
+def _par(label: str, valor: str, categoria: str) -> Dict[str, Any]:
+    # Valores lidos do XML oficial: confiança máxima
+    return {"label": label, "value": valor, "category": categoria, "confidence": 1.0}
+
+
+def extrair_nfe(raiz: ET.Element) -> Dict[str, Any]:
+    """
+    Extrai os campos de uma NF-e (NFe ou nfeProc) já parseada, no mesmo
+    formato de converter_danfe: texts (label/value/category), tables e metadata.
+    """
+    raiz = _sem_namespace(raiz)
+    inf = raiz if raiz.tag == "infNFe" else raiz.find(".//infNFe")
+    if inf is None:
+        raise ValueError("XML não contém uma NF-e (infNFe)")
+
+    pares: List[Dict[str, Any]] = []
+
+    chave = inf.get("Id", "").removeprefix("NFe")
+    if chave:
+        pares.append(_par("CHAVE DE ACESSO", chave, "fiscal"))
+
+    for label, caminho, categoria in _CAMPOS_IDE:
+        valor = _texto(inf, caminho)
+        if valor:
+            pares.append(_par(label, valor, categoria))
+
+    # Emitente e destinatário
+    for sufixo, tag, endereco in (("EMITENTE", "emit", "enderEmit"), ("DESTINATÁRIO", "dest", "enderDest")):
+        parte = inf.find(tag)
+        for label, caminho, categoria in _CAMPOS_PARTE:
+            valor = _texto(parte, caminho.format(end=endereco))
+            if valor:
+                pares.append(_par(f"{label} ({sufixo})", valor, categoria))
+
+    # Totais
+    icms_tot = inf.find("total/ICMSTot")
+    for label, tag in _CAMPOS_TOTAIS:
+        valor = _texto(icms_tot, tag)
+        if valor:
+            pares.append(_par(label, valor, "financeiro"))
+
+    # Protocolo de autorização (presente quando o XML é um nfeProc)
+    inf_prot = raiz.find(".//protNFe/infProt")
+    protocolo = _texto(inf_prot, "nProt")
+    if protocolo:
+        recebimento = _texto(inf_prot, "dhRecbto")
+        valor = f"{protocolo} - {recebimento}" if recebimento else protocolo
+        pares.append(_par("PROTOCOLO DE AUTORIZAÇÃO DE USO", valor, "fiscal"))
+
+    # Itens como tabela
+    itens = []
+    for det in inf.findall("det"):
+        prod = det.find("prod")
+        item = {"nItem": det.get("nItem")}
+        for tag in _CAMPOS_ITEM:
+            item[tag] = _texto(prod, tag) or None
+        itens.append(item)
+
+    metadata = {
+        "origem": "nfe_xml",
+        "versao": inf.get("versao"),
+        "status_protocolo": _texto(inf_prot, "cStat") or None,
+        "motivo_protocolo": _texto(inf_prot, "xMotivo") or None,
+    }
+
+    return {
+        "texts": pares,
+        "tables": [{"sheet_name": "itens", "data": itens}],
+        "metadata": metadata,
+    }
+
+
+def converter_nfe_xml(source: str) -> Dict[str, Any]:
+    """
+    Lê um XML de NF-e diretamente, sem Docling, retornando a mesma estrutura
+    de converter_danfe a partir dos dados oficiais da nota.
+    """
+    try:
+        return extrair_nfe(ET.parse(source).getroot())
+    except Exception as e:
+        logger.error("Falha ao processar NF-e %s: %s", source, e)
+        return {"error": f"Não foi possível processar '{source}': {e}"}
@@ -0,0 +1,247 @@
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+if TYPE_CHECKING:
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter
+
+logger = logging.getLogger(__name__)
+
+# Perfis de pipeline para PDF:
+#   fast     - só a camada de texto embutida (sem OCR, sem estrutura de tabelas)
+#   standard - camada de texto + modelo de estrutura de tabelas (sem OCR)
+#   full     - OCR + estrutura de tabelas (equivale ao DocumentConverter() padrão)
+#   auto     - "standard" se o PDF tiver camada de texto utilizável, senão "full"
+PERFIS = ("fast", "standard", "full")
+PERFIS_VALIDOS = PERFIS + ("auto",)
+PERFIL_PADRAO = os.getenv("DOCLING_PIPELINE_PROFILE", "full")
+
+# Heurística do modo auto: média mínima de caracteres por página nas primeiras páginas
+AUTO_MIN_CHARS_POR_PAGINA = int(os.getenv("DOCLING_AUTO_MIN_CHARS_PER_PAGE", "200"))
+AUTO_PAGINAS_AMOSTRA = int(os.getenv("DOCLING_AUTO_SAMPLE_PAGES", "3"))
+
+# Aquecimento na subida: perfis aquecidos (padrão: os de perfis_padrao();
+# "all" aquece todos) ou "0" para desligar
+WARMUP_PROFILES = os.getenv("DOCLING_WARMUP_PROFILES", "")
+
+# Registro único de conversores do processo, usado por converter.py e
+# danfe_converter.py. O docling só é importado na primeira criação.
+_CONVERSORES: Dict[str, "DocumentConverter"] = {}
+_LOCK = threading.Lock()
+_THREAD_AQUECIMENTO: Optional[threading.Thread] = None
+_AQUECIMENTO: Dict[str, Any] = {"pronto": False, "perfis": {}}
+
+
+def _inicio_do_processo() -> float:
+    """
+    Início do processo no relógio de time.monotonic(): a idade do processo
+    vem de /proc (Linux), incluindo a subida do interpretador e os imports
+    do app. Fora do Linux, usa o momento da importação deste módulo.
+    """
+    agora = time.monotonic()
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            # Campos após o nome do executável (entre parênteses); starttime é o 22º
+            inicio_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return agora
+    return agora - max(0.0, uptime - inicio_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+_INICIO_PROCESSO = _inicio_do_processo()
+
+
+def _opcoes_pdf(perfil: str) -> "PdfPipelineOptions":
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+
+    opcoes = PdfPipelineOptions()
+    opcoes.do_ocr = perfil == "full"
+    opcoes.do_table_structure = perfil in ("standard", "full")
+    return opcoes
+
+
+def obter_conversor(perfil: str = PERFIL_PADRAO) -> "DocumentConverter":
+    """
+    Retorna o DocumentConverter do perfil, criado na primeira chamada e
+    reutilizado depois (uma instância aquecida por perfil).
+    """
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil de pipeline desconhecido: {perfil}")
+    with _LOCK:
+        if perfil not in _CONVERSORES:
+            from docling.datamodel.base_models import InputFormat
+            from docling.document_converter import DocumentConverter, PdfFormatOption
+
+            _CONVERSORES[perfil] = DocumentConverter(
+                format_options={
+                    InputFormat.PDF: PdfFormatOption(pipeline_options=_opcoes_pdf(perfil))
+                }
+            )
+        return _CONVERSORES[perfil]
+
+
+def perfis_padrao() -> tuple:
+    """Perfis concretos que o perfil padrão pode usar (os que vale pré-carregar)."""
+    if PERFIL_PADRAO == "auto":
+        return ("standard", "full")
+    return (PERFIL_PADRAO,)
+
+
+def perfis_aquecimento() -> tuple:
+    """Perfis aquecidos na subida, conforme DOCLING_WARMUP_PROFILES."""
+    valor = WARMUP_PROFILES.strip().lower()
+    if valor in ("0", "none"):
+        return ()
+    if valor == "all":
+        return PERFIS
+    if valor:
+        return tuple(p.strip() for p in valor.split(",") if p.strip() in PERFIS)
+    return perfis_padrao()
+
+
+def _pdf_aquecimento() -> bytes:
+    """PDF de uma página com uma linha de texto, montado à mão (sem arquivos externos)."""
+    fluxo = b"BT /F1 12 Tf 72 720 Td (Docling aquecimento 123) Tj ET"
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(fluxo), fluxo),
+    ]
+    saida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for numero, corpo in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n%s\nendobj\n" % (numero, corpo)
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        saida += b"%010d 00000 n \n" % offset
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(saida)
+
+
+def aquecer(perfis: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Cria o conversor de cada perfil e passa por ele um PDF mínimo embutido,
+    carregando modelos e pipelines antes da primeira requisição. Retorna o
+    tempo de criação e da primeira conversão por perfil, em segundos.
+    """
+    from docling.datamodel.base_models import DocumentStream
+
+    pdf = _pdf_aquecimento()
+    tempos: Dict[str, Any] = {}
+    for perfil in perfis_aquecimento() if perfis is None else perfis:
+        inicio = time.perf_counter()
+        conversor = obter_conversor(perfil)
+        criado = time.perf_counter()
+        try:
+            conversor.convert(DocumentStream(name="aquecimento.pdf", stream=io.BytesIO(pdf)))
+            erro = None
+        except Exception as e:
+            logger.warning("Falha ao aquecer o perfil %s: %s", perfil, e)
+            erro = str(e)
+        fim = time.perf_counter()
+        tempos[perfil] = {
+            "criacao_s": round(criado - inicio, 3),
+            "primeira_conversao_s": round(fim - criado, 3),
+            **({"erro": erro} if erro else {}),
+        }
+    return tempos
+
+
+def _aquecer_em_fundo() -> None:
+    inicio = time.perf_counter()
+    try:
+        _AQUECIMENTO["perfis"] = aquecer()
+    except Exception as e:
+        logger.error("Falha no aquecimento dos conversores: %s", e)
+        _AQUECIMENTO["erro"] = str(e)
+    _AQUECIMENTO["aquecimento_s"] = round(time.perf_counter() - inicio, 3)
+    _AQUECIMENTO["cold_start_s"] = round(time.monotonic() - _INICIO_PROCESSO, 3)
+    if "erro" in _AQUECIMENTO:
+        return  # sem conversores o serviço não fica pronto
+    _AQUECIMENTO["pronto"] = True
+    logger.info("Conversores prontos: cold start de %.1fs (aquecimento %.1fs, %s)",
+                _AQUECIMENTO["cold_start_s"], _AQUECIMENTO["aquecimento_s"],
+                ", ".join(_AQUECIMENTO["perfis"]) or "nenhum perfil")
+
+
+def iniciar_aquecimento() -> None:
+    """Aquece os conversores numa thread, sem segurar a subida do servidor."""
+    global _THREAD_AQUECIMENTO
+    with _LOCK:
+        if _THREAD_AQUECIMENTO is not None:
+            return
+        _THREAD_AQUECIMENTO = threading.Thread(target=_aquecer_em_fundo, name="aquecimento-docling", daemon=True)
+        _THREAD_AQUECIMENTO.start()
+
+
+def estado_aquecimento() -> Dict[str, Any]:
+    """
+    Situação do aquecimento para /ready: pronto, tempos por perfil e o cold
+    start (do início do processo até os conversores estarem aquecidos).
+    """
+    estado = dict(_AQUECIMENTO)
+    if not estado["pronto"]:
+        estado["aguardando_s"] = round(time.monotonic() - _INICIO_PROCESSO, 3)
+    return estado
+
+
+def tem_camada_texto(path: str) -> bool:
+    """
+    Verifica se o PDF tem texto embutido suficiente nas primeiras páginas
+    para dispensar OCR (PDFs nascidos digitais, como a maioria das DANFEs).
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        paginas = min(len(pdf), AUTO_PAGINAS_AMOSTRA)
+        if paginas == 0:
+            return False
+        caracteres = 0
+        for i in range(paginas):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            caracteres += len(textpage.get_text_range().strip())
+            textpage.close()
+            page.close()
+        return caracteres / paginas >= AUTO_MIN_CHARS_POR_PAGINA
+    finally:
+        pdf.close()
+
+
+def validar_perfil(perfil: Optional[str]) -> str:
+    """Retorna o perfil pedido (ou o padrão), que pode ainda ser "auto"."""
+    perfil = perfil or PERFIL_PADRAO
+    if perfil not in PERFIS_VALIDOS:
+        raise ValueError(f"Perfil de pipeline desconhecido: {perfil}")
+    return perfil
+
+
+def resolver_perfil(perfil: Optional[str], source: str) -> str:
+    """
+    Converte o perfil pedido (ou o padrão) em um dos PERFIS concretos.
+    No modo "auto", PDFs locais com camada de texto usam "standard".
+    """
+    perfil = validar_perfil(perfil)
+    if perfil != "auto":
+        return perfil
+
+    if source.lower().endswith(".pdf") and Path(source).is_file():
+        try:
+            if tem_camada_texto(source):
+                return "standard"
+        except Exception as e:
+            logger.warning("Falha ao inspecionar camada de texto de %s: %s", source, e)
+    return "full"
@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import zlib
+from typing import Any, Iterator, Optional
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from backend.metrics import etapa
+
+try:  # serializador rápido opcional
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # compressão zstd opcional
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Corpos menores que isso não são comprimidos; maiores que STREAM_MIN_BYTES
+# são enviados em blocos (comprimidos bloco a bloco)
+COMPRESS_MIN_BYTES = int(os.getenv("DOCLING_COMPRESS_MIN_BYTES", "1024"))
+STREAM_MIN_BYTES = int(os.getenv("DOCLING_STREAM_MIN_BYTES", str(1024 * 1024)))
+_BLOCO = 256 * 1024
+
+
+def serializar_json(conteudo: Any) -> bytes:
+    """Serializa uma única vez com orjson, se instalado, ou com o json da stdlib."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(conteudo, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError as e:
+            logger.debug("orjson não serializou o conteúdo, usando json: %s", e)
+    return json.dumps(conteudo, ensure_ascii=False).encode()
+
+
+def escolher_codificacao(accept_encoding: str) -> Optional[str]:
+    """Escolhe zstd (se disponível) ou gzip conforme o Accept-Encoding do cliente."""
+    aceitas = {}
+    for parte in accept_encoding.split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        if nome:
+            aceitas[nome.strip().lower()] = q
+
+    suportadas = (["zstd"] if zstandard is not None else []) + ["gzip"]
+    for nome in suportadas:
+        if aceitas.get(nome, aceitas.get("*", 0.0)) > 0:
+            return nome
+    return None
+
+
+def _compressor(codificacao: str):
+    if codificacao == "zstd":
+        return zstandard.ZstdCompressor().compressobj()
+    return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+
+
+def _em_blocos(corpo: bytes, codificacao: Optional[str]) -> Iterator[bytes]:
+    visao = memoryview(corpo)
+    compressor = _compressor(codificacao) if codificacao else None
+    for inicio in range(0, len(visao), _BLOCO):
+        bloco = visao[inicio:inicio + _BLOCO]
+        if compressor is None:
+            yield bytes(bloco)
+            continue
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def content_disposition(filename: str) -> str:
+    """Mesmo cabeçalho que o FileResponse gera para `filename`."""
+    codificado = quote(filename)
+    if codificado != filename:
+        return f"attachment; filename*=utf-8''{codificado}"
+    return f'attachment; filename="{filename}"'
+
+
+def resposta_json(conteudo: Any, request: Request, filename: Optional[str] = None) -> Response:
+    """
+    Resposta JSON servida direto da memória: serializa uma vez, comprime com
+    zstd/gzip quando o cliente aceita e envia em blocos se o corpo for grande.
+    Com `filename`, o JSON vai como anexo (como o antigo FileResponse).
+    """
+    with etapa("serializacao"):
+        corpo = serializar_json(conteudo)
+    headers = {"Vary": "Accept-Encoding"}
+    if filename:
+        headers["Content-Disposition"] = content_disposition(filename)
+
+    codificacao = None
+    if len(corpo) >= COMPRESS_MIN_BYTES:
+        codificacao = escolher_codificacao(request.headers.get("accept-encoding", ""))
+    if codificacao:
+        headers["Content-Encoding"] = codificacao
+
+    if len(corpo) < STREAM_MIN_BYTES:
+        if codificacao:
+            with etapa("compressao"):
+                compressor = _compressor(codificacao)
+                corpo = compressor.compress(corpo) + compressor.flush()
+        return Response(corpo, media_type="application/json", headers=headers)
+    return StreamingResponse(
+        _em_blocos(corpo, codificacao), media_type="application/json", headers=headers
+    )
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from backend.workers import resolver_workers
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+MAX_CONVERSOES = int(os.getenv("DOCLING_MAX_CONCURRENT", "0")) or max(1, (os.cpu_count() or 2) // 2)
+MAX_FILA = int(os.getenv("DOCLING_MAX_QUEUE", "32"))
+ESPERA_MAXIMA = float(os.getenv("DOCLING_QUEUE_TIMEOUT_SECONDS", "300"))
+# Prioridade por tamanho: cada requisição ganha um "prazo virtual" de
+# chegada + tamanho / BYTES_POR_SEGUNDO; arquivos pequenos passam na frente,
+# mas um arquivo grande não espera para sempre. 0 desativa (ordem de chegada).
+BYTES_POR_SEGUNDO = float(os.getenv("DOCLING_SIZE_PRIORITY_BYTES_PER_SECOND", str(1024 * 1024)))
+
+
+class FilaCheia(Exception):
+    """Fila de conversões cheia (ou espera esgotada); o cliente deve tentar de novo depois."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Servidor ocupado, tente novamente em {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Vaga:
+    """
+    Vaga de conversão obtida no agendador. `peso` é o número de conversões
+    simultâneas que ela cobre (lotes convertem até `peso` arquivos por vez).
+    Liberar é idempotente; se o dono for descartado sem liberar (ex.:
+    streaming nunca iniciado), o coletor de lixo devolve a vaga.
+    """
+
+    def __init__(self, agendador: "AgendadorConversao", espera: float, peso: int = 1):
+        self._agendador = agendador
+        self.peso = peso
+        self._inicio = time.monotonic()
+        self._liberada = False
+        self.espera = espera
+
+    def liberar(self) -> None:
+        if not self._liberada:
+            self._liberada = True
+            self._agendador._sair(time.monotonic() - self._inicio, self.peso)
+
+    def __enter__(self) -> "Vaga":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.liberar()
+
+    def __del__(self):
+        self.liberar()
+
+
+class AgendadorConversao:
+    """
+    Controle de admissão das conversões: no máximo `limite` em execução e
+    `max_fila` aguardando; além disso, FilaCheia (HTTP 429 com Retry-After).
+    """
+
+    def __init__(self, limite: int = MAX_CONVERSOES, max_fila: int = MAX_FILA,
+                 espera_maxima: float = ESPERA_MAXIMA,
+                 bytes_por_segundo: float = BYTES_POR_SEGUNDO):
+        self.limite = limite
+        self.max_fila = max_fila
+        self.espera_maxima = espera_maxima
+        self.bytes_por_segundo = bytes_por_segundo
+        self._cond = threading.Condition()
+        self._ativos = 0
+        self._fila = []
+        self._seq = itertools.count()
+        self._duracao_media = 5.0  # média móvel, usada para estimar o Retry-After
+        self._stats = {"admitidos": 0, "rejeitados": 0, "espera_total": 0.0, "espera_max": 0.0}
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._duracao_media * (len(self._fila) + 1) / self.limite))
+
+    def admitir(self, tamanho: Optional[int] = None, peso: int = 1) -> Vaga:
+        """
+        Bloqueia até haver vaga e a devolve. `tamanho` (bytes) antecipa
+        arquivos pequenos na fila; `peso` reserva várias conversões de uma
+        vez (lotes), limitado a `limite`. Levanta FilaCheia se a fila estiver
+        cheia ou a espera passar de espera_maxima.
+        """
+        chegada = time.monotonic()
+        peso = max(1, min(peso, self.limite))
+        with self._cond:
+            if self._ativos + peso <= self.limite and not self._fila:
+                return self._admitir(chegada, peso)
+            if len(self._fila) >= self.max_fila:
+                self._stats["rejeitados"] += 1
+                logger.warning("Fila de conversões cheia (%d aguardando)", len(self._fila))
+                raise FilaCheia(self._retry_after())
+
+            prazo = chegada
+            if tamanho and self.bytes_por_segundo > 0:
+                prazo += tamanho / self.bytes_por_segundo
+            ticket = (prazo, next(self._seq))
+            heapq.heappush(self._fila, ticket)
+
+            limite_espera = chegada + self.espera_maxima
+            while not (self._ativos + peso <= self.limite and self._fila[0] == ticket):
+                restante = limite_espera - time.monotonic()
+                if restante <= 0:
+                    self._fila.remove(ticket)
+                    heapq.heapify(self._fila)
+                    self._stats["rejeitados"] += 1
+                    self._cond.notify_all()
+                    raise FilaCheia(self._retry_after())
+                self._cond.wait(restante)
+
+            heapq.heappop(self._fila)
+            vaga = self._admitir(chegada, peso)
+            self._cond.notify_all()  # o próximo da fila pode ter vaga também
+            return vaga
+
+    def _admitir(self, chegada: float, peso: int) -> Vaga:
+        espera = time.monotonic() - chegada
+        self._ativos += peso
+        self._stats["admitidos"] += 1
+        self._stats["espera_total"] += espera
+        self._stats["espera_max"] = max(self._stats["espera_max"], espera)
+        return Vaga(self, espera, peso)
+
+    def _sair(self, duracao: float, peso: int = 1) -> None:
+        with self._cond:
+            self._ativos -= peso
+            self._duracao_media = 0.8 * self._duracao_media + 0.2 * duracao
+            self._cond.notify_all()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Ocupação atual, profundidade da fila e tempos de espera."""
+        with self._cond:
+            admitidos = self._stats["admitidos"]
+            return {
+                "limite": self.limite,
+                "max_fila": self.max_fila,
+                "ativos": self._ativos,
+                "na_fila": len(self._fila),
+                "admitidos": admitidos,
+                "rejeitados": self._stats["rejeitados"],
+                "espera_media_s": round(self._stats["espera_total"] / admitidos, 3) if admitidos else 0.0,
+                "espera_max_s": round(self._stats["espera_max"], 3),
+                "duracao_media_s": round(self._duracao_media, 3),
+            }
+
+
+def peso_lote(arquivos: int) -> int:
+    """Peso da Vaga de um lote: uma conversão por arquivo em paralelo no pool."""
+    return max(1, min(arquivos, resolver_workers()))
+
+
+_AGENDADOR = AgendadorConversao()
+
+
+def obter_agendador() -> AgendadorConversao:
+    return _AGENDADOR
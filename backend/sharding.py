@@ -0,0 +1,98 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from backend.workers import em_worker, mapear_em_pool, resolver_workers
+
+logger = logging.getLogger(__name__)
+
+# PDFs com pelo menos SHARD_MIN_PAGES páginas são divididos em fragmentos de
+# SHARD_PAGES páginas convertidos em paralelo (0 desativa a fragmentação)
+SHARD_MIN_PAGES = int(os.getenv("DOCLING_SHARD_MIN_PAGES", "100"))
+SHARD_PAGES = int(os.getenv("DOCLING_SHARD_PAGES", "25"))
+
+
+def contar_paginas(path: str) -> int:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def deve_fragmentar(source: str) -> bool:
+    """
+    Fragmenta apenas PDFs locais grandes, fora dos processos do pool (sem pools
+    aninhados) e quando há mais de um worker disponível.
+    """
+    if SHARD_MIN_PAGES <= 0 or em_worker() or resolver_workers() == 1:
+        return False
+    if not source.lower().endswith(".pdf") or not Path(source).is_file():
+        return False
+    try:
+        return contar_paginas(source) >= SHARD_MIN_PAGES
+    except Exception as e:
+        logger.warning("Falha ao contar páginas de %s: %s", source, e)
+        return False
+
+
+def dividir_pdf(path: str, paginas_por_fragmento: int, destino: str) -> List[str]:
+    """Divide o PDF em arquivos de até `paginas_por_fragmento` páginas, em ordem."""
+    import pypdfium2 as pdfium
+
+    origem = pdfium.PdfDocument(path)
+    fragmentos = []
+    try:
+        total = len(origem)
+        for inicio in range(0, total, paginas_por_fragmento):
+            fim = min(inicio + paginas_por_fragmento, total)
+            novo = pdfium.PdfDocument.new()
+            try:
+                novo.import_pages(origem, pages=list(range(inicio, fim)))
+                caminho = str(Path(destino) / f"paginas_{inicio + 1:05d}-{fim:05d}.pdf")
+                novo.save(caminho)
+            finally:
+                novo.close()
+            fragmentos.append(caminho)
+    finally:
+        origem.close()
+    return fragmentos
+
+
+def mesclar_resultados(partes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Junta resultados de fragmentos (já em ordem de página) no esquema de
+    converter_arquivo: listas (texts, tables) são concatenadas e os demais
+    campos (metadata) vêm do primeiro fragmento que os tiver. Só aparecem os
+    campos presentes nas partes (ver `fields` em converter_arquivo).
+    """
+    mesclado: Dict[str, Any] = {}
+    for parte in partes:
+        for campo, valor in parte.items():
+            if isinstance(valor, list):
+                mesclado.setdefault(campo, []).extend(valor)
+            elif not mesclado.get(campo):
+                mesclado[campo] = valor
+    return mesclado
+
+
+def converter_fragmentado(source: str, func: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
+    """
+    Converte um PDF grande em fragmentos paralelos: func(caminho_fragmento, *args)
+    roda no pool de processos para cada fragmento (func deve ser uma função de
+    módulo, serializável) e os resultados são mesclados em ordem de página.
+    """
+    with tempfile.TemporaryDirectory(prefix="docling_shards_") as pasta:
+        fragmentos = dividir_pdf(source, SHARD_PAGES, pasta)
+        tarefas = {str(i): (fragmento, *args) for i, fragmento in enumerate(fragmentos)}
+        resultados = dict(mapear_em_pool(func, tarefas))
+
+    partes = [resultados[str(i)] for i in range(len(fragmentos))]
+    erros = [p["error"] for p in partes if "error" in p]
+    if erros:
+        raise RuntimeError("; ".join(erros))
+    return mesclar_resultados(partes)
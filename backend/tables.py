@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Union
+
+# records: lista de dicts {coluna: valor} (formato histórico, igual ao pandas)
+# columnar: {"columns": [...], "rows": [[...], ...]}, sem repetir os nomes das colunas
+FORMATOS_TABELA = ("records", "columnar")
+
+
+def _colunas_e_linhas(table) -> tuple:
+    """
+    Lê a grade de células do TableItem e separa cabeçalho e dados com as mesmas
+    regras de TableItem.export_to_dataframe(): as primeiras linhas com alguma
+    célula column_header formam os nomes das colunas (unidos por "."); sem
+    cabeçalho, as colunas são numeradas a partir de 0.
+    """
+    grade = table.data.grid
+    num_cols = table.data.num_cols
+
+    num_cabecalhos = 0
+    for linha in grade:
+        if not any(celula.column_header for celula in linha):
+            break
+        num_cabecalhos += 1
+
+    if num_cabecalhos > 0:
+        colunas: List[Any] = ["" for _ in range(num_cols)]
+        for linha in grade[:num_cabecalhos]:
+            for j, celula in enumerate(linha):
+                colunas[j] += f".{celula.text}" if colunas[j] != "" else celula.text
+    else:
+        colunas = list(range(num_cols))
+
+    linhas = [[celula.text for celula in linha] for linha in grade[num_cabecalhos:]]
+    return colunas, linhas
+
+
+def exportar_tabela(table, table_format: str = "records") -> Union[List[Dict], Dict[str, Any]]:
+    """Exporta um TableItem do Docling direto da grade de células, sem pandas."""
+    colunas, linhas = _colunas_e_linhas(table)
+    if table_format == "columnar":
+        return {"columns": colunas, "rows": linhas}
+    # Colunas repetidas: vale o último valor, como em DataFrame.to_dict("records")
+    return [dict(zip(colunas, linha)) for linha in linhas]
@@ -0,0 +1,265 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from backend.cache import hash_arquivo
+from backend.ingest import MAX_ARCHIVE_BYTES, ArquivoRecebido
+from backend.metrics import etapa, registrar_entrada
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem exclusão entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Uploads retomáveis: cada sessão tem, em UPLOAD_DIR, <id>.json (metadados e
+# offset confirmado), <id><extensão> (os bytes recebidos) e <id>.lock
+UPLOAD_DIR = Path(os.getenv("DOCLING_UPLOAD_DIR", Path(tempfile.gettempdir()) / "docling_uploads"))
+UPLOAD_TTL_SECONDS = int(os.getenv("DOCLING_UPLOAD_TTL_SECONDS", str(24 * 3600)))
+_INTERVALO_LIMPEZA = 60
+_ID_VALIDO = re.compile(r"^[0-9a-f]{32}$")
+# Upload-Checksum: "<algoritmo> <digest em base64>", como no protocolo tus
+ALGORITMOS_CHECKSUM = ("sha256", "sha1", "md5")
+# Status de checksum que não confere (o mesmo do tus): o bloco deve ser reenviado
+STATUS_CHECKSUM_INVALIDO = 460
+
+
+def _ler_checksum(cabecalho: Optional[str]) -> Tuple[Optional[str], Optional[bytes]]:
+    if not cabecalho:
+        return None, None
+    try:
+        algoritmo, valor = cabecalho.strip().split(" ", 1)
+        esperado = base64.b64decode(valor.strip(), validate=True)
+    except (ValueError, binascii.Error):
+        raise HTTPException(400, detail="Upload-Checksum deve ser '<algoritmo> <digest em base64>'")
+    algoritmo = algoritmo.lower()
+    if algoritmo not in ALGORITMOS_CHECKSUM:
+        raise HTTPException(400, detail=f"Algoritmo de checksum deve ser um de: {', '.join(ALGORITMOS_CHECKSUM)}")
+    return algoritmo, esperado
+
+
+class GerenciadorUploads:
+    """
+    Sessões de upload em blocos: o cliente cria a sessão com o tamanho total,
+    envia blocos com o offset onde começam (e o checksum de cada um) e, depois
+    de uma falha, consulta o offset confirmado para continuar dali. Os blocos
+    são gravados direto na posição do arquivo em disco, sem juntar em memória.
+    """
+
+    def __init__(self, diretorio: Path, ttl: int):
+        self.diretorio = Path(diretorio)
+        self.ttl = ttl
+        self._ultima_limpeza = 0.0
+        self._lock_limpeza = threading.Lock()
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.diretorio / f"{upload_id}.json"
+
+    def _dados_path(self, meta: Dict[str, Any]) -> Path:
+        return self.diretorio / f"{meta['id']}{Path(meta['filename']).suffix.lower()}"
+
+    def _gravar_meta(self, meta: Dict[str, Any]) -> None:
+        destino = self._meta_path(meta["id"])
+        tmp = destino.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, destino)
+
+    def criar(self, filename: str, tamanho: int, limite: int = MAX_ARCHIVE_BYTES) -> Dict[str, Any]:
+        """Abre uma sessão para `tamanho` bytes; 413 acima de `limite`."""
+        if tamanho < 0:
+            raise HTTPException(400, detail="Upload-Length inválido")
+        if tamanho > limite:
+            raise HTTPException(413, detail=f"Arquivo excede o limite de {limite // (1024 ** 2)} MB")
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.limpar_expirados()
+        agora = time.time()
+        meta = {
+            "id": uuid.uuid4().hex,
+            "filename": Path(filename or "").name,
+            "tamanho": tamanho,
+            "offset": 0,
+            "criado_em": agora,
+            "atualizado_em": agora,
+        }
+        self._dados_path(meta).touch()
+        self._gravar_meta(meta)
+        return meta
+
+    def obter(self, upload_id: str) -> Dict[str, Any]:
+        """Metadados da sessão; 404 se não existir ou tiver expirado."""
+        if not _ID_VALIDO.match(upload_id):
+            raise HTTPException(404, detail="Upload não encontrado ou expirado")
+        try:
+            meta = json.loads(self._meta_path(upload_id).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise HTTPException(404, detail="Upload não encontrado ou expirado")
+        if time.time() - meta["atualizado_em"] > self.ttl:
+            self._remover(meta)
+            raise HTTPException(404, detail="Upload não encontrado ou expirado")
+        return meta
+
+    @contextmanager
+    def _exclusivo(self, upload_id: str) -> Iterator[None]:
+        """
+        Um bloco por vez em cada sessão, entre threads e workers: flock não
+        bloqueante em <id>.lock; 409 se outra requisição estiver gravando.
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.diretorio / f"{upload_id}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(409, detail="Outro bloco deste upload está sendo gravado")
+            yield
+        finally:
+            os.close(fd)
+
+    def _abrir_bloco(self, upload_id: str, offset: int, pilha: ExitStack) -> Tuple[Dict[str, Any], BinaryIO]:
+        """
+        Parte bloqueante do início de gravar_bloco(): lock da sessão, conferência
+        do offset e arquivo de dados posicionado em `offset`. O lock e o arquivo
+        ficam em `pilha`, liberados por quem chama.
+        """
+        self.obter(upload_id)  # 404 antes de criar o arquivo de lock
+        pilha.enter_context(self._exclusivo(upload_id))
+        meta = self.obter(upload_id)
+        if offset != meta["offset"]:
+            raise HTTPException(409, detail=f"Offset esperado: {meta['offset']}",
+                                headers={"Upload-Offset": str(meta["offset"])})
+        f = pilha.enter_context(open(self._dados_path(meta), "r+b"))
+        # Descarta bytes de um bloco anterior interrompido antes de confirmado
+        f.truncate(offset)
+        f.seek(offset)
+        return meta, f
+
+    @staticmethod
+    def _sincronizar(f: BinaryIO) -> None:
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _confirmar_bloco(self, meta: Dict[str, Any], offset: int) -> None:
+        meta["offset"] = offset
+        meta["atualizado_em"] = time.time()
+        self._gravar_meta(meta)
+
+    async def gravar_bloco(self, upload_id: str, offset: int, checksum: Optional[str],
+                           blocos: AsyncIterator[bytes]) -> int:
+        """
+        Grava o corpo da requisição a partir de `offset`, que deve ser o
+        offset confirmado da sessão (senão 409, com o offset certo no cabeçalho
+        Upload-Offset). Um bloco interrompido ou com checksum errado é
+        descartado inteiro. Retorna o novo offset. O acesso ao disco (lock,
+        escrita, fsync e metadados) roda no threadpool, fora do event loop.
+        """
+        algoritmo, esperado = _ler_checksum(checksum)
+        with ExitStack() as pilha:
+            meta, f = await run_in_threadpool(self._abrir_bloco, upload_id, offset, pilha)
+
+            digest = hashlib.new(algoritmo) if algoritmo else None
+            recebidos = 0
+            with etapa("upload"):
+                try:
+                    async for bloco in blocos:
+                        recebidos += len(bloco)
+                        if offset + recebidos > meta["tamanho"]:
+                            raise HTTPException(413, detail="Bloco ultrapassa o Upload-Length da sessão")
+                        if digest is not None:
+                            digest.update(bloco)
+                        await run_in_threadpool(f.write, bloco)
+                    if digest is not None and digest.digest() != esperado:
+                        raise HTTPException(STATUS_CHECKSUM_INVALIDO, detail="Checksum do bloco não confere")
+                    await run_in_threadpool(self._sincronizar, f)
+                except BaseException:
+                    await run_in_threadpool(f.truncate, offset)
+                    raise
+
+            await run_in_threadpool(self._confirmar_bloco, meta, offset + recebidos)
+            return meta["offset"]
+
+    def finalizar(self, upload_id: str, sha256: Optional[str] = None) -> ArquivoRecebido:
+        """
+        Entrega o arquivo montado de uma sessão completa como ArquivoRecebido:
+        um hard link (ou cópia) do qual quem recebe passa a ser dono. A sessão
+        só some com encerrar(), depois que o destino aceitou o arquivo; assim
+        uma recusa (ex.: 429) pode ser repetida sem reenviar os blocos.
+        `sha256`, se informado, é conferido com o arquivo inteiro.
+        """
+        with self._exclusivo(upload_id):
+            meta = self.obter(upload_id)
+            if meta["offset"] != meta["tamanho"]:
+                raise HTTPException(409, detail=f"Upload incompleto: {meta['offset']} de {meta['tamanho']} bytes",
+                                    headers={"Upload-Offset": str(meta["offset"])})
+            dados = self._dados_path(meta)
+            if "sha256" not in meta:
+                with etapa("hash"):
+                    meta["sha256"] = hash_arquivo(str(dados))
+                self._gravar_meta(meta)
+            if sha256 and sha256.lower() != meta["sha256"]:
+                raise HTTPException(STATUS_CHECKSUM_INVALIDO, detail="SHA-256 do arquivo não confere")
+            entrega = dados.with_name(f"{upload_id}.{uuid.uuid4().hex[:8]}{dados.suffix}")
+            try:
+                os.link(dados, entrega)
+            except OSError:
+                shutil.copyfile(dados, entrega)
+        registrar_entrada(tamanho=meta["tamanho"])
+        return ArquivoRecebido(str(entrega), meta["filename"], meta["sha256"], meta["tamanho"])
+
+    def encerrar(self, upload_id: str) -> None:
+        """Remove a sessão (metadados, lock e dados); arquivos já entregues continuam."""
+        try:
+            self._remover(self.obter(upload_id))
+        except HTTPException:
+            pass
+
+    def cancelar(self, upload_id: str) -> None:
+        """Descarta uma sessão e os bytes já recebidos; 404 se não existir."""
+        self._remover(self.obter(upload_id))
+
+    def _remover(self, meta: Dict[str, Any]) -> None:
+        for caminho in (self._dados_path(meta), self.diretorio / f"{meta['id']}.lock",
+                        self._meta_path(meta["id"])):
+            caminho.unlink(missing_ok=True)
+
+    def limpar_expirados(self) -> None:
+        """Remove sessões paradas há mais de `ttl` e arquivos órfãos antigos (no máximo 1x por minuto)."""
+        agora = time.time()
+        with self._lock_limpeza:
+            if agora - self._ultima_limpeza < _INTERVALO_LIMPEZA:
+                return
+            self._ultima_limpeza = agora
+        for caminho in self.diretorio.iterdir():
+            try:
+                if agora - caminho.stat().st_mtime <= self.ttl:
+                    continue
+                upload_id = caminho.name[:32]
+                if caminho.suffix != ".json" and self._meta_path(upload_id).exists():
+                    continue  # a sessão decide pelo .json (atualizado a cada bloco)
+                caminho.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("Erro ao limpar upload %s: %s", caminho, e)
+
+
+_UPLOADS = GerenciadorUploads(UPLOAD_DIR, UPLOAD_TTL_SECONDS)
+
+
+def obter_uploads() -> GerenciadorUploads:
+    return _UPLOADS
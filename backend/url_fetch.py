@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.ingest import CHUNK_SIZE, MAX_UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+URL_CACHE_DIR = Path(os.getenv("DOCLING_URL_CACHE_DIR", Path(tempfile.gettempdir()) / "docling_url_cache"))
+URL_CACHE_MAX_AGE_SECONDS = int(os.getenv("DOCLING_URL_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+URL_CACHE_MAX_BYTES = int(os.getenv("DOCLING_URL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+URL_MAX_CONCORRENTES = int(os.getenv("DOCLING_URL_MAX_CONCURRENT", "8"))
+URL_TIMEOUT = float(os.getenv("DOCLING_URL_TIMEOUT_SECONDS", "60"))
+_INTERVALO_LIMPEZA = 60
+
+
+class ErroDownload(Exception):
+    """URL inválida, resposta de erro ou conteúdo acima do limite."""
+
+
+@dataclass
+class UrlBaixada:
+    """Conteúdo de uma URL gravado no cache local, com a extensão do documento."""
+    url: str
+    path: str
+    sha256: str
+    tamanho: int
+    reaproveitado: bool  # True quando o servidor respondeu 304
+
+
+_SESSAO: Optional[requests.Session] = None
+_SESSAO_LOCK = threading.Lock()
+_SEMAFORO = threading.BoundedSemaphore(URL_MAX_CONCORRENTES)
+# Locks por faixa de hash: dois downloads da mesma URL não gravam o mesmo arquivo
+_LOCKS_URL = [threading.Lock() for _ in range(64)]
+_ultima_limpeza = 0.0
+
+
+def _sessao() -> requests.Session:
+    """Sessão HTTP compartilhada, com pool de conexões keep-alive."""
+    global _SESSAO
+    with _SESSAO_LOCK:
+        if _SESSAO is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=URL_MAX_CONCORRENTES, pool_maxsize=URL_MAX_CONCORRENTES)
+            sessao.mount("http://", adaptador)
+            sessao.mount("https://", adaptador)
+            _SESSAO = sessao
+        return _SESSAO
+
+
+def _lock_url(chave: str) -> threading.Lock:
+    return _LOCKS_URL[int(chave[:8], 16) % len(_LOCKS_URL)]
+
+
+def sufixo_url(url: str, content_type: Optional[str] = None) -> str:
+    """
+    Extensão do documento: a do caminho da URL (sem query string nem
+    fragmento) ou, na falta dela, a deduzida do Content-Type.
+    """
+    sufixo = Path(urlparse(url).path).suffix.lower()
+    if sufixo:
+        return sufixo
+    if content_type:
+        return mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+    return ""
+
+
+def limpar_cache(forcar: bool = False) -> None:
+    """
+    Remove downloads expirados e, se preciso, os menos usados até caber em
+    URL_CACHE_MAX_BYTES; depois, os .meta cujo arquivo não existe mais.
+    Sem `forcar`, roda no máximo uma vez por _INTERVALO_LIMPEZA.
+    """
+    global _ultima_limpeza
+    agora = time.time()
+    if not forcar and agora - _ultima_limpeza < _INTERVALO_LIMPEZA:
+        return
+    _ultima_limpeza = agora
+
+    entradas = []
+    total = 0
+    for caminho in URL_CACHE_DIR.iterdir():
+        if caminho.suffix in (".meta", ".tmp"):
+            continue
+        try:
+            st = caminho.stat()
+        except OSError:
+            continue
+        if agora - st.st_mtime > URL_CACHE_MAX_AGE_SECONDS:
+            caminho.unlink(missing_ok=True)
+            continue
+        entradas.append((st.st_mtime, st.st_size, caminho))
+        total += st.st_size
+
+    entradas.sort()  # mais antigos primeiro
+    for _, tamanho, caminho in entradas:
+        if total <= URL_CACHE_MAX_BYTES:
+            break
+        caminho.unlink(missing_ok=True)
+        total -= tamanho
+
+    for meta_path in URL_CACHE_DIR.glob("*.meta"):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if not (URL_CACHE_DIR / meta["arquivo"]).is_file():
+                meta_path.unlink(missing_ok=True)
+        except Exception as e:
+            logger.warning("Erro ao limpar cache de URL %s: %s", meta_path, e)
+
+
+def _ler_meta(meta_path: Path) -> Optional[Dict]:
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return meta if (URL_CACHE_DIR / meta["arquivo"]).is_file() else None
+
+
+def baixar_url(url: str, limite: int = MAX_UPLOAD_BYTES) -> UrlBaixada:
+    """
+    Baixa `url` para o cache local usando a sessão compartilhada (no máximo
+    URL_MAX_CONCORRENTES downloads simultâneos). Se a URL já foi baixada,
+    revalida com If-None-Match/If-Modified-Since e reaproveita o arquivo
+    quando o servidor responde 304.
+    O arquivo é nomeado pelo SHA-256 do conteúdo: um novo download da mesma
+    URL nunca sobrescreve o arquivo que uma conversão pendente vai ler.
+    """
+    if urlparse(url).scheme not in ("http", "https"):
+        raise ErroDownload(f"URL deve ser http ou https: {url}")
+
+    URL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    limpar_cache()
+    chave = hashlib.sha256(url.encode()).hexdigest()
+    meta_path = URL_CACHE_DIR / f"{chave}.meta"
+
+    with _lock_url(chave), _SEMAFORO:
+        meta = _ler_meta(meta_path)
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            resposta = _sessao().get(url, headers=headers, stream=True, timeout=URL_TIMEOUT)
+        except requests.RequestException as e:
+            raise ErroDownload(f"Falha ao baixar {url}: {e}")
+
+        with resposta:
+            if resposta.status_code == 304 and meta:
+                destino = URL_CACHE_DIR / meta["arquivo"]
+                os.utime(destino)  # mantém a ordem de uso para a remoção por tamanho
+                return UrlBaixada(url, str(destino), meta["sha256"], meta["tamanho"], True)
+            if resposta.status_code >= 400:
+                raise ErroDownload(f"{url} respondeu HTTP {resposta.status_code}")
+
+            sufixo = sufixo_url(url, resposta.headers.get("Content-Type"))
+            digest = hashlib.sha256()
+            tamanho = 0
+            tmp = URL_CACHE_DIR / f"{chave}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    for bloco in resposta.iter_content(CHUNK_SIZE):
+                        tamanho += len(bloco)
+                        if tamanho > limite:
+                            raise ErroDownload(f"{url} excede o limite de {limite // (1024 ** 2)} MB")
+                        digest.update(bloco)
+                        f.write(bloco)
+                arquivo = digest.hexdigest() + sufixo
+                destino = URL_CACHE_DIR / arquivo
+                os.replace(tmp, destino)
+            except requests.RequestException as e:
+                tmp.unlink(missing_ok=True)
+                raise ErroDownload(f"Falha ao baixar {url}: {e}")
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+
+        meta = {
+            "url": url,
+            "arquivo": arquivo,
+            "sha256": digest.hexdigest(),
+            "tamanho": tamanho,
+            "etag": resposta.headers.get("ETag"),
+            "last_modified": resposta.headers.get("Last-Modified"),
+            "baixado_em": time.time(),
+        }
+        meta_tmp = meta_path.with_suffix(".meta.tmp")
+        meta_tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(meta_tmp, meta_path)
+        return UrlBaixada(url, str(destino), meta["sha256"], tamanho, False)
@@ -0,0 +1,174 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Número de processos de conversão (0 = um por CPU)
+WORKERS = int(os.getenv("DOCLING_WORKERS", "0")) or (os.cpu_count() or 1)
+# "spawn" evita herdar threads/estado do PyTorch do processo pai
+START_METHOD = os.getenv("DOCLING_MP_START_METHOD", "spawn")
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+_EM_WORKER = False
+_CONTADORES_CACHE = None
+
+
+def _inicializar_worker(contadores_cache):
+    """
+    Executado uma vez em cada processo do pool: cria e aquece os conversores
+    deste processo (backend.pipelines.aquecer) antes da primeira tarefa.
+    """
+    global _EM_WORKER
+    _EM_WORKER = True
+    from backend.cache import obter_cache
+    obter_cache().compartilhar_contadores(contadores_cache)
+    try:
+        from backend.pipelines import aquecer
+        aquecer()
+    except Exception as e:
+        logger.warning("Falha ao pré-carregar pipeline no worker: %s", e)
+
+
+def em_worker() -> bool:
+    """Indica se o código está rodando dentro de um processo do pool."""
+    return _EM_WORKER
+
+
+def resolver_workers(workers: Optional[int] = None) -> int:
+    return max(1, workers or WORKERS)
+
+
+def obter_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Retorna o pool de processos compartilhado, criando-o na primeira chamada.
+    O pool é mantido entre requisições para que os conversores fiquem aquecidos.
+    """
+    global _POOL, _POOL_WORKERS, _CONTADORES_CACHE
+    workers = resolver_workers(workers)
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_WORKERS != workers:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+        if _POOL is None:
+            ctx = multiprocessing.get_context(START_METHOD)
+            if _CONTADORES_CACHE is None:
+                # Contadores do cache somados entre este processo e os workers
+                from backend.cache import criar_contadores_compartilhados, obter_cache
+                _CONTADORES_CACHE = criar_contadores_compartilhados(ctx)
+                obter_cache().compartilhar_contadores(_CONTADORES_CACHE)
+            _POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=ctx,
+                initializer=_inicializar_worker,
+                initargs=(_CONTADORES_CACHE,),
+            )
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def _descartar_pool():
+    """Descarta um pool quebrado (ex.: worker morto por falta de memória)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+
+
+def submeter_em_pool(func: Callable[..., Any], *args, workers: Optional[int] = None) -> Future:
+    """
+    Envia uma tarefa avulsa ao pool compartilhado. Se o pool estiver quebrado
+    (worker morto em uma tarefa anterior), ele é recriado antes do envio.
+    """
+    try:
+        return obter_pool(workers).submit(func, *args)
+    except BrokenProcessPool:
+        _descartar_pool()
+        return obter_pool(workers).submit(func, *args)
+
+
+def encerrar_pool():
+    """Encerra o pool compartilhado, aguardando as tarefas em andamento."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True, cancel_futures=True)
+            _POOL = None
+
+
+def _erro(chave: str, e: Exception) -> Dict[str, Any]:
+    logger.error("Falha ao processar %s no pool: %s", chave, e)
+    return {"error": f"Não foi possível processar '{chave}': {e}"}
+
+
+def mapear_em_pool(
+    func: Callable[..., Any],
+    tarefas: Dict[str, Tuple],
+    workers: Optional[int] = None,
+    em_voo: Optional[int] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Executa func(*args) para cada tarefa no pool de processos e rende
+    (chave, resultado) na ordem em que as tarefas terminam. `em_voo` limita
+    as tarefas enviadas ao pool ao mesmo tempo (ex.: o peso da Vaga do
+    agendador); sem ele, todas são enviadas de uma vez.
+    Uma tarefa que falha vira {"error": ...} sem interromper as demais; se um
+    worker morrer, as tarefas afetadas são reexecutadas uma a uma.
+    """
+    pool = obter_pool(workers)
+    restantes = iter(tarefas.items())
+    maximo = max(1, em_voo) if em_voo else len(tarefas)
+    futuros = {}
+    quebradas = []
+
+    def _enviar() -> None:
+        while len(futuros) < maximo and not quebradas:
+            proxima = next(restantes, None)
+            if proxima is None:
+                return
+            chave, args = proxima
+            try:
+                futuros[pool.submit(func, *args)] = chave
+            except BrokenProcessPool:
+                quebradas.append(chave)
+
+    try:
+        _enviar()
+        while futuros:
+            prontos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+            for fut in prontos:
+                chave = futuros.pop(fut)
+                try:
+                    resultado = fut.result()
+                except BrokenProcessPool:
+                    quebradas.append(chave)
+                    continue
+                except Exception as e:
+                    resultado = _erro(chave, e)
+                yield chave, resultado
+            _enviar()
+    finally:
+        for fut in futuros:
+            fut.cancel()
+
+    # Tarefas que não chegaram a ser enviadas porque o pool quebrou
+    quebradas.extend(chave for chave, _ in restantes)
+
+    if quebradas:
+        _descartar_pool()
+    # Reexecução isolada: um arquivo que derruba o worker não leva os outros junto
+    for chave in quebradas:
+        try:
+            yield chave, obter_pool(workers).submit(func, *tarefas[chave]).result()
+        except BrokenProcessPool as e:
+            _descartar_pool()
+            yield chave, _erro(chave, e)
+        except Exception as e:
+            yield chave, _erro(chave, e)
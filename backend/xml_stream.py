@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Profundidade padrão dos registros (1 = raiz, 2 = filhos da raiz), como o
+# item_depth do xmltodict
+XML_RECORD_DEPTH = int(os.getenv("DOCLING_XML_RECORD_DEPTH", "2"))
+
+
+def _nome(tag: str) -> str:
+    # "{uri}local" → "uri:local", igual ao xmltodict com process_namespaces=True
+    if tag.startswith("{"):
+        uri, local = tag[1:].split("}", 1)
+        return f"{uri}:{local}"
+    return tag
+
+
+def _adicionar(destino: Dict[str, Any], chave: str, valor: Any) -> None:
+    if chave not in destino:
+        destino[chave] = valor
+    elif isinstance(destino[chave], list):
+        destino[chave].append(valor)
+    else:
+        destino[chave] = [destino[chave], valor]
+
+
+def elemento_para_dict(elem: ET.Element) -> Any:
+    """
+    Converte um elemento no mesmo formato do xmltodict: atributos como "@nome",
+    texto como "#text" (ou valor direto quando não há atributos nem filhos) e
+    filhos repetidos como listas.
+    """
+    resultado: Dict[str, Any] = {}
+    for nome, valor in elem.attrib.items():
+        resultado[f"@{_nome(nome)}"] = valor
+    for filho in elem:
+        _adicionar(resultado, _nome(filho.tag), elemento_para_dict(filho))
+
+    texto = (elem.text or "").strip()
+    if not resultado:
+        return texto or None
+    if texto:
+        resultado["#text"] = texto
+    return resultado
+
+
+def iterar_registros_xml(path: str, profundidade: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Percorre o XML em streaming e rende cada elemento da `profundidade` pedida
+    como {tag: conteúdo}. Cada registro é descartado da árvore logo após ser
+    rendido, então a memória fica limitada ao tamanho de um registro.
+    """
+    profundidade = profundidade or XML_RECORD_DEPTH
+    pilha = []
+    for evento, elem in ET.iterparse(path, events=("start", "end")):
+        if evento == "start":
+            pilha.append(elem)
+            continue
+
+        nivel = len(pilha)
+        pilha.pop()
+        if nivel == profundidade:
+            yield {_nome(elem.tag): elemento_para_dict(elem)}
+            # Registro já rendido: solta-o do pai para liberar memória
+            if pilha:
+                pilha[-1].remove(elem)
+            elem.clear()
+        elif nivel < profundidade:
+            elem.clear()
+
+
+def gerar_ndjson(path: str, profundidade: Optional[int] = None) -> Iterator[bytes]:
+    """Um registro JSON por linha; um erro de parse vira uma última linha {"error": ...}."""
+    try:
+        for registro in iterar_registros_xml(path, profundidade):
+            yield json.dumps(registro, ensure_ascii=False).encode() + b"\n"
+    except ET.ParseError as e:
+        logger.error("XML inválido %s: %s", path, e)
+        yield json.dumps({"error": f"XML inválido: {e}"}, ensure_ascii=False).encode() + b"\n"
+
+
+def gerar_array_json(path: str, profundidade: Optional[int] = None) -> Iterator[bytes]:
+    """Os mesmos registros como um único array JSON enviado aos poucos."""
+    yield b"["
+    separador = b""
+    try:
+        for registro in iterar_registros_xml(path, profundidade):
+            yield separador + json.dumps(registro, ensure_ascii=False).encode()
+            separador = b","
+    except ET.ParseError as e:
+        logger.error("XML inválido %s: %s", path, e)
+        yield separador + json.dumps({"error": f"XML inválido: {e}"}, ensure_ascii=False).encode()
+    yield b"]"
@@ -1,58 +1,193 @@
+import argparse
+import json
 import os
-import zipfile
 import tempfile
-import shutil
-import json
+import time
+import zipfile
 from pathlib import Path
-from backend.converter import converter_arquivo
+from typing import Dict, Optional, Sequence
+
+from backend.archive import (
+    ARQUIVO_RELATORIO, EXTENSOES_ARQUIVO, ArquivoInvalido, nome_saida, planejar_arquivo, planejar_pasta,
+)
+from backend.cache import obter_cache
+from backend.converter import iterar_arquivos
+from backend.fields import CAMPOS_ARQUIVO, resolver_campos
+from backend.pipelines import PERFIL_PADRAO, PERFIS_VALIDOS
+from backend.responses import serializar_json
+from backend.tables import FORMATOS_TABELA
+
+# Script local para converter zips (ou pastas) com muitos arquivos em json.
+#
+#   python -m backend.zip_to_json lote.zip -o resultados_json.zip --workers 8
+#
+# O checkpoint (padrão: <saida>.checkpoint/) guarda o JSON de cada arquivo
+# convertido, pelo SHA-256 do conteúdo, e um manifest.jsonl; rodar de novo
+# depois de uma falha pula o que já foi convertido. Arquivos com erro são
+# tentados novamente.
+
+
+class Checkpoint:
+    """Resultados já convertidos, por SHA-256 do arquivo de entrada."""
+
+    def __init__(self, pasta: Path, opcoes: Dict):
+        self.pasta = pasta
+        self.jsons = pasta / "jsons"
+        self.jsons.mkdir(parents=True, exist_ok=True)
+        self.manifesto = pasta / "manifest.jsonl"
+        self.opcoes = opcoes
+        self.concluidos = set()
+        if self.manifesto.exists():
+            with open(self.manifesto, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue  # última linha truncada por uma queda
+                    if registro.get("opcoes") == opcoes and not registro.get("erro"):
+                        self.concluidos.add(registro["sha256"])
+        self._saida = open(self.manifesto, "a", encoding="utf-8")
+
+    def caminho(self, sha256: str) -> Path:
+        return self.jsons / f"{sha256}.json"
+
+    def concluido(self, sha256: str) -> bool:
+        return sha256 in self.concluidos and self.caminho(sha256).is_file()
+
+    def gravar(self, sha256: str, rel: str, corpo: bytes, erro: bool) -> None:
+        # JSON primeiro (atômico), manifesto depois: uma linha no manifesto
+        # sempre aponta para um arquivo completo
+        destino = self.caminho(sha256)
+        tmp = destino.with_suffix(".tmp")
+        tmp.write_bytes(corpo)
+        os.replace(tmp, destino)
+        registro = {"sha256": sha256, "arquivo": rel, "erro": erro, "opcoes": self.opcoes}
+        self._saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._saida.flush()
+        if not erro:
+            self.concluidos.add(sha256)
+
+    def fechar(self) -> None:
+        self._saida.close()
+
+
+def converter_lote(entrada: Path, saida: Path, checkpoint_dir: Path, workers=None,
+                   perfil: str = PERFIL_PADRAO, table_format: str = "records",
+                   fields: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Converte todos os arquivos de `entrada` (.zip, .rar ou pasta) e grava o
+    ZIP de JSONs em `saida`, entrada por entrada. Retorna o resumo da execução.
+    `fields` limita as partes de cada resultado (padrão: todas).
+    """
+    campos = resolver_campos(fields, CAMPOS_ARQUIVO)
+    inicio = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="docling_") as temp_dir:
+        # 1) Selecionar os arquivos suportados (sem extrair a árvore inteira)
+        if entrada.is_dir():
+            plano = planejar_pasta(str(entrada))
+        else:
+            print(f"📂 Lendo {entrada.name}")
+            plano = planejar_arquivo(str(entrada), entrada.suffix, temp_dir)
+
+        total = plano.total
+        bytes_total = sum(Path(p).stat().st_size for p in plano.caminhos.values())
+        print(f"🗂️ {total} arquivos, {len(plano.caminhos)} conteúdos distintos "
+              f"({bytes_total / 1024 ** 2:.1f} MB); {len(plano.ignorados)} ignorados")
+
+        # 2) Separar o que o checkpoint já tem
+        checkpoint = Checkpoint(checkpoint_dir, {"perfil": perfil, "table_format": table_format,
+                                                 "fields": list(campos)})
+        pendentes = {
+            sha256: (path, sha256)
+            for sha256, path in plano.caminhos.items()
+            if not checkpoint.concluido(sha256)
+        }
+        pulados = len(plano.caminhos) - len(pendentes)
+        if pulados:
+            print(f"⏭️ {pulados} arquivos já convertidos no checkpoint {checkpoint_dir}")
+
+        # 3) Converter em paralelo e gravar cada JSON no ZIP assim que termina
+        parcial = saida.with_name(saida.name + ".part")
+        erros = feitos = 0
+        bytes_convertidos = 0
+        inicio_conversao = time.perf_counter()
+        try:
+            with zipfile.ZipFile(parcial, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr(ARQUIVO_RELATORIO, serializar_json(plano.relatorio()))
+                for sha256, nomes in plano.nomes.items():
+                    if sha256 not in pendentes:
+                        for rel in nomes:
+                            zf.write(checkpoint.caminho(sha256), arcname=nome_saida(rel))
+
+                for sha256, resultado in iterar_arquivos(pendentes, workers, perfil, table_format, campos):
+                    feitos += 1
+                    bytes_convertidos += Path(pendentes[sha256][0]).stat().st_size
+                    rel = plano.nomes[sha256][0]
+                    erro = "error" in resultado
+                    corpo = serializar_json(resultado)
+                    checkpoint.gravar(sha256, rel, corpo, erro)
+                    for nome in plano.nomes[sha256]:
+                        zf.writestr(nome_saida(nome), corpo)
+                    if erro:
+                        erros += 1
+                        print(f"⚠️ [{feitos}/{len(pendentes)}] Erro em {rel}: {resultado['error']}")
+                    else:
+                        print(f"🔄 [{feitos}/{len(pendentes)}] Convertido {rel}")
+        finally:
+            checkpoint.fechar()
+        os.replace(parcial, saida)
+
+    duracao = time.perf_counter() - inicio
+    duracao_conversao = time.perf_counter() - inicio_conversao
+    return {
+        "arquivos": total,
+        "ignorados": len(plano.ignorados),
+        "convertidos": feitos - erros,
+        "erros": erros,
+        "pulados": pulados,
+        "segundos": round(duracao, 1),
+        "arquivos_por_s": round(feitos / duracao_conversao, 2) if feitos else 0.0,
+        "mb_por_s": round(bytes_convertidos / 1024 ** 2 / duracao_conversao, 2) if feitos else 0.0,
+    }
 
-# Script local para converter zips com muitos arquivos em json
 
 def main():
-    # 1) Define caminhos
-    desktop = Path.home() / "Desktop"
-    zip_name = "file.zip"
-    zip_path = desktop / zip_name
-    output_zip = desktop / "resultados_json.zip"
-
-    if not zip_path.exists():
-        print(f"❌ ZIP não encontrado em {zip_path}")
-        return
-
-    # 2) Pasta temporária para extração
-    temp_dir = Path(tempfile.mkdtemp(prefix="docling_"))
-    print(f"📂 Extraindo em {temp_dir}")
-
-    # 3) Extrair tudo do ZIP
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(temp_dir)
-    print("✅ Extração concluída.")
-
-    # 4) Converter cada arquivo em JSON
-    json_dir = temp_dir / "jsons"
-    json_dir.mkdir(exist_ok=True)
-    for file_path in temp_dir.rglob("*"):
-        if file_path.is_file():
-            try:
-                print(f"🔄 Convertendo {file_path.name}...")
-                result = converter_arquivo(str(file_path))
-                json_path = json_dir / f"{file_path.stem}.json"
-                with open(json_path, "w", encoding="utf-8") as jf:
-                    json.dump(result, jf, ensure_ascii=False, indent=2)
-            except Exception as e:
-                print(f"⚠️ Erro em {file_path.name}: {e}")
-
-    print(f"✅ Conversão concluída. JSONs em {json_dir}")
-
-    # 5) Empacotar todos os JSONs num ZIP
-    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zf_out:
-        for json_file in json_dir.iterdir():
-            zf_out.write(json_file, arcname=json_file.name)
-    print(f"📦 Novo ZIP criado em {output_zip}")
-
-    # 6) Limpar temporários
-    shutil.rmtree(temp_dir)
-    print("🧹 Limpeza concluída.")
+    parser = argparse.ArgumentParser(description="Converte um .zip, .rar ou pasta de documentos em um ZIP de JSONs.")
+    parser.add_argument("entrada", type=Path, help=".zip, .rar ou pasta com os documentos")
+    parser.add_argument("-o", "--saida", type=Path, help="ZIP de saída (padrão: <entrada>_json.zip)")
+    parser.add_argument("--checkpoint", type=Path, help="pasta do checkpoint (padrão: <saida>.checkpoint)")
+    parser.add_argument("--workers", type=int, help="processos de conversão (padrão: DOCLING_WORKERS ou nº de CPUs)")
+    parser.add_argument("--perfil", default=PERFIL_PADRAO, choices=PERFIS_VALIDOS)
+    parser.add_argument("--table-format", default="records", choices=FORMATOS_TABELA)
+    parser.add_argument("--fields", help=f"partes do resultado, separadas por vírgula ({','.join(CAMPOS_ARQUIVO)})")
+    args = parser.parse_args()
+
+    entrada = args.entrada.expanduser()
+    if not entrada.exists():
+        parser.error(f"❌ Entrada não encontrada: {entrada}")
+    if entrada.is_file() and entrada.suffix.lower() not in EXTENSOES_ARQUIVO:
+        parser.error("❌ Entrada deve ser .zip, .rar ou uma pasta")
+    saida = (args.saida or entrada.with_name(f"{entrada.stem}_json.zip")).expanduser()
+    try:
+        campos = resolver_campos(args.fields, CAMPOS_ARQUIVO)
+    except ValueError as e:
+        parser.error(f"❌ {e}")
+    checkpoint = (args.checkpoint or saida.with_name(saida.name + ".checkpoint")).expanduser()
+
+    try:
+        resumo = converter_lote(entrada, saida, checkpoint, args.workers, args.perfil, args.table_format, campos)
+    except ArquivoInvalido as e:
+        raise SystemExit(f"❌ {e}")
+
+    print(f"📦 ZIP de JSONs criado em {saida}")
+    print(
+        f"✅ {resumo['convertidos']} convertidos, {resumo['erros']} com erro, "
+        f"{resumo['ignorados']} ignorados, {resumo['pulados']} do checkpoint em {resumo['segundos']}s "
+        f"({resumo['arquivos_por_s']} arquivos/s, {resumo['mb_por_s']} MB/s)"
+    )
+    stats = obter_cache().estatisticas()
+    print(f"🗃️ Cache: {stats['hits']} hits, {stats['misses']} misses")
+
 
 if __name__ == "__main__":
     main()
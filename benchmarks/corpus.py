@@ -0,0 +1,348 @@
+"""
+Gera um corpus sintético e reprodutível para os benchmarks: PDFs de texto,
+PDFs no layout de DANFE, XLSX, DOCX, XMLs de NF-e e arquivos ZIP/RAR, em
+vários tamanhos. Não depende de arquivos externos (RAR só se o binário
+`rar` estiver no PATH; XLSX só com openpyxl).
+
+    python -m benchmarks.corpus --destino /tmp/corpus --tamanhos pequeno,medio
+"""
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+try:  # openpyxl já vem com o backend (leitura de .xlsx)
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Páginas (PDF/DOCX), linhas (XLSX) e itens (NF-e) por tamanho
+TAMANHOS = {
+    "pequeno": {"paginas": 1, "linhas": 50, "itens": 5},
+    "medio": {"paginas": 10, "linhas": 1000, "itens": 50},
+    "grande": {"paginas": 50, "linhas": 10000, "itens": 500},
+}
+_PALAVRAS = (
+    "nota fiscal produto serviço valor imposto cliente fornecedor pagamento entrega "
+    "contrato pedido estoque transporte documento relatório período saldo total"
+).split()
+_LARGURA_A4, _ALTURA_A4 = 595.0, 842.0
+# (label, valor) típicos de DANFE
+_CAMPOS_DANFE = [
+    ("NOME/RAZÃO SOCIAL", "Comercial Exemplo Ltda"),
+    ("CNPJ", "12.345.678/0001-95"),
+    ("INSCRIÇÃO ESTADUAL", "123.456.789.110"),
+    ("ENDEREÇO", "Rua das Flores, 100"),
+    ("MUNICÍPIO", "São Paulo"),
+    ("CEP", "01310-100"),
+    ("UF", "SP"),
+    ("DATA DA EMISSÃO", "01/02/2024"),
+    ("HORA DA SAÍDA", "10:30:00"),
+    ("NATUREZA DA OPERAÇÃO", "VENDA"),
+    ("BASE DE CÁLCULO DO ICMS", "1.000,00"),
+    ("VALOR DO ICMS", "180,00"),
+    ("VALOR TOTAL DOS PRODUTOS", "1.234,56"),
+    ("VALOR TOTAL DA NOTA", "1.234,56"),
+    ("SÉRIE", "001"),
+    ("PLACA DO VEÍCULO", "ABC1D23"),
+]
+
+
+# ---------------------------------------------------------------------------
+# PDF mínimo (texto em Helvetica e retângulos), sem dependências
+# ---------------------------------------------------------------------------
+
+def _texto_pdf(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def escrever_pdf(path: Path, paginas: List[Tuple[List[Tuple[float, float, float, str]], List[Tuple]]]) -> None:
+    """
+    Grava um PDF com uma página por item de `paginas`; cada página é
+    (textos, retangulos) com textos (x, y, tamanho_fonte, texto) e
+    retângulos (x, y, largura, altura), em pontos a partir do canto inferior esquerdo.
+    """
+    objetos: List[bytes] = []
+
+    def adicionar(corpo: bytes) -> int:
+        objetos.append(corpo)
+        return len(objetos)
+
+    catalogo = adicionar(b"")  # preenchidos depois que as páginas existirem
+    raiz_paginas = adicionar(b"")
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    ids_paginas = []
+    for textos, retangulos in paginas:
+        comandos = [f"{x:.1f} {y:.1f} {w:.1f} {h:.1f} re S" for x, y, w, h in retangulos]
+        for x, y, tamanho, texto in textos:
+            comandos.append(f"BT /F1 {tamanho:g} Tf {x:.1f} {y:.1f} Td ({_texto_pdf(texto)}) Tj ET")
+        fluxo = "\n".join(comandos).encode("cp1252", errors="replace")
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(fluxo), fluxo))
+        ids_paginas.append(adicionar(
+            f"<< /Type /Page /Parent {raiz_paginas} 0 R /MediaBox [0 0 {_LARGURA_A4:g} {_ALTURA_A4:g}] "
+            f"/Resources << /Font << /F1 {fonte} 0 R >> >> /Contents {conteudo} 0 R >>".encode()
+        ))
+
+    objetos[catalogo - 1] = f"<< /Type /Catalog /Pages {raiz_paginas} 0 R >>".encode()
+    kids = " ".join(f"{i} 0 R" for i in ids_paginas)
+    objetos[raiz_paginas - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(ids_paginas)} >>".encode()
+
+    saida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for numero, corpo in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n%s\nendobj\n" % (numero, corpo)
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        saida += b"%010d 00000 n \n" % offset
+    saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objetos) + 1, catalogo, inicio_xref
+    )
+    path.write_bytes(bytes(saida))
+
+
+def _frase(rng: random.Random, palavras: int) -> str:
+    return " ".join(rng.choice(_PALAVRAS) for _ in range(palavras)).capitalize() + "."
+
+
+def gerar_pdf_texto(path: Path, paginas: int, rng: random.Random) -> None:
+    """Relatório com título, parágrafos e uma tabela simples por página."""
+    conteudo = []
+    for p in range(paginas):
+        textos = [(50, 790, 16, f"Relatório de operações - página {p + 1}")]
+        y = 760
+        for _ in range(12):
+            textos.append((50, y, 10, _frase(rng, 12)))
+            y -= 16
+        retangulos = []
+        for linha in range(8):
+            y -= 20
+            for coluna, valor in enumerate((f"Item {linha + 1}", f"{rng.randint(1, 99)}",
+                                            f"{rng.uniform(10, 1000):.2f}".replace(".", ","))):
+                retangulos.append((50 + coluna * 150, y - 6, 150, 20))
+                textos.append((55 + coluna * 150, y, 10, valor))
+        conteudo.append((textos, retangulos))
+    escrever_pdf(path, conteudo)
+
+
+def gerar_pdf_danfe(path: Path, paginas: int, rng: random.Random) -> None:
+    """DANFE sintético: caixas com o label no topo (fonte pequena) e o valor abaixo."""
+    conteudo = []
+    for p in range(paginas):
+        textos = [(40, 805, 12, "DANFE - DOCUMENTO AUXILIAR DA NOTA FISCAL ELETRÔNICA")]
+        retangulos = []
+        chave = "".join(str(rng.randint(0, 9)) for _ in range(44))
+        textos += [(42, 782, 6, "CHAVE DE ACESSO"), (42, 770, 9, " ".join(chave[i:i + 4] for i in range(0, 44, 4)))]
+        retangulos.append((40, 765, 515, 26))
+        for linha in range(20):
+            for coluna in range(3):
+                label, valor = _CAMPOS_DANFE[(linha * 3 + coluna + p) % len(_CAMPOS_DANFE)]
+                x, y = 40 + coluna * 172, 730 - linha * 34
+                retangulos.append((x, y - 14, 172, 34))
+                textos.append((x + 2, y + 12, 6, label))
+                textos.append((x + 2, y, 9, valor))
+        conteudo.append((textos, retangulos))
+    escrever_pdf(path, conteudo)
+
+
+# ---------------------------------------------------------------------------
+# DOCX e XLSX
+# ---------------------------------------------------------------------------
+
+_DOCX_TIPOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    "</Types>"
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/></Relationships>'
+)
+
+
+def gerar_docx(path: Path, paginas: int, rng: random.Random) -> None:
+    """DOCX mínimo (parágrafos, títulos e uma tabela por "página"), escrito direto no zip."""
+    partes = []
+    for p in range(paginas):
+        partes.append(f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr>'
+                      f"<w:r><w:t>Seção {p + 1}</w:t></w:r></w:p>")
+        for _ in range(10):
+            partes.append(f"<w:p><w:r><w:t>{escape(_frase(rng, 15))}</w:t></w:r></w:p>")
+        linhas = []
+        for linha in range(6):
+            celulas = "".join(
+                f"<w:tc><w:p><w:r><w:t>{escape(valor)}</w:t></w:r></w:p></w:tc>"
+                for valor in (f"Item {linha + 1}", rng.choice(_PALAVRAS), f"{rng.uniform(1, 500):.2f}")
+            )
+            linhas.append(f"<w:tr>{celulas}</w:tr>")
+        partes.append(f"<w:tbl>{''.join(linhas)}</w:tbl>")
+    documento = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{''.join(partes)}</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _DOCX_TIPOS)
+        zf.writestr("_rels/.rels", _DOCX_RELS)
+        zf.writestr("word/document.xml", documento)
+
+
+def gerar_xlsx(path: Path, linhas: int, rng: random.Random) -> bool:
+    if openpyxl is None:
+        return False
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "vendas"
+    ws.append(["data", "produto", "quantidade", "valor"])
+    for i in range(linhas):
+        ws.append([f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                   rng.choice(_PALAVRAS), rng.randint(1, 100), round(rng.uniform(1, 1000), 2)])
+    wb.save(path)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# NF-e XML
+# ---------------------------------------------------------------------------
+
+def gerar_nfe_xml(path: Path, itens: int, rng: random.Random) -> None:
+    """nfeProc completo (emitente, destinatário, itens, totais e protocolo)."""
+    chave = "".join(str(rng.randint(0, 9)) for _ in range(44))
+    dets, total = [], 0.0
+    for i in range(1, itens + 1):
+        valor = round(rng.uniform(1, 500), 2)
+        total += valor
+        dets.append(
+            f'<det nItem="{i}"><prod><cProd>{i:05d}</cProd><xProd>Produto {i}</xProd>'
+            f"<NCM>84713012</NCM><CFOP>5102</CFOP><uCom>UN</uCom><qCom>1.0000</qCom>"
+            f"<vUnCom>{valor:.2f}</vUnCom><vProd>{valor:.2f}</vProd></prod></det>"
+        )
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">'
+        f'<NFe><infNFe Id="NFe{chave}" versao="4.00">'
+        "<ide><cUF>35</cUF><natOp>VENDA</natOp><mod>55</mod><serie>1</serie>"
+        f"<nNF>{rng.randint(1, 999999)}</nNF><dhEmi>2024-01-01T10:00:00-03:00</dhEmi></ide>"
+        "<emit><CNPJ>12345678000195</CNPJ><xNome>Emitente Ltda</xNome>"
+        "<enderEmit><xLgr>Rua A</xLgr><nro>1</nro><xBairro>Centro</xBairro><xMun>São Paulo</xMun>"
+        "<UF>SP</UF><CEP>01310100</CEP></enderEmit><IE>123456789110</IE></emit>"
+        "<dest><CPF>12345678909</CPF><xNome>Destinatário</xNome></dest>"
+        f"{''.join(dets)}"
+        f"<total><ICMSTot><vProd>{total:.2f}</vProd><vNF>{total:.2f}</vNF></ICMSTot></total>"
+        "</infNFe></NFe>"
+        f"<protNFe><infProt><chNFe>{chave}</chNFe><dhRecbto>2024-01-01T10:01:00-03:00</dhRecbto>"
+        "<nProt>135240000000001</nProt><cStat>100</cStat><xMotivo>Autorizado o uso da NF-e</xMotivo>"
+        "</infProt></protNFe></nfeProc>"
+    )
+    path.write_text(xml, encoding="utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Corpus completo
+# ---------------------------------------------------------------------------
+
+def _compactar(destino: Path, arquivos: List[Path]) -> Dict[str, List[str]]:
+    gerados = {"zip": [], "rar": []}
+    zip_path = destino / "documentos.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for arquivo in arquivos:
+            zf.write(arquivo, f"{arquivo.parent.name}/{arquivo.name}")
+    gerados["zip"].append(str(zip_path))
+
+    rar = shutil.which("rar")
+    if rar:
+        rar_path = destino / "documentos.rar"
+        subprocess.run([rar, "a", "-ep1", "-idq", str(rar_path)] + [str(a) for a in arquivos], check=True)
+        gerados["rar"].append(str(rar_path))
+    return gerados
+
+
+def gerar_corpus(destino: str, tamanhos: List[str], semente: int = 42) -> Dict[str, List[str]]:
+    """
+    Gera o corpus em `destino` (pdf/, danfe/, docx/, xlsx/, xml/, archive/) e
+    grava corpus.json com os caminhos por categoria, os tamanhos e a semente.
+    Mesma semente, mesmo corpus.
+    """
+    rng = random.Random(semente)
+    base = Path(destino)
+    categorias: Dict[str, List[str]] = {c: [] for c in ("pdf", "danfe", "docx", "xlsx", "xml", "zip", "rar")}
+    for pasta in ("pdf", "danfe", "docx", "xlsx", "xml", "archive"):
+        (base / pasta).mkdir(parents=True, exist_ok=True)
+
+    documentos: List[Path] = []
+    for tamanho in tamanhos:
+        escala = TAMANHOS[tamanho]
+        alvos = {
+            "pdf": base / "pdf" / f"relatorio_{tamanho}.pdf",
+            "danfe": base / "danfe" / f"danfe_{tamanho}.pdf",
+            "docx": base / "docx" / f"documento_{tamanho}.docx",
+            "xlsx": base / "xlsx" / f"planilha_{tamanho}.xlsx",
+            "xml": base / "xml" / f"nfe_{tamanho}.xml",
+        }
+        gerar_pdf_texto(alvos["pdf"], escala["paginas"], rng)
+        # DANFEs reais têm 1 a poucas páginas
+        gerar_pdf_danfe(alvos["danfe"], max(1, escala["paginas"] // 10), rng)
+        gerar_docx(alvos["docx"], escala["paginas"], rng)
+        if not gerar_xlsx(alvos["xlsx"], escala["linhas"], rng):
+            del alvos["xlsx"]
+        gerar_nfe_xml(alvos["xml"], escala["itens"], rng)
+        for categoria, path in alvos.items():
+            categorias[categoria].append(str(path))
+            documentos.append(path)
+
+    for categoria, paths in _compactar(base / "archive", documentos).items():
+        categorias[categoria] += paths
+
+    manifesto = {"tamanhos": list(tamanhos), "semente": semente, "categorias": categorias}
+    (base / "corpus.json").write_text(json.dumps(manifesto, indent=2), encoding="utf-8")
+    return categorias
+
+
+def carregar_corpus(destino: str, tamanhos: List[str], semente: int = 42) -> Dict[str, List[str]]:
+    """
+    Reaproveita o corpus de `destino` se ele foi gerado com os mesmos
+    tamanhos e semente e todos os arquivos existem; senão gera de novo.
+    """
+    manifesto = Path(destino) / "corpus.json"
+    if manifesto.is_file():
+        try:
+            dados = json.loads(manifesto.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            dados = {}
+        categorias = dados.get("categorias") or {}
+        if (dados.get("tamanhos") == list(tamanhos) and dados.get("semente") == semente
+                and all(Path(p).is_file() for paths in categorias.values() for p in paths)):
+            return categorias
+    return gerar_corpus(destino, tamanhos, semente)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--destino", default="benchmarks/corpus")
+    parser.add_argument("--tamanhos", default="pequeno,medio", help=f"{','.join(TAMANHOS)}")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    categorias = gerar_corpus(args.destino, args.tamanhos.split(","), args.semente)
+    for categoria, paths in categorias.items():
+        print(f"  {categoria:6s} {len(paths)} arquivo(s)")
+    if not categorias["rar"]:
+        print("  (binário rar não encontrado: sem arquivos .rar)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compara o matcher espacial de extract_danfe_key_values com o matcher
+anterior por ordem de leitura: tempo por página e acertos em páginas
+sintéticas de DANFE com várias colunas.
+
+    python -m benchmarks.danfe_kv --paginas 50 --colunas 4 --linhas 15
+"""
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+from backend.danfe_converter import (
+    extract_danfe_key_values,
+    extract_danfe_key_values_sequencial,
+)
+
+# (label, valor) típicos de DANFE
+CAMPOS = [
+    ("CNPJ", "12.345.678/0001-95"),
+    ("INSCRIÇÃO ESTADUAL", "123.456.789.110"),
+    ("CEP", "01310-100"),
+    ("UF", "SP"),
+    ("DATA DA EMISSÃO", "01/02/2024"),
+    ("HORA DA SAÍDA", "10:30:00"),
+    ("VALOR TOTAL DA NOTA", "1.234,56"),
+    ("BASE DE CÁLCULO DO ICMS", "1.000,00"),
+    ("SÉRIE", "001"),
+    ("PLACA DO VEÍCULO", "ABC1D23"),
+]
+
+_LARGURA_CELULA = 140.0
+_ALTURA_CELULA = 24.0
+_ALTURA_PAGINA = 842.0
+
+
+def _item(texto: str, pagina: int, l: float, topo: float, largura: float, altura: float) -> Dict:
+    # bbox com origem no canto inferior esquerdo, como o Docling exporta para PDFs
+    return {
+        "text": texto,
+        "prov": [{
+            "page_no": pagina,
+            "bbox": {"l": l, "t": _ALTURA_PAGINA - topo, "r": l + largura,
+                     "b": _ALTURA_PAGINA - topo - altura, "coord_origin": "BOTTOMLEFT"},
+        }],
+    }
+
+
+def gerar_pagina(pagina: int, colunas: int, linhas: int) -> Tuple[List[Dict], Dict[str, str]]:
+    """
+    Página em grade: cada célula tem o label no topo e o valor logo abaixo.
+    A ordem de leitura simula o Docling em layouts tabulares: todos os labels
+    de uma linha e depois todos os valores dela.
+    """
+    itens, esperado = [], {}
+    for linha in range(linhas):
+        labels, valores = [], []
+        for coluna in range(colunas):
+            label, valor = CAMPOS[(linha * colunas + coluna) % len(CAMPOS)]
+            label = f"{label} {linha}-{coluna}"[:60]
+            valor = f"{valor} #{linha}{coluna}"
+            esperado[label] = valor
+            x = 20 + coluna * _LARGURA_CELULA
+            y = 20 + linha * _ALTURA_CELULA
+            labels.append(_item(label, pagina, x + 2, y + 2, 120, 7))
+            valores.append(_item(valor, pagina, x + 2, y + 11, 100, 9))
+        itens.extend(labels + valores)
+    return itens, esperado
+
+
+def _medir(func, paginas: List[Tuple[List[Dict], Dict[str, str]]], repeticoes: int) -> Dict:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        pares_por_pagina = [func(itens) for itens, _ in paginas]
+    duracao = (time.perf_counter() - inicio) / repeticoes
+
+    acertos = total = 0
+    for pares, (_, esperado) in zip(pares_por_pagina, paginas):
+        total += len(esperado)
+        acertos += sum(1 for p in pares if esperado.get(p["label"]) == p["value"])
+    return {
+        "ms_por_pagina": round(duracao / len(paginas) * 1000, 3),
+        "acertos": acertos,
+        "total": total,
+    }
+
+
+def executar(paginas: int, colunas: int, linhas: int, repeticoes: int = 5) -> Dict:
+    dados = [gerar_pagina(p + 1, colunas, linhas) for p in range(paginas)]
+    return {
+        "sequencial": _medir(extract_danfe_key_values_sequencial, dados, repeticoes),
+        "espacial": _medir(extract_danfe_key_values, dados, repeticoes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paginas", type=int, default=50)
+    parser.add_argument("--colunas", type=int, default=4)
+    parser.add_argument("--linhas", type=int, default=15)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    resultado = executar(args.paginas, args.colunas, args.linhas, args.repeticoes)
+    print(f"{args.paginas} páginas, {args.colunas * args.linhas} campos por página")
+    for nome, r in resultado.items():
+        print(f"  {nome:10s} {r['ms_por_pagina']:8.3f} ms/página   acertos {r['acertos']}/{r['total']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Suite de benchmarks: latência e vazão dos endpoints (/upload-file/,
+/upload-danfe/, /upload-archive/) e das funções processar_pasta e
+extract_danfe_key_values em vários níveis de concorrência, sobre o corpus
+sintético de benchmarks.corpus. Grava os resultados em JSON e compara com
+um baseline, saindo com código 1 se houver regressão.
+
+    python -m benchmarks.suite --servidor --concorrencia 1,4 --saida resultados.json
+    python -m benchmarks.suite --url http://localhost:8000 --baseline baseline.json
+    python -m benchmarks.suite --so funcoes --gravar-baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from benchmarks.corpus import carregar_corpus
+
+# Cache de resultados desligado: o benchmark mede conversões, não hits.
+# Vale para o servidor e as funções locais; com --url, ver _conteudo_unico()
+os.environ.setdefault("DOCLING_CACHE_ENABLED", "0")
+
+# Caso de endpoint: (nome, rota, categoria do corpus)
+CASOS_ENDPOINT = [
+    ("upload-file/pdf", "/upload-file/", "pdf"),
+    ("upload-file/docx", "/upload-file/", "docx"),
+    ("upload-file/xlsx", "/upload-file/", "xlsx"),
+    ("upload-file/xml", "/upload-file/", "xml"),
+    ("upload-danfe", "/upload-danfe/", "danfe"),
+    ("upload-archive/zip", "/upload-archive/", "zip"),
+    ("upload-archive/rar", "/upload-archive/", "rar"),
+]
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def medir(tarefa: Callable[[int], bool], concorrencia: int, requisicoes: int) -> Dict:
+    """
+    Executa `tarefa(i)` `requisicoes` vezes com `concorrencia` threads.
+    A tarefa devolve True em caso de sucesso; latências só das bem-sucedidas.
+    """
+    latencias: List[float] = []
+    erros = 0
+
+    def _uma(i: int):
+        inicio = time.perf_counter()
+        ok = tarefa(i)
+        return ok, time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concorrencia) as executor:
+        for ok, duracao in executor.map(_uma, range(requisicoes)):
+            if ok:
+                latencias.append(duracao)
+            else:
+                erros += 1
+    total = time.perf_counter() - inicio
+
+    if not latencias:
+        return {"requisicoes": requisicoes, "erros": erros}
+    return {
+        "requisicoes": requisicoes,
+        "erros": erros,
+        "vazao_por_s": round(len(latencias) / total, 3),
+        "latencia_media_s": round(statistics.mean(latencias), 6),
+        "latencia_p50_s": round(_percentil(latencias, 50), 6),
+        "latencia_p95_s": round(_percentil(latencias, 95), 6),
+        "latencia_max_s": round(max(latencias), 6),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+def _conteudo_unico(path: Path) -> bytes:
+    """
+    Conteúdo do arquivo com um comentário único no fim (PDF e XML), para que
+    um servidor remoto com cache de resultados converta de verdade. Os demais
+    formatos vão inalterados; hits nesses casos aparecem em "cache_hits".
+    """
+    dados = path.read_bytes()
+    sufixo = path.suffix.lower()
+    if sufixo == ".pdf":
+        return dados + f"\n%benchmark {uuid.uuid4().hex}\n".encode()
+    if sufixo == ".xml":
+        return dados + f"\n<!-- benchmark {uuid.uuid4().hex} -->\n".encode()
+    return dados
+
+
+def _hits_cache(url: str) -> Optional[int]:
+    try:
+        return requests.get(url.rstrip("/") + "/cache/stats", timeout=10).json()["hits"]
+    except Exception:
+        return None
+
+
+def _tarefa_upload(url: str, arquivos: List[str], perfil: str) -> Callable[[int], bool]:
+    def _enviar(i: int) -> bool:
+        path = Path(arquivos[i % len(arquivos)])
+        r = requests.post(url, files={"file": (path.name, _conteudo_unico(path))},
+                          params={"perfil": perfil}, timeout=600)
+        _ = r.content  # consome o corpo inteiro (respostas em streaming)
+        return r.ok
+    return _enviar
+
+
+def benchmark_endpoints(url: str, corpus: Dict[str, List[str]], niveis: List[int],
+                        repeticoes: int, perfil: str) -> Dict[str, Dict]:
+    resultados = {}
+    for nome, rota, categoria in CASOS_ENDPOINT:
+        arquivos = corpus.get(categoria) or []
+        if not arquivos:
+            print(f"  {nome}: sem arquivos de {categoria} no corpus, ignorado")
+            continue
+        tarefa = _tarefa_upload(url.rstrip("/") + rota, arquivos, perfil)
+        tarefa(0)  # aquecimento: carrega modelos e pipelines
+        for c in niveis:
+            antes = _hits_cache(url)
+            resultados[f"{nome}@c{c}"] = r = medir(tarefa, c, max(c, len(arquivos)) * repeticoes)
+            depois = _hits_cache(url)
+            if antes is not None and depois is not None and depois > antes:
+                # Latências de hits no cache do servidor, não de conversões
+                r["cache_hits"] = depois - antes
+                print(f"  aviso: {nome}@c{c} teve {depois - antes} hit(s) no cache do servidor")
+            _imprimir(f"{nome}@c{c}", r)
+    return resultados
+
+
+# ---------------------------------------------------------------------------
+# Funções
+# ---------------------------------------------------------------------------
+
+def benchmark_funcoes(corpus: Dict[str, List[str]], niveis: List[int], repeticoes: int,
+                      perfil: str) -> Dict[str, Dict]:
+    from backend.converter import processar_pasta
+    from backend.danfe_converter import extract_danfe_key_values
+    from benchmarks.danfe_kv import gerar_pagina
+
+    resultados = {}
+
+    # processar_pasta: concorrência = número de workers do pool
+    with tempfile.TemporaryDirectory() as pasta:
+        for categoria in ("pdf", "danfe", "docx", "xlsx", "xml"):
+            for origem in corpus.get(categoria) or []:
+                destino = Path(pasta) / categoria / Path(origem).name
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                destino.write_bytes(Path(origem).read_bytes())
+        for c in niveis:
+            # Aquecimento fora da medição: o pool é recriado quando o número de
+            # workers muda e cada processo novo carrega os modelos
+            processar_pasta(pasta, workers=c, perfil=perfil)
+            r = medir(lambda _: not any("error" in v for v in
+                                        processar_pasta(pasta, workers=c, perfil=perfil).values()),
+                      1, repeticoes)
+            resultados[f"processar_pasta@c{c}"] = r
+            _imprimir(f"processar_pasta@c{c}", r)
+
+    # extract_danfe_key_values: páginas sintéticas com bbox, em threads
+    paginas = [gerar_pagina(p + 1, 4, 15)[0] for p in range(20)]
+    for c in niveis:
+        r = medir(lambda i: bool(extract_danfe_key_values(paginas[i % len(paginas)])),
+                  c, len(paginas) * repeticoes * c)
+        resultados[f"extract_danfe_key_values@c{c}"] = r
+        _imprimir(f"extract_danfe_key_values@c{c}", r)
+    return resultados
+
+
+# ---------------------------------------------------------------------------
+# Servidor local, resultados e baseline
+# ---------------------------------------------------------------------------
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(timeout: float = 300) -> Tuple[subprocess.Popen, str]:
+    """Sobe `uvicorn backend.main:app` numa porta livre e espera o /ready."""
+    porta = _porta_livre()
+    url = f"http://127.0.0.1:{porta}"
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(porta), "--log-level", "warning"],
+        env=dict(os.environ),
+    )
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("uvicorn terminou antes de responder")
+        try:
+            if requests.get(f"{url}/ready", timeout=2).ok:
+                return processo, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)  # ainda subindo ou aquecendo (503)
+    processo.terminate()
+    raise RuntimeError(f"servidor não respondeu em {timeout:.0f}s")
+
+
+def _ambiente() -> Dict:
+    try:
+        from importlib.metadata import version
+        docling = version("docling")
+    except Exception:
+        docling = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "docling": docling,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparar(atual: Dict[str, Dict], baseline: Dict[str, Dict], tolerancia: float) -> List[str]:
+    """
+    Regressão: latência p50 acima de (1 + tolerancia) x baseline, vazão abaixo
+    de (1 - tolerancia) x baseline ou erros onde o baseline não tinha.
+    """
+    regressoes = []
+    for caso, r in sorted(atual.items()):
+        b = baseline.get(caso)
+        if not b:
+            continue
+        if r.get("erros", 0) > b.get("erros", 0):
+            regressoes.append(f"{caso}: erros {b.get('erros', 0)} -> {r['erros']}")
+        if "latencia_p50_s" in r and "latencia_p50_s" in b:
+            if r["latencia_p50_s"] > b["latencia_p50_s"] * (1 + tolerancia):
+                regressoes.append(f"{caso}: p50 {b['latencia_p50_s']}s -> {r['latencia_p50_s']}s")
+            if r["vazao_por_s"] < b["vazao_por_s"] * (1 - tolerancia):
+                regressoes.append(f"{caso}: vazão {b['vazao_por_s']}/s -> {r['vazao_por_s']}/s")
+    return regressoes
+
+
+def _imprimir(caso: str, r: Dict) -> None:
+    if "latencia_p50_s" not in r:
+        print(f"  {caso:36s} falhou ({r['erros']} erros)")
+        return
+    print(f"  {caso:36s} {r['vazao_por_s']:8.2f}/s  p50 {r['latencia_p50_s']:8.3f}s  "
+          f"p95 {r['latencia_p95_s']:8.3f}s  erros {r['erros']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", default="benchmarks/corpus", help="pasta do corpus (gerado se faltar)")
+    parser.add_argument("--tamanhos", default="pequeno,medio")
+    parser.add_argument("--url", help="API já em execução")
+    parser.add_argument("--servidor", action="store_true", help="sobe um uvicorn local para os endpoints")
+    parser.add_argument("--so", choices=("endpoints", "funcoes"), help="roda só um dos grupos")
+    parser.add_argument("--concorrencia", default="1,2,4", help="níveis separados por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=2)
+    parser.add_argument("--perfil", default="standard")
+    parser.add_argument("--saida", default="benchmarks/resultados.json")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--gravar-baseline", help="também grava os resultados como baseline aqui")
+    args = parser.parse_args()
+
+    niveis = [int(c) for c in args.concorrencia.split(",")]
+    corpus = carregar_corpus(args.corpus, args.tamanhos.split(","))
+    resultados: Dict[str, Dict] = {}
+
+    if args.so != "funcoes":
+        processo: Optional[subprocess.Popen] = None
+        url = args.url
+        if url is None and args.servidor:
+            processo, url = iniciar_servidor()
+        if url is None:
+            print("Endpoints ignorados: use --url ou --servidor")
+        else:
+            print(f"Endpoints ({url})")
+            try:
+                resultados.update(benchmark_endpoints(url, corpus, niveis, args.repeticoes, args.perfil))
+            finally:
+                if processo is not None:
+                    processo.terminate()
+                    processo.wait()
+
+    if args.so != "endpoints":
+        print("Funções")
+        resultados.update(benchmark_funcoes(corpus, niveis, args.repeticoes, args.perfil))
+
+    saida = {"ambiente": _ambiente(), "parametros": vars(args), "resultados": resultados}
+    for destino in filter(None, (args.saida, args.gravar_baseline)):
+        Path(destino).parent.mkdir(parents=True, exist_ok=True)
+        Path(destino).write_text(json.dumps(saida, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados em {args.saida}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["resultados"]
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        if regressoes:
+            print(f"Regressões (tolerância {args.tolerancia:.0%}):")
+            for linha in regressoes:
+                print(f"  {linha}")
+            sys.exit(1)
+        print(f"Sem regressões em relação a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
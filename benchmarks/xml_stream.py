@@ -0,0 +1,97 @@
+"""
+Compara o caminho atual de XML (xmltodict.parse do arquivo inteiro) com o
+streaming de backend.xml_stream: tempo e pico de memória Python (tracemalloc).
+
+    python -m benchmarks.xml_stream --registros 20000
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+import xmltodict
+
+from backend.xml_stream import iterar_registros_xml
+
+_NFE = (
+    '<NFe><infNFe Id="NFe{chave}" versao="4.00">'
+    "<ide><cUF>35</cUF><nNF>{n}</nNF><serie>1</serie><dhEmi>2024-01-01T10:00:00-03:00</dhEmi></ide>"
+    "<emit><CNPJ>12345678000195</CNPJ><xNome>Emitente {n}</xNome></emit>"
+    "<dest><CPF>12345678909</CPF><xNome>Destinatario {n}</xNome></dest>"
+    "{itens}"
+    "<total><ICMSTot><vProd>{total}</vProd><vNF>{total}</vNF></ICMSTot></total>"
+    "</infNFe></NFe>"
+)
+_ITEM = (
+    '<det nItem="{i}"><prod><cProd>{i:05d}</cProd><xProd>Produto {i}</xProd>'
+    "<NCM>84713012</NCM><CFOP>5102</CFOP><qCom>1.0000</qCom><vProd>10.00</vProd></prod></det>"
+)
+
+
+def gerar_xml(path: str, registros: int, itens_por_registro: int = 5) -> None:
+    """Grava um lote sintético de NF-e com `registros` notas."""
+    itens = "".join(_ITEM.format(i=i) for i in range(1, itens_por_registro + 1))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<lote xmlns="http://www.portalfiscal.inf.br/nfe">')
+        for n in range(registros):
+            f.write(_NFE.format(chave=f"{n:044d}", n=n, itens=itens, total=f"{itens_por_registro * 10}.00"))
+        f.write("</lote>")
+
+
+def _medir(func):
+    # Tempo e memória em execuções separadas: o tracemalloc distorce o tempo
+    gc.collect()
+    inicio = time.perf_counter()
+    quantidade = func()
+    duracao = time.perf_counter() - inicio
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"registros": quantidade, "segundos": round(duracao, 3), "pico_mb": round(pico / 1024 ** 2, 1)}
+
+
+def _atual(path: str) -> int:
+    with open(path, encoding="utf-8") as f:
+        dados = xmltodict.parse(f.read(), process_namespaces=True)
+    lote = dados["http://www.portalfiscal.inf.br/nfe:lote"]
+    return len(lote["http://www.portalfiscal.inf.br/nfe:NFe"])
+
+
+def _streaming(path: str) -> int:
+    return sum(1 for _ in iterar_registros_xml(path, 2))
+
+
+def executar(registros: int) -> dict:
+    fd, path = tempfile.mkstemp(suffix=".xml")
+    os.close(fd)
+    try:
+        gerar_xml(path, registros)
+        return {
+            "arquivo_mb": round(os.path.getsize(path) / 1024 ** 2, 1),
+            "xmltodict": _medir(lambda: _atual(path)),
+            "streaming": _medir(lambda: _streaming(path)),
+        }
+    finally:
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--registros", type=int, default=20000)
+    args = parser.parse_args()
+
+    resultado = executar(args.registros)
+    print(f"XML de {resultado['arquivo_mb']} MB com {args.registros} registros")
+    for nome in ("xmltodict", "streaming"):
+        r = resultado[nome]
+        print(f"  {nome:10s} {r['segundos']:8.3f} s   pico {r['pico_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
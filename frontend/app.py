@@ -1,26 +1,87 @@
+import base64
+import hashlib
+import time
+
 import streamlit as st
 import requests
 
 API_URL = "http://localhost:8000"
+CHUNK_BYTES = 8 * 1024 * 1024   # tamanho de cada bloco do upload retomável
+TENTATIVAS = 5                  # falhas seguidas toleradas antes de desistir
+
+
+def _offset_confirmado(sessao: requests.Session, url: str) -> int:
+    r = sessao.head(url, timeout=30)
+    r.raise_for_status()
+    return int(r.headers["Upload-Offset"])
+
+
+def enviar_em_blocos(arquivo, destino: str, progresso=None, **params) -> requests.Response:
+    """
+    Envia o arquivo pelo upload retomável da API (/uploads): blocos de
+    CHUNK_BYTES com checksum, retomando do offset confirmado pelo servidor
+    quando um bloco falha, e finaliza no endpoint `destino` com `params`.
+    """
+    tamanho = arquivo.size
+    sessao = requests.Session()
+    r = sessao.post(f"{API_URL}/uploads", params={"filename": arquivo.name},
+                    headers={"Upload-Length": str(tamanho)}, timeout=30)
+    r.raise_for_status()
+    url = f"{API_URL}/uploads/{r.json()['id']}"
+
+    offset, falhas = 0, 0
+    while offset < tamanho:
+        arquivo.seek(offset)
+        bloco = arquivo.read(CHUNK_BYTES)
+        checksum = "sha256 " + base64.b64encode(hashlib.sha256(bloco).digest()).decode()
+        try:
+            r = sessao.patch(url, data=bloco, timeout=300,
+                             headers={"Upload-Offset": str(offset), "Upload-Checksum": checksum})
+            if r.status_code == 204:
+                offset, falhas = int(r.headers["Upload-Offset"]), 0
+                if progresso is not None:
+                    progresso.progress(offset / tamanho, f"{offset / 1024 ** 2:.0f} de {tamanho / 1024 ** 2:.0f} MB")
+                continue
+            if r.status_code < 500 and r.status_code not in (409, 460):
+                r.raise_for_status()  # erro definitivo (ex.: 404, 413)
+        except (requests.ConnectionError, requests.Timeout):
+            pass
+
+        # Falha no bloco: espera e retoma do offset que o servidor confirmou
+        falhas += 1
+        if falhas > TENTATIVAS:
+            raise RuntimeError(f"Upload interrompido em {offset} de {tamanho} bytes")
+        time.sleep(min(2 ** falhas, 30))
+        try:
+            offset = _offset_confirmado(sessao, url)
+        except requests.RequestException:
+            pass
+
+    # Finalizar; com a fila cheia (429) o upload continua no servidor e basta repetir
+    for _ in range(TENTATIVAS):
+        r = sessao.post(f"{url}/finalizar", params={"destino": destino, **params}, timeout=None)
+        if r.status_code != 429:
+            break
+        time.sleep(int(r.headers.get("Retry-After", "5")))
+    return r
+
 
 st.title("📥 EVA Desk API Client")
 
 st.header("1) Upload único")
 file = st.file_uploader("PDF, XLSX, PPTX", type=["pdf","xlsx","pptx"])
 if file and st.button("Enviar arquivo"):
-    fd = {"file": (file.name, file, file.type)}
-    r = requests.post(f"{API_URL}/upload-file/", files=fd)
+    r = enviar_em_blocos(file, "upload-file", st.progress(0.0))
     if r.ok:
         st.download_button("Baixar JSON", r.content, f"{file.name}.json", "application/json")
     else:
         st.error(r.text)
 
 st.markdown("---")
-st.header("2) Upload de ZIP")
-zipf = st.file_uploader("Arquivo ZIP", type=["zip"], key="zip")
-if zipf and st.button("Enviar ZIP"):
-    fd = {"zip_file": (zipf.name, zipf, zipf.type)}
-    r = requests.post(f"{API_URL}/upload-zip/", files=fd)
+st.header("2) Upload de ZIP ou RAR")
+zipf = st.file_uploader("Arquivo ZIP ou RAR", type=["zip", "rar"], key="zip")
+if zipf and st.button("Enviar arquivo compactado"):
+    r = enviar_em_blocos(zipf, "upload-archive", st.progress(0.0))
     if r.ok:
         st.download_button("Baixar ZIP de JSONs", r.content, "resultados_json.zip", "application/zip")
     else:
@@ -30,7 +91,7 @@ st.markdown("---")
 st.header("3) Processar URL")
 url = st.text_input("URL")
 if url and st.button("Processar URL"):
-    r = requests.post(f"{API_URL}/process-url/", json={"url": url})
+    r = requests.post(f"{API_URL}/process-url/", params={"url": url})
     if r.ok:
         dispo = r.headers.get("content-disposition","")
         fname = dispo.split("filename=")[-1] if "filename=" in dispo else "output.json"
@@ -0,0 +1,127 @@
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from backend.archive import (
+    ArquivoInvalido, PlanoArquivo, nome_saida, planejar_arquivo, planejar_pasta, zip_em_fluxo,
+)
+
+PDF_A = b"%PDF-1.4 conteudo A"
+PDF_B = b"%PDF-1.4 conteudo B"
+
+
+def _zip(path: Path, membros):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("pasta/", "")
+        for nome, conteudo in membros:
+            zf.writestr(nome, conteudo)
+    return path
+
+
+MEMBROS = [
+    ("a/x.pdf", PDF_A),
+    ("b/x.pdf", PDF_A),               # mesmo conteúdo de a/x.pdf
+    ("c/y.pdf", PDF_B),
+    ("__MACOSX/a/._x.pdf", b"lixo"),
+    ("Thumbs.db", b"lixo"),
+    ("programa.exe", b"MZ"),
+    ("falso.pdf", b"nao sou pdf"),
+    ("vazio.pdf", b""),
+    ("notas.md", b"# texto"),
+]
+
+
+def test_filtra_e_deduplica_membros(tmp_path):
+    origem = _zip(tmp_path / "lote.zip", MEMBROS)
+    plano = planejar_arquivo(str(origem), ".zip", str(tmp_path / "destino"))
+
+    assert plano.total == 4
+    assert sorted(n for nomes in plano.nomes.values() for n in nomes) == ["a/x.pdf", "b/x.pdf", "c/y.pdf", "notas.md"]
+    assert len(plano.caminhos) == 3  # a/x.pdf e b/x.pdf viram uma conversão só
+    # Só os conteúdos distintos são copiados, com nomes gerados
+    copiados = sorted(p.read_bytes() for p in (tmp_path / "destino").iterdir())
+    assert copiados == sorted([PDF_A, PDF_B, b"# texto"])
+
+    motivos = {i["arquivo"]: i["motivo"] for i in plano.ignorados}
+    assert motivos == {
+        "__MACOSX/a/._x.pdf": "metadados do macOS",
+        "Thumbs.db": "arquivo de sistema",
+        "programa.exe": "extensão não suportada",
+        "falso.pdf": "conteúdo não corresponde à extensão",
+        "vazio.pdf": "arquivo vazio",
+    }
+    assert plano.relatorio()["duplicados"] == {"b/x.pdf": "a/x.pdf"}
+
+
+def test_expandir_rende_um_resultado_por_membro(tmp_path):
+    plano = PlanoArquivo()
+    plano.adicionar("a/x.pdf", "h1", "/tmp/1")
+    assert not plano.adicionar("b/x.pdf", "h1", "/tmp/2")
+    plano.adicionar("c/y.pdf", "h2", "/tmp/3")
+    assert list(plano.expandir([("h1", "r1"), ("h2", "r2")])) == [
+        ("a/x.pdf", "r1"), ("b/x.pdf", "r1"), ("c/y.pdf", "r2"),
+    ]
+
+
+def test_nome_saida_mantem_o_caminho():
+    assert nome_saida("a/x.pdf") == "a/x.pdf.json"
+    assert nome_saida("b/x.pdf") != nome_saida("a/x.pdf")
+    assert nome_saida("_ignorados.json") != "_ignorados.json"
+
+
+def test_arquivo_corrompido_ou_extensao_errada(tmp_path):
+    corrompido = tmp_path / "ruim.zip"
+    corrompido.write_bytes(b"isso nao e um zip")
+    with pytest.raises(ArquivoInvalido, match="ZIP inválido"):
+        planejar_arquivo(str(corrompido), ".zip", str(tmp_path / "d"))
+    with pytest.raises(ArquivoInvalido, match=".zip ou .rar"):
+        planejar_arquivo(str(corrompido), ".7z", str(tmp_path / "d"))
+
+
+def test_aceita_arquivo_em_memoria(tmp_path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("x.pdf", PDF_A)
+    buffer.seek(0)
+    plano = planejar_arquivo(buffer, ".ZIP", str(tmp_path / "d"))
+    assert plano.total == 1
+
+
+def test_planejar_pasta(tmp_path):
+    for nome, conteudo in MEMBROS:
+        destino = tmp_path / "pasta" / nome
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(conteudo)
+    plano = planejar_pasta(str(tmp_path / "pasta"))
+    assert plano.total == 4
+    assert len(plano.caminhos) == 3
+    assert len(plano.ignorados) == 5
+
+
+
+def test_zip_em_fluxo_gera_zip_valido_entrada_por_entrada():
+    produzidas = []
+
+    def entradas():
+        for i in range(3):
+            produzidas.append(i)
+            yield f"sub/arquivo_{i}.json", f'{{"i": {i}}}'.encode() * 100
+
+    partes = []
+    for parte in zip_em_fluxo(entradas()):
+        # Cada entrada é enviada antes da próxima ser produzida
+        partes.append((len(produzidas), parte))
+
+    assert [n for n, _ in partes[:3]] == [1, 2, 3]
+    with zipfile.ZipFile(io.BytesIO(b"".join(p for _, p in partes))) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [f"sub/arquivo_{i}.json" for i in range(3)]
+        assert zf.read("sub/arquivo_1.json") == b'{"i": 1}' * 100
+        assert all(info.compress_type == zipfile.ZIP_DEFLATED for info in zf.infolist())
+
+
+def test_zip_em_fluxo_vazio():
+    with zipfile.ZipFile(io.BytesIO(b"".join(zip_em_fluxo([])))) as zf:
+        assert zf.namelist() == []
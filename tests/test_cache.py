@@ -0,0 +1,45 @@
+import os
+import threading
+
+import pytest
+
+from backend.cache import ResultCache, chave_cache
+
+
+def test_obter_hit_em_memoria(tmp_path):
+    cache = ResultCache(tmp_path, max_itens_memoria=4, max_bytes_disco=1024 ** 2, max_idade=3600)
+    chave = chave_cache("abc", "arquivo", {"suffix": ".pdf"})
+    cache.gravar(chave, {"texto": "ok"})
+
+    resultado = {}
+    t = threading.Thread(target=lambda: resultado.update(valor=cache.obter(chave)), daemon=True)
+    t.start()
+    t.join(timeout=5)
+
+    assert not t.is_alive(), "obter() travou num hit em memória"
+    assert resultado["valor"] == {"texto": "ok"}
+    assert cache.estatisticas()["hits_memoria"] == 1
+
+
+def test_chave_cache_distingue_extensao():
+    assert chave_cache("abc", "arquivo", {"suffix": ".pdf"}) != chave_cache("abc", "arquivo", {"suffix": ".docx"})
+
+
+def test_limpeza_mantem_lock_de_conversao_em_andamento(tmp_path):
+    fcntl = pytest.importorskip("fcntl")
+    cache = ResultCache(tmp_path, max_itens_memoria=4, max_bytes_disco=1024 ** 2, max_idade=60)
+    lock = cache._caminho_lock("abc")
+    lock.parent.mkdir(parents=True)
+    lock.touch()
+    os.utime(lock, (0, 0))  # mais antigo que max_idade
+
+    fd = os.open(lock, os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        cache.limpar_disco()
+        assert lock.exists()
+    finally:
+        os.close(fd)
+
+    cache.limpar_disco()
+    assert not lock.exists()
@@ -0,0 +1,69 @@
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.main import _nome_unico, app
+
+
+def test_nome_unico():
+    usados = set()
+    assert [_nome_unico(n, usados) for n in ("a.pdf", "b.pdf", "a.pdf", "a.pdf")] == [
+        "a.pdf", "b.pdf", "a.pdf#2", "a.pdf#3",
+    ]
+
+
+@pytest.fixture
+def convertidos(monkeypatch):
+    chamadas = []
+
+    def iterar_danfes(lote, perfil, table_format, fields, em_voo=None):
+        for sha256, (path, _) in lote.items():
+            chamadas.append(sha256)
+            with open(path, "rb") as f:
+                yield sha256, {"texts": [f.read().decode()]}
+
+    monkeypatch.setattr(main, "iterar_danfes", iterar_danfes)
+    return chamadas
+
+
+def _zip(membros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for nome, conteudo in membros.items():
+            zf.writestr(nome, conteudo)
+    return buffer.getvalue()
+
+
+def test_lote_em_ndjson(convertidos):
+    files = [
+        ("files", ("nota.pdf", b"%PDF nota-1", "application/pdf")),
+        ("files", ("nota.pdf", b"%PDF nota-2", "application/pdf")),
+        ("files", ("leia.txt", b"texto", "text/plain")),
+        ("files", ("notas.zip", _zip({"dentro.pdf": b"%PDF nota-1", "x.docx": b"?"}), "application/zip")),
+    ]
+    resposta = TestClient(app).post("/upload-danfe-batch/", files=files)
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("application/x-ndjson")
+    linhas = {linha["arquivo"]: linha for linha in map(json.loads, resposta.text.splitlines())}
+
+    assert "error" in linhas["leia.txt"]
+    assert "error" in linhas["notas.zip/x.docx"]
+    assert linhas["nota.pdf"]["texts"] == ["%PDF nota-1"]
+    assert linhas["nota.pdf#2"]["texts"] == ["%PDF nota-2"]
+    assert linhas["notas.zip/dentro.pdf"]["texts"] == ["%PDF nota-1"]
+    assert len(convertidos) == 2  # conteúdo repetido é convertido uma vez
+
+
+def test_arquivo_compactado_invalido_vira_linha_de_erro(convertidos):
+    files = [
+        ("files", ("quebrado.zip", b"nao e zip", "application/zip")),
+        ("files", ("nota.pdf", b"%PDF nota", "application/pdf")),
+    ]
+    resposta = TestClient(app).post("/upload-danfe-batch/", files=files)
+    linhas = {linha["arquivo"]: linha for linha in map(json.loads, resposta.text.splitlines())}
+    assert "error" in linhas["quebrado.zip"]
+    assert linhas["nota.pdf"]["texts"] == ["%PDF nota"]
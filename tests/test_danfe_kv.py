@@ -0,0 +1,30 @@
+from backend.danfe_converter import extract_danfe_key_values
+
+
+def _texto(text, l, t, r, b, pagina=1):
+    return {"text": text, "prov": [{"page_no": pagina,
+                                    "bbox": {"l": l, "t": t, "r": r, "b": b, "coord_origin": "TOPLEFT"}}]}
+
+
+def test_valor_logo_abaixo_do_label():
+    pares = extract_danfe_key_values([
+        _texto("CNPJ", 10, 10, 50, 20),
+        _texto("12.345.678/0001-95", 10, 22, 120, 32),
+    ])
+    assert pares == [{"label": "CNPJ", "value": "12.345.678/0001-95",
+                      "category": "identificacao", "confidence": 0.95}]
+
+
+def test_sem_valor_espacial_cai_na_ordem_de_leitura_com_confianca_menor():
+    pares = extract_danfe_key_values([
+        _texto("MUNICÍPIO", 300, 10, 360, 20),
+        _texto("São Paulo", 10, 500, 60, 510),  # longe demais para a busca espacial
+    ])
+    assert [(p["label"], p["value"]) for p in pares] == [("MUNICÍPIO", "São Paulo")]
+    assert pares[0]["confidence"] < 0.7
+
+
+def test_texto_sem_bbox_usa_ordem_de_leitura():
+    pares = extract_danfe_key_values([{"text": "CNPJ"}, {"text": "12.345.678/0001-95"}])
+    assert pares[0]["value"] == "12.345.678/0001-95"
+    assert pares[0]["confidence"] == 0.95
@@ -0,0 +1,20 @@
+import pytest
+
+from backend.fields import CAMPOS_ARQUIVO, CAMPOS_DANFE, CAMPOS_PADRAO_DANFE, resolver_campos
+
+
+def test_vazio_devolve_o_padrao():
+    assert resolver_campos(None, CAMPOS_ARQUIVO) == CAMPOS_ARQUIVO
+    assert resolver_campos(" , ", CAMPOS_ARQUIVO) == CAMPOS_ARQUIVO
+    assert resolver_campos([], CAMPOS_DANFE, CAMPOS_PADRAO_DANFE) == CAMPOS_PADRAO_DANFE
+
+
+def test_ordem_estavel_para_a_chave_do_cache():
+    assert resolver_campos("tables, texts", CAMPOS_ARQUIVO) == ("texts", "tables")
+    assert resolver_campos(["metadata", "texts", "texts"], CAMPOS_ARQUIVO) == ("texts", "metadata")
+    assert resolver_campos("plain_texts", CAMPOS_DANFE, CAMPOS_PADRAO_DANFE) == ("plain_texts",)
+
+
+def test_campo_desconhecido():
+    with pytest.raises(ValueError, match="desconhecidos: foo, plain_texts"):
+        resolver_campos("texts,foo,plain_texts", CAMPOS_ARQUIVO)
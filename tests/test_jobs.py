@@ -0,0 +1,15 @@
+from backend.jobs import JobManager
+
+
+def test_job_so_fica_pendente_depois_de_enfileirado(tmp_path):
+    manager = JobManager(tmp_path, workers=1, ttl=60)
+    job_id = manager.novo_job("file", "nota.pdf")
+
+    # Outro worker do uvicorn que rode iniciar() agora não pode pegar o job
+    assert manager.store.obter(job_id)["status"] == "receiving"
+    assert manager.store.pendentes() == []
+    assert not manager.store.reivindicar(job_id)
+
+    manager.store.atualizar(job_id, status="queued")
+    assert [j["id"] for j in manager.store.pendentes()] == [job_id]
+    manager.encerrar()
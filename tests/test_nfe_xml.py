@@ -0,0 +1,65 @@
+from backend.nfe_xml import converter_nfe_xml
+
+CHAVE = "35240112345678000195550010000001231000001234"
+NFE_PROC = f"""<?xml version="1.0" encoding="UTF-8"?>
+<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">
+  <NFe><infNFe Id="NFe{CHAVE}" versao="4.00">
+    <ide><natOp>VENDA</natOp><mod>55</mod><serie>1</serie><nNF>123</nNF>
+      <dhEmi>2024-01-01T10:00:00-03:00</dhEmi></ide>
+    <emit><CNPJ>12345678000195</CNPJ><xNome>Emitente Ltda</xNome>
+      <enderEmit><xLgr>Rua A</xLgr><xMun>São Paulo</xMun><UF>SP</UF></enderEmit><IE>123456789110</IE></emit>
+    <dest><CPF>12345678909</CPF><xNome>Cliente</xNome></dest>
+    <det nItem="1"><prod><cProd>001</cProd><xProd>Parafuso</xProd><CFOP>5102</CFOP>
+      <qCom>2.0000</qCom><vUnCom>5.00</vUnCom><vProd>10.00</vProd></prod></det>
+    <det nItem="2"><prod><cProd>002</cProd><xProd>Porca</xProd><vProd>2.50</vProd></prod></det>
+    <total><ICMSTot><vProd>12.50</vProd><vNF>12.50</vNF></ICMSTot></total>
+  </infNFe></NFe>
+  <protNFe><infProt><nProt>135240000000001</nProt><dhRecbto>2024-01-01T10:01:00-03:00</dhRecbto>
+    <cStat>100</cStat><xMotivo>Autorizado o uso da NF-e</xMotivo></infProt></protNFe>
+</nfeProc>
+"""
+
+
+def _valores(resultado):
+    return {par["label"]: par["value"] for par in resultado["texts"]}
+
+
+def test_nfe_proc_completa(tmp_path):
+    path = tmp_path / "nota.xml"
+    path.write_text(NFE_PROC, encoding="utf-8")
+    resultado = converter_nfe_xml(str(path))
+
+    valores = _valores(resultado)
+    assert valores["CHAVE DE ACESSO"] == CHAVE
+    assert valores["NÚMERO NF-e"] == "123"
+    assert valores["CNPJ (EMITENTE)"] == "12345678000195"
+    assert valores["MUNICÍPIO (EMITENTE)"] == "São Paulo"
+    assert valores["CPF (DESTINATÁRIO)"] == "12345678909"
+    assert valores["VALOR TOTAL DA NOTA"] == "12.50"
+    assert valores["PROTOCOLO DE AUTORIZAÇÃO DE USO"] == "135240000000001 - 2024-01-01T10:01:00-03:00"
+    assert all(par["confidence"] == 1.0 for par in resultado["texts"])
+
+    (tabela,) = resultado["tables"]
+    assert [item["xProd"] for item in tabela["data"]] == ["Parafuso", "Porca"]
+    assert tabela["data"][1]["CFOP"] is None
+    assert resultado["metadata"]["status_protocolo"] == "100"
+
+
+def test_nfe_sem_namespace_e_sem_protocolo(tmp_path):
+    path = tmp_path / "nota.xml"
+    path.write_text(
+        f'<NFe><infNFe Id="NFe{CHAVE}" versao="3.10"><ide><nNF>7</nNF><dEmi>2014-01-01</dEmi></ide></infNFe></NFe>',
+        encoding="utf-8",
+    )
+    resultado = converter_nfe_xml(str(path))
+    valores = _valores(resultado)
+    assert valores["NÚMERO NF-e"] == "7"
+    assert valores["DATA DA EMISSÃO"] == "2014-01-01"
+    assert "PROTOCOLO DE AUTORIZAÇÃO DE USO" not in valores
+    assert resultado["metadata"]["versao"] == "3.10"
+
+
+def test_xml_que_nao_e_nfe(tmp_path):
+    path = tmp_path / "outro.xml"
+    path.write_text("<pedido><id>1</id></pedido>", encoding="utf-8")
+    assert "infNFe" in converter_nfe_xml(str(path))["error"]
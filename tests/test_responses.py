@@ -0,0 +1,82 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend import responses
+from backend.responses import content_disposition, escolher_codificacao, resposta_json
+
+
+@pytest.fixture(autouse=True)
+def sem_zstd(monkeypatch):
+    monkeypatch.setattr(responses, "zstandard", None)
+
+
+@pytest.mark.parametrize("cabecalho, esperado", [
+    ("gzip, deflate, br", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("deflate, br", None),
+    ("*", "gzip"),
+    ("*;q=0, gzip;q=0", None),
+    ("", None),
+])
+def test_escolher_codificacao(cabecalho, esperado):
+    assert escolher_codificacao(cabecalho) == esperado
+
+
+def test_zstd_tem_preferencia_quando_instalado(monkeypatch):
+    monkeypatch.setattr(responses, "zstandard", object())
+    assert escolher_codificacao("gzip, zstd") == "zstd"
+    assert escolher_codificacao("gzip, zstd;q=0") == "gzip"
+
+
+def test_content_disposition():
+    assert content_disposition("nota.json") == 'attachment; filename="nota.json"'
+    assert content_disposition("ação.json") == "attachment; filename*=utf-8''a%C3%A7%C3%A3o.json"
+
+
+@pytest.fixture
+def cliente():
+    app = FastAPI()
+
+    @app.get("/json/{itens}")
+    def _json(itens: int, request: Request):
+        return resposta_json({"itens": ["valor"] * itens}, request, filename="resultado.json")
+
+    return TestClient(app)
+
+
+def _cru(cliente, itens, accept_encoding):
+    with cliente.stream("GET", f"/json/{itens}", headers={"Accept-Encoding": accept_encoding}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def test_corpo_pequeno_nao_e_comprimido(cliente):
+    r, corpo = _cru(cliente, 1, "gzip")
+    assert "content-encoding" not in r.headers
+    assert json.loads(corpo) == {"itens": ["valor"]}
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["content-disposition"] == 'attachment; filename="resultado.json"'
+
+
+def test_corpo_grande_vai_em_gzip(cliente):
+    r, corpo = _cru(cliente, 1000, "gzip")
+    assert r.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(corpo)) == {"itens": ["valor"] * 1000}
+
+
+def test_sem_accept_encoding_vai_sem_compressao(cliente):
+    r, corpo = _cru(cliente, 1000, "identity")
+    assert "content-encoding" not in r.headers
+    assert len(json.loads(corpo)["itens"]) == 1000
+
+
+def test_corpo_acima_de_stream_min_bytes_vai_em_blocos(cliente, monkeypatch):
+    monkeypatch.setattr(responses, "STREAM_MIN_BYTES", 2048)
+    monkeypatch.setattr(responses, "_BLOCO", 1024)
+    r, corpo = _cru(cliente, 5000, "gzip")
+    assert "content-length" not in r.headers
+    assert json.loads(gzip.decompress(corpo)) == {"itens": ["valor"] * 5000}
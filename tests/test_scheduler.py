@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from backend.scheduler import AgendadorConversao, FilaCheia
+
+
+def _esperar(condicao, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        assert time.monotonic() < limite, "condição não atingida"
+        time.sleep(0.01)
+
+
+def _admitir_em_thread(agendador, ordem, nome, **kwargs):
+    def alvo():
+        vaga = agendador.admitir(**kwargs)
+        ordem.append(nome)
+        vaga.liberar()
+
+    t = threading.Thread(target=alvo, daemon=True)
+    t.start()
+    return t
+
+
+def test_fila_cheia_rejeita_com_retry_after():
+    agendador = AgendadorConversao(limite=1, max_fila=0)
+    vaga = agendador.admitir()
+    with pytest.raises(FilaCheia) as erro:
+        agendador.admitir()
+    assert erro.value.retry_after >= 1
+    assert agendador.estatisticas()["rejeitados"] == 1
+    vaga.liberar()
+    agendador.admitir().liberar()
+
+
+def test_espera_esgotada_vira_fila_cheia():
+    agendador = AgendadorConversao(limite=1, max_fila=4, espera_maxima=0.05)
+    vaga = agendador.admitir()
+    with pytest.raises(FilaCheia):
+        agendador.admitir()
+    assert agendador.estatisticas()["na_fila"] == 0
+    vaga.liberar()
+
+
+def test_arquivos_pequenos_passam_na_frente():
+    agendador = AgendadorConversao(limite=1, max_fila=4, bytes_por_segundo=1024)
+    vaga = agendador.admitir()
+    ordem = []
+    grande = _admitir_em_thread(agendador, ordem, "grande", tamanho=1024 ** 2)
+    _esperar(lambda: agendador.estatisticas()["na_fila"] == 1)
+    pequeno = _admitir_em_thread(agendador, ordem, "pequeno", tamanho=10)
+    _esperar(lambda: agendador.estatisticas()["na_fila"] == 2)
+
+    vaga.liberar()
+    grande.join(5)
+    pequeno.join(5)
+    assert ordem == ["pequeno", "grande"]
+
+
+def test_ordem_de_chegada_sem_prioridade_por_tamanho():
+    agendador = AgendadorConversao(limite=1, max_fila=4, bytes_por_segundo=0)
+    vaga = agendador.admitir()
+    ordem = []
+    grande = _admitir_em_thread(agendador, ordem, "grande", tamanho=1024 ** 2)
+    _esperar(lambda: agendador.estatisticas()["na_fila"] == 1)
+    pequeno = _admitir_em_thread(agendador, ordem, "pequeno", tamanho=10)
+    _esperar(lambda: agendador.estatisticas()["na_fila"] == 2)
+
+    vaga.liberar()
+    grande.join(5)
+    pequeno.join(5)
+    assert ordem == ["grande", "pequeno"]
+
+
+def test_peso_ocupa_varias_vagas():
+    agendador = AgendadorConversao(limite=4, max_fila=4, espera_maxima=0.05)
+    lote = agendador.admitir(peso=3)
+    assert lote.peso == 3
+    assert agendador.estatisticas()["ativos"] == 3
+
+    agendador.admitir().liberar()  # ainda cabe uma
+    with pytest.raises(FilaCheia):
+        agendador.admitir(peso=2)
+    lote.liberar()
+    lote.liberar()  # idempotente
+    assert agendador.estatisticas()["ativos"] == 0
+
+
+def test_peso_limitado_ao_limite():
+    agendador = AgendadorConversao(limite=2)
+    vaga = agendador.admitir(peso=10)
+    assert vaga.peso == 2
+    vaga.liberar()
+    assert agendador.estatisticas()["ativos"] == 0
@@ -0,0 +1,49 @@
+from backend import sharding
+from backend.sharding import deve_fragmentar, mesclar_resultados
+
+
+def test_mesclar_resultados_concatena_listas_em_ordem():
+    partes = [
+        {"texts": ["p1"], "tables": [], "metadata": {}},
+        {"texts": ["p2", "p3"], "tables": [{"t": 1}], "metadata": {"titulo": "x"}},
+        {"texts": ["p4"], "tables": [{"t": 2}], "metadata": {"titulo": "y"}},
+    ]
+    assert mesclar_resultados(partes) == {
+        "texts": ["p1", "p2", "p3", "p4"],
+        "tables": [{"t": 1}, {"t": 2}],
+        "metadata": {"titulo": "x"},
+    }
+
+
+def test_mesclar_resultados_so_com_os_campos_pedidos():
+    assert mesclar_resultados([{"tables": [1]}, {"tables": [2]}]) == {"tables": [1, 2]}
+
+
+def test_deve_fragmentar(tmp_path, monkeypatch):
+    pdf = tmp_path / "grande.pdf"
+    pdf.write_bytes(b"%PDF")
+    monkeypatch.setattr(sharding, "SHARD_MIN_PAGES", 100)
+    monkeypatch.setattr(sharding, "resolver_workers", lambda: 4)
+    monkeypatch.setattr(sharding, "contar_paginas", lambda path: 150)
+    assert deve_fragmentar(str(pdf))
+    assert not deve_fragmentar(str(tmp_path / "nota.docx"))
+    assert not deve_fragmentar(str(tmp_path / "inexistente.pdf"))
+
+    monkeypatch.setattr(sharding, "contar_paginas", lambda path: 99)
+    assert not deve_fragmentar(str(pdf))
+
+    monkeypatch.setattr(sharding, "contar_paginas", lambda path: 150)
+    monkeypatch.setattr(sharding, "resolver_workers", lambda: 1)
+    assert not deve_fragmentar(str(pdf))
+
+
+def test_pdf_ilegivel_nao_e_fragmentado(tmp_path, monkeypatch):
+    pdf = tmp_path / "quebrado.pdf"
+    pdf.write_bytes(b"lixo")
+    monkeypatch.setattr(sharding, "resolver_workers", lambda: 4)
+
+    def falha(path):
+        raise RuntimeError("pdf inválido")
+
+    monkeypatch.setattr(sharding, "contar_paginas", falha)
+    assert not deve_fragmentar(str(pdf))
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from backend.tables import exportar_tabela
+
+
+def _tabela(linhas, cabecalhos=0):
+    grade = [
+        [SimpleNamespace(text=texto, column_header=i < cabecalhos) for texto in linha]
+        for i, linha in enumerate(linhas)
+    ]
+    return SimpleNamespace(data=SimpleNamespace(grid=grade, num_cols=len(linhas[0])))
+
+
+def test_uma_linha_de_cabecalho():
+    tabela = _tabela([["Produto", "Valor"], ["Parafuso", "10,00"], ["Porca", "2,50"]], cabecalhos=1)
+    assert exportar_tabela(tabela) == [
+        {"Produto": "Parafuso", "Valor": "10,00"},
+        {"Produto": "Porca", "Valor": "2,50"},
+    ]
+    assert exportar_tabela(tabela, "columnar") == {
+        "columns": ["Produto", "Valor"],
+        "rows": [["Parafuso", "10,00"], ["Porca", "2,50"]],
+    }
+
+
+def test_cabecalhos_em_varias_linhas_sao_unidos_por_ponto():
+    tabela = _tabela([["Item", "ICMS", "ICMS"], ["", "Base", "Valor"], ["1", "100", "18"]], cabecalhos=2)
+    # Como no export_to_dataframe(): a célula vazia da segunda linha ainda acrescenta o ponto
+    assert exportar_tabela(tabela, "columnar")["columns"] == ["Item.", "ICMS.Base", "ICMS.Valor"]
+
+
+def test_primeira_celula_vazia_nao_ganha_ponto():
+    tabela = _tabela([["", "A"], ["x", "B"], ["1", "2"]], cabecalhos=2)
+    assert exportar_tabela(tabela, "columnar")["columns"] == ["x", "A.B"]
+
+
+def test_sem_cabecalho_colunas_numeradas():
+    tabela = _tabela([["a", "b"], ["c", "d"]])
+    assert exportar_tabela(tabela) == [{0: "a", 1: "b"}, {0: "c", 1: "d"}]
+
+
+def test_colunas_repetidas_ficam_com_o_ultimo_valor():
+    tabela = _tabela([["Valor", "Valor"], ["1", "2"]], cabecalhos=1)
+    assert exportar_tabela(tabela) == [{"Valor": "2"}]
+    assert exportar_tabela(tabela, "columnar")["rows"] == [["1", "2"]]
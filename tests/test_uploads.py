@@ -0,0 +1,90 @@
+import asyncio
+import base64
+import hashlib
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+from backend.uploads import STATUS_CHECKSUM_INVALIDO, GerenciadorUploads
+
+DADOS = b"0123456789" * 10
+
+
+async def _fluxo(*blocos):
+    for bloco in blocos:
+        yield bloco
+
+
+def _enviar(uploads, upload_id, offset, bloco, checksum=None):
+    return asyncio.run(uploads.gravar_bloco(upload_id, offset, checksum, _fluxo(bloco)))
+
+
+def _checksum(bloco: bytes) -> str:
+    return "sha256 " + base64.b64encode(hashlib.sha256(bloco).digest()).decode()
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return GerenciadorUploads(tmp_path, ttl=3600)
+
+
+def test_blocos_em_sequencia_e_finalizar(uploads):
+    sessao = uploads.criar("nota.pdf", len(DADOS))
+    assert _enviar(uploads, sessao["id"], 0, DADOS[:40], _checksum(DADOS[:40])) == 40
+    assert _enviar(uploads, sessao["id"], 40, DADOS[40:]) == len(DADOS)
+
+    recebido = uploads.finalizar(sessao["id"], hashlib.sha256(DADOS).hexdigest())
+    assert Path(recebido.path).read_bytes() == DADOS
+    assert recebido.filename == "nota.pdf"
+    uploads.encerrar(sessao["id"])
+    with pytest.raises(HTTPException) as erro:
+        uploads.obter(sessao["id"])
+    assert erro.value.status_code == 404
+
+
+def test_offset_errado_responde_409_com_offset_confirmado(uploads):
+    sessao = uploads.criar("nota.pdf", len(DADOS))
+    _enviar(uploads, sessao["id"], 0, DADOS[:30])
+    with pytest.raises(HTTPException) as erro:
+        _enviar(uploads, sessao["id"], 50, DADOS[50:])
+    assert erro.value.status_code == 409
+    assert erro.value.headers["Upload-Offset"] == "30"
+
+
+def test_checksum_errado_descarta_o_bloco(uploads):
+    sessao = uploads.criar("nota.pdf", len(DADOS))
+    _enviar(uploads, sessao["id"], 0, DADOS[:30])
+    with pytest.raises(HTTPException) as erro:
+        _enviar(uploads, sessao["id"], 30, DADOS[30:60], _checksum(b"outro"))
+    assert erro.value.status_code == STATUS_CHECKSUM_INVALIDO
+    assert uploads.obter(sessao["id"])["offset"] == 30
+    assert _enviar(uploads, sessao["id"], 30, DADOS[30:]) == len(DADOS)
+    assert Path(uploads.finalizar(sessao["id"]).path).read_bytes() == DADOS
+
+
+def test_bloco_alem_do_tamanho_responde_413(uploads):
+    sessao = uploads.criar("nota.pdf", 10)
+    with pytest.raises(HTTPException) as erro:
+        _enviar(uploads, sessao["id"], 0, DADOS[:20])
+    assert erro.value.status_code == 413
+    assert uploads.obter(sessao["id"])["offset"] == 0
+
+
+def test_finalizar_incompleto_ou_sha256_errado(uploads):
+    sessao = uploads.criar("nota.pdf", len(DADOS))
+    _enviar(uploads, sessao["id"], 0, DADOS[:10])
+    with pytest.raises(HTTPException) as erro:
+        uploads.finalizar(sessao["id"])
+    assert erro.value.status_code == 409
+
+    _enviar(uploads, sessao["id"], 10, DADOS[10:])
+    with pytest.raises(HTTPException) as erro:
+        uploads.finalizar(sessao["id"], "0" * 64)
+    assert erro.value.status_code == STATUS_CHECKSUM_INVALIDO
+
+
+def test_tamanho_acima_do_limite(uploads):
+    with pytest.raises(HTTPException) as erro:
+        uploads.criar("lote.zip", 2048, limite=1024)
+    assert erro.value.status_code == 413
@@ -0,0 +1,105 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from backend import url_fetch
+from backend.url_fetch import ErroDownload, baixar_url, limpar_cache
+
+CONTEUDO = b"%PDF-1.4 conteudo de teste"
+ETAG = '"v1"'
+MODIFICADO = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requisicoes = []
+
+    def do_GET(self):
+        _Handler.requisicoes.append((self.path, dict(self.headers)))
+        if self.path == "/doc.pdf":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._enviar(CONTEUDO, ETag=ETAG)
+        elif self.path == "/data.pdf":
+            if self.headers.get("If-Modified-Since") == MODIFICADO:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._enviar(CONTEUDO, **{"Last-Modified": MODIFICADO})
+        elif self.path == "/grande.pdf":
+            self._enviar(b"x" * 4096)
+        else:
+            self.send_error(404)
+
+    def _enviar(self, corpo, **headers):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in headers.items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor(tmp_path, monkeypatch):
+    monkeypatch.setattr(url_fetch, "URL_CACHE_DIR", tmp_path / "url_cache")
+    _Handler.requisicoes = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("caminho", ["/doc.pdf", "/data.pdf"])
+def test_200_e_depois_304_reaproveita(servidor, caminho):
+    primeira = baixar_url(servidor + caminho)
+    assert not primeira.reaproveitado
+    assert Path(primeira.path).read_bytes() == CONTEUDO
+    assert Path(primeira.path).suffix == ".pdf"
+
+    segunda = baixar_url(servidor + caminho)
+    assert segunda.reaproveitado
+    assert segunda.path == primeira.path
+    assert segunda.sha256 == primeira.sha256
+    assert len(_Handler.requisicoes) == 2
+
+
+def test_arquivo_nomeado_pelo_conteudo(servidor):
+    baixada = baixar_url(servidor + "/doc.pdf")
+    assert Path(baixada.path).name == f"{baixada.sha256}.pdf"
+
+
+def test_404(servidor):
+    with pytest.raises(ErroDownload, match="404"):
+        baixar_url(servidor + "/nao-existe.pdf")
+
+
+def test_esquema_nao_http():
+    with pytest.raises(ErroDownload, match="http ou https"):
+        baixar_url("file:///etc/passwd")
+
+
+def test_corpo_acima_do_limite(servidor):
+    with pytest.raises(ErroDownload, match="excede o limite"):
+        baixar_url(servidor + "/grande.pdf", limite=1024)
+    assert not list(url_fetch.URL_CACHE_DIR.glob("*.tmp"))
+
+
+def test_limpeza_respeita_limite_de_bytes(servidor, monkeypatch):
+    antiga = baixar_url(servidor + "/grande.pdf")
+    recente = baixar_url(servidor + "/doc.pdf")
+    os.utime(antiga.path, (0, Path(recente.path).stat().st_mtime - 10))
+    monkeypatch.setattr(url_fetch, "URL_CACHE_MAX_BYTES", len(CONTEUDO))
+    limpar_cache(forcar=True)
+    assert not Path(antiga.path).exists()
+    assert Path(recente.path).exists()
+    assert len(list(url_fetch.URL_CACHE_DIR.glob("*.meta"))) == 1
@@ -0,0 +1,35 @@
+import math
+
+import pytest
+
+from backend.workers import encerrar_pool, mapear_em_pool, resolver_workers
+
+
+@pytest.fixture(autouse=True)
+def pool_limpo():
+    yield
+    encerrar_pool()
+
+
+def test_resolver_workers():
+    assert resolver_workers(3) == 3
+    assert resolver_workers() >= 1
+
+
+def test_mapear_em_pool_rende_todas_as_tarefas():
+    tarefas = {str(n): (n,) for n in range(6)}
+    resultados = dict(mapear_em_pool(math.factorial, tarefas, workers=2, em_voo=1))
+    assert resultados == {str(n): math.factorial(n) for n in range(6)}
+
+
+def test_falha_de_uma_tarefa_nao_interrompe_as_demais():
+    resultados = dict(mapear_em_pool(math.sqrt, {"ok": (4,), "ruim": (-1,)}, workers=2))
+    assert resultados["ok"] == 2.0
+    assert "ruim" in resultados["ruim"]["error"]
+
+
+def test_worker_que_morre_e_isolado():
+    tarefas = {"a": ("1 + 1",), "queda": ("__import__('os')._exit(1)",), "b": ("2 * 3",)}
+    resultados = dict(mapear_em_pool(eval, tarefas, workers=2))
+    assert resultados["a"] == 2 and resultados["b"] == 6
+    assert "error" in resultados["queda"]
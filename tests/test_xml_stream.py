@@ -0,0 +1,65 @@
+import json
+
+import xmltodict
+
+from backend.xml_stream import gerar_array_json, gerar_ndjson, iterar_registros_xml
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<lote xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">
+  <nota id="1"><numero>10</numero><item>a</item><item>b</item></nota>
+  <nota id="2"><numero>11</numero><obs tipo="x">texto</obs><vazio/></nota>
+  <resumo>2 notas</resumo>
+</lote>
+"""
+
+
+def _registros_xmltodict(path):
+    with open(path, encoding="utf-8") as f:
+        raiz = xmltodict.parse(f.read(), process_namespaces=True)
+    (_, conteudo), = raiz.items()
+    registros = []
+    for tag, valor in conteudo.items():
+        if tag.startswith("@"):
+            continue
+        for item in valor if isinstance(valor, list) else [valor]:
+            registros.append({tag: item})
+    return registros
+
+
+def test_registros_iguais_ao_xmltodict(tmp_path):
+    path = tmp_path / "lote.xml"
+    path.write_text(XML, encoding="utf-8")
+    registros = list(iterar_registros_xml(str(path), 2))
+    assert registros == _registros_xmltodict(path)
+    assert len(registros) == 3
+
+
+def test_profundidade_1_devolve_a_raiz(tmp_path):
+    path = tmp_path / "lote.xml"
+    path.write_text(XML, encoding="utf-8")
+    (registro,) = iterar_registros_xml(str(path), 1)
+    with open(path, encoding="utf-8") as f:
+        esperado = json.loads(json.dumps(xmltodict.parse(f.read(), process_namespaces=True)))
+    # ElementTree não expõe as declarações xmlns, que o xmltodict guarda como "@xmlns"
+    (raiz,) = esperado.values()
+    del raiz["@xmlns"]
+    assert registro == esperado
+
+
+def test_ndjson_e_array_json(tmp_path):
+    path = tmp_path / "lote.xml"
+    path.write_text(XML, encoding="utf-8")
+    linhas = b"".join(gerar_ndjson(str(path))).splitlines()
+    array = json.loads(b"".join(gerar_array_json(str(path))))
+    assert [json.loads(linha) for linha in linhas] == array
+    assert len(array) == 3
+
+
+def test_xml_invalido_termina_com_linha_de_erro(tmp_path):
+    path = tmp_path / "quebrado.xml"
+    path.write_text("<lote><nota>1</nota><nota>", encoding="utf-8")
+    linhas = [json.loads(linha) for linha in b"".join(gerar_ndjson(str(path))).splitlines()]
+    assert linhas[0] == {"nota": "1"}
+    assert "error" in linhas[-1]
+    array = json.loads(b"".join(gerar_array_json(str(path))))
+    assert "error" in array[-1]
@@ -0,0 +1,73 @@
+import json
+import zipfile
+
+from backend import zip_to_json
+from backend.zip_to_json import converter_lote
+
+
+def _pasta(tmp_path):
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    (pasta / "boa.pdf").write_bytes(b"%PDF-boa")
+    (pasta / "ruim.pdf").write_bytes(b"%PDF-ruim")
+    (pasta / "copia.pdf").write_bytes(b"%PDF-boa")
+    return pasta
+
+
+def _conversor(convertidos, falhar):
+    def iterar_arquivos(tarefas, workers, perfil, table_format, campos):
+        for sha256, (path, _) in tarefas.items():
+            convertidos.append(path.rsplit("/", 1)[-1])
+            if falhar and path.endswith("ruim.pdf"):
+                yield sha256, {"error": "falhou"}
+            else:
+                yield sha256, {"texts": [path.rsplit("/", 1)[-1]]}
+    return iterar_arquivos
+
+
+def test_segunda_execucao_pula_o_que_o_checkpoint_tem(tmp_path, monkeypatch):
+    pasta, saida, checkpoint = _pasta(tmp_path), tmp_path / "saida.zip", tmp_path / "ckpt"
+
+    primeira = []
+    monkeypatch.setattr(zip_to_json, "iterar_arquivos", _conversor(primeira, falhar=True))
+    resumo = converter_lote(pasta, saida, checkpoint)
+    assert sorted(primeira) == ["boa.pdf", "ruim.pdf"]
+    assert (resumo["arquivos"], resumo["convertidos"], resumo["erros"], resumo["pulados"]) == (3, 1, 1, 0)
+
+    segunda = []
+    monkeypatch.setattr(zip_to_json, "iterar_arquivos", _conversor(segunda, falhar=False))
+    resumo = converter_lote(pasta, saida, checkpoint)
+    assert segunda == ["ruim.pdf"]  # só o que falhou é tentado de novo
+    assert (resumo["convertidos"], resumo["erros"], resumo["pulados"]) == (1, 0, 1)
+
+    with zipfile.ZipFile(saida) as zf:
+        assert sorted(zf.namelist()) == ["_ignorados.json", "boa.pdf.json", "copia.pdf.json", "ruim.pdf.json"]
+        assert json.loads(zf.read("ruim.pdf.json")) == {"texts": ["ruim.pdf"]}
+        assert json.loads(zf.read("copia.pdf.json")) == json.loads(zf.read("boa.pdf.json"))
+    assert not saida.with_name("saida.zip.part").exists()
+
+
+def test_opcoes_diferentes_invalidam_o_checkpoint(tmp_path, monkeypatch):
+    pasta, saida, checkpoint = _pasta(tmp_path), tmp_path / "saida.zip", tmp_path / "ckpt"
+    monkeypatch.setattr(zip_to_json, "iterar_arquivos", _conversor([], falhar=False))
+    converter_lote(pasta, saida, checkpoint)
+
+    convertidos = []
+    monkeypatch.setattr(zip_to_json, "iterar_arquivos", _conversor(convertidos, falhar=False))
+    resumo = converter_lote(pasta, saida, checkpoint, fields=["texts"])
+    assert sorted(convertidos) == ["boa.pdf", "ruim.pdf"]
+    assert resumo["pulados"] == 0
+
+
+def test_linha_truncada_no_manifesto_e_ignorada(tmp_path):
+    pasta = tmp_path / "ckpt"
+    opcoes = {"perfil": "x"}
+    ckpt = zip_to_json.Checkpoint(pasta, opcoes)
+    ckpt.gravar("abc", "a.pdf", b"{}", erro=False)
+    ckpt.fechar()
+    with open(pasta / "manifest.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"sha256": "def", "arq')
+
+    ckpt = zip_to_json.Checkpoint(pasta, opcoes)
+    assert ckpt.concluido("abc") and not ckpt.concluido("def")
+    ckpt.fechar()